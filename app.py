@@ -1,70 +1,41 @@
 from flask import Flask
 from dotenv import load_dotenv
-import os, joblib
-from models import db
+from models import db, ensure_columns, ensure_indexes
 
 load_dotenv()
 
-# We keep the ML models globally available or attached to the app context.
-# In a true enterprise layout, these would be spun up in a separate Microservice,
-# but for this scale, attaching to the global namespace is acceptable.
-models_loaded = False
-temp_model = None
-rain_model = None
-le_city = None
-le_mode = None
-dl_scaler = None
+# Model registry and prediction entry points live in services/inference.py, shared with
+# the standalone inference server; re-exported here for the views and the warmer.
+from services.inference import model_registry, get_ai_prediction, get_ai_prediction_batch, model_version
 
-MODEL_REG_PATH = "model/temp_regressor.pkl"
-MODEL_CLF_PATH = "model/rain_classifier.pkl"
-LE_CITY_PATH = "model/city_encoder.pkl"
-LE_MODE_PATH = "model/mode_encoder.pkl"
-DL_MODEL_PATH = "model/rain_dl_model.keras"
-DL_SCALER_PATH = "model/dl_scaler.pkl"
-
-try:
-    temp_model = joblib.load(MODEL_REG_PATH)
-    le_city = joblib.load(LE_CITY_PATH)
-    le_mode = joblib.load(LE_MODE_PATH)
-    
-    if os.path.exists(DL_MODEL_PATH):
-        from tensorflow.keras.models import load_model
-        rain_model = load_model(DL_MODEL_PATH)
-        dl_scaler = joblib.load(DL_SCALER_PATH)
-    else:
-        rain_model = joblib.load(MODEL_CLF_PATH)
-        
-    models_loaded = True
-except Exception as e:
-    print(f"Model Load Warning: {e}")
-
-def get_ai_prediction(temp, hum, press, wind, city_name, mode_name):
-    if not models_loaded: return "AI Offline", temp
-    try:
-        try: c_code = le_city.transform([city_name])[0]
-        except: c_code = 0
-        try: m_code = le_mode.transform([mode_name])[0]
-        except: m_code = 0
-            
-        if dl_scaler is not None:
-            raw_features = [[temp, hum, press, wind, c_code]]
-            scaled_features = dl_scaler.transform(raw_features)
-            dl_prob = rain_model.predict(scaled_features, verbose=0)[0][0]
-            prediction_text = "Rain Expected" if dl_prob > 0.50 else "No Rain"
-        else:
-            rain_features = [[temp, hum, press, wind, c_code]]
-            is_rain = rain_model.predict(rain_features)[0]
-            prediction_text = "Rain Expected" if is_rain == 1 else "No Rain"
-        
-        temp_features = [[hum, press, wind, c_code, m_code]]
-        ml_guess = temp_model.predict(temp_features)[0]
-        diff = ml_guess - temp
-        max_correction = 3.5
-        corrected_temp = temp + (max_correction if diff > 0 else -max_correction) if abs(diff) > max_correction else ml_guess
-
-        return prediction_text, round(corrected_temp, 1)
-    except:
-        return "Prediction Error", temp
+def register_metric_collectors():
+    from services.metrics import register_collector
+    from services.warmer import city_warmer
+    from services.weather_data import upstream_cache
+    from services.geocache import geocode_cache
+    from services.report_cache import report_cache
+    from services import upload_store, upstream_scheduler
+    from services.prediction_log import prediction_logger
+    register_collector("raincast_upstream_cache_total", "Upstream response cache outcomes.", lambda: upstream_cache.stats, label="result")
+    register_collector("raincast_geocode_cache_total", "Geocode lookups by the tier that answered.", lambda: geocode_cache.hits, label="tier")
+    register_collector("raincast_report_cache_total", "Peer report cache events.", lambda: report_cache.stats, label="event")
+    register_collector("raincast_upload_total", "Stored uploads and thumbnails.", lambda: upload_store.stats, label="event")
+    register_collector("raincast_upstream_scheduler_total", "Outbound calls, throttle waits, rejections, retries and breaker events.", lambda: upstream_scheduler.stats, label="event")
+    register_collector("raincast_upstream_queue_depth", "Requests waiting for a provider token.", lambda: {n: p["queue_depth"] for n, p in upstream_scheduler.snapshot()["providers"].items()}, metric_type="gauge", label="provider")
+    register_collector("raincast_upstream_circuit_open", "1 while a provider's circuit breaker is open.", lambda: {n: p["circuit_open"] for n, p in upstream_scheduler.snapshot()["providers"].items()}, metric_type="gauge", label="provider")
+    register_collector("raincast_prediction_log_rows_total", "Prediction log rows queued, dropped on a full queue, and written.", lambda: {k: prediction_logger.stats[k] for k in ("queued", "dropped", "written")}, label="outcome")
+    register_collector("raincast_prediction_log_flushes_total", "Prediction log batch writes by result.", lambda: {"ok": prediction_logger.stats["flushes"], "error": prediction_logger.stats["errors"]}, label="result")
+    register_collector("raincast_prediction_log_pending", "Prediction log rows waiting to be written.", lambda: prediction_logger.snapshot()["pending"], metric_type="gauge", label=None)
+    register_collector("raincast_warmer_lookups_total", "Dashboard lookups of warmed predictions.", lambda: {"hit": city_warmer.stats["hits"], "miss": city_warmer.stats["misses"]}, label="result")
+    register_collector("raincast_warmer_cycles_total", "Completed warm cycles.", lambda: city_warmer.stats["cycles"], label=None)
+    register_collector("raincast_warmer_refresh_errors_total", "Cities whose warm refresh failed.", lambda: city_warmer.stats["refresh_errors"], label=None)
+    register_collector("raincast_warmer_cities", "Cities tracked by traffic and cities currently warm.", lambda: {k: city_warmer.snapshot()[k + "_cities"] for k in ("tracked", "warm")}, metric_type="gauge", label="state")
+    register_collector("raincast_warmer_last_cycle_seconds", "Duration of the last warm cycle.", lambda: city_warmer.stats["last_cycle_seconds"], metric_type="gauge", label=None)
+    register_collector("raincast_warmer_refresh_lag_seconds", "Age of the warmed data, oldest and average.", lambda: {"max": city_warmer.snapshot()["refresh_lag_max"], "avg": city_warmer.snapshot()["refresh_lag_avg"]}, metric_type="gauge", label="stat")
+    # stats() never triggers a load, so scraping a cold worker stays cheap
+    register_collector("raincast_model_info", "1 for the loaded model bundle, labelled with its engine and version.", lambda: {(s.get("engine", ""), s["version"] or ""): 1 for s in [model_registry.stats()] if s["loaded"]}, metric_type="gauge", label=("engine", "version"))
+    register_collector("raincast_model_loaded", "1 once the model bundle has loaded without error.", lambda: model_registry.stats()["loaded"], metric_type="gauge", label=None)
+    register_collector("raincast_model_reloads_total", "Hot reloads of the model bundle.", lambda: model_registry.reload_count, label=None)
 
 
 def create_app():
@@ -74,17 +45,42 @@ def create_app():
     # Configure Database
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///weather_intelligence.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Writers queue on SQLite's lock instead of failing after the 5s default
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {"connect_args": {"timeout": 30}}
+    # Reject oversized proof photos before they are read into memory
+    from services.photo_verify import MAX_UPLOAD_BYTES
+    app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
     
     db.init_app(app)
     
     with app.app_context():
         # Create Tables if they don't exist
         db.create_all()
+        ensure_columns()
+        ensure_indexes()
 
     # Register Blueprints
     from routes import register_blueprints
     register_blueprints(app)
 
+    from services.history_store import register_commands
+    register_commands(app)
+    from services import upload_store
+    upload_store.register_commands(app)
+    from services import climatology
+    climatology.register_commands(app)
+    from services import district_index
+    district_index.register_commands(app)
+
+    # Run async views on the worker's shared event loop and pooled HTTP session
+    from services.http_client import install
+    install(app)
+
+    # Server-Timing header and request latency histograms; /metrics also reads the cache counters
+    from services import metrics
+    metrics.install(app)
+    register_metric_collectors()
+
     return app
 
 app = create_app()
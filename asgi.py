@@ -0,0 +1,8 @@
+# ASGI entry point: uvicorn asgi:asgi_app --workers 4
+# Flask stays a WSGI app; asgiref adapts it, and async views run on the worker's single
+# long-lived event loop with one pooled aiohttp session (services/http_client.py).
+# ASGI_THREADS caps how many requests the adapter runs at once.
+from asgiref.wsgi import WsgiToAsgi
+from app import app
+
+asgi_app = WsgiToAsgi(app)
@@ -0,0 +1,57 @@
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+
+db = SQLAlchemy()
+
+class P2PReport(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    city = db.Column(db.String(100), nullable=False)
+    report_type = db.Column(db.String(50), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), default="pending")
+    votes_yes = db.Column(db.Integer, default=0)
+    votes_no = db.Column(db.Integer, default=0)
+    proof_filename = db.Column(db.String(200))
+
+    # Dashboard/status lookups: one city, one status, newest within the last hour
+    __table_args__ = (
+        db.Index("ix_p2p_report_city_status_timestamp", "city", "status", "timestamp"),
+    )
+
+class PredictionHistory(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    time = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    city = db.Column(db.String(100), nullable=False, index=True)
+    temp = db.Column(db.Float)
+    hum = db.Column(db.Float)
+    press = db.Column(db.Float)
+    wind = db.Column(db.Float)
+    prediction = db.Column(db.String(50))
+    status = db.Column(db.String(50))
+    report = db.Column(db.String(50))
+    mode = db.Column(db.String(50), index=True)
+    lat = db.Column(db.Float)
+    lon = db.Column(db.Float)
+    proof_filename = db.Column(db.String(200))
+    trust_score = db.Column(db.Float)
+    votes_yes = db.Column(db.Integer, default=0)
+    votes_no = db.Column(db.Integer, default=0)
+
+def ensure_columns():
+    # create_all() does not alter existing tables either; add nullable columns that were
+    # declared after the database was created
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable: continue
+            col_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+
+def ensure_indexes():
+    # create_all() skips tables that already exist, indexes included, so add any
+    # index declared above that an older database is missing
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
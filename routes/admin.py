@@ -1,7 +1,6 @@
 from flask import Blueprint, render_template, request, session, redirect, url_for
-import csv
-from models import PredictionHistory
-from .main import HISTORY_FILE
+from datetime import datetime, timedelta
+from services.history_store import query_history, delete_history_record, PAGE_SIZE
 
 admin_bp = Blueprint('admin', __name__)
 import os
@@ -18,28 +17,25 @@ def admin_login():
 @admin_bp.route("/admin_panel")
 def admin_panel():
     if not session.get('is_admin'): return redirect(url_for('admin.admin_login'))
-    
-    # Temporarily read the CSV to avoid breaking existing history
-    # Later we will read from HistoryDB Model
-    recs = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            reader = list(csv.reader(f))
-            if len(reader) > 1:
-                recs = reader[1:]
-    return render_template("admin_panel.html", records=recs)
-
-@admin_bp.route("/delete_record/<int:index>")
-def delete_record(index):
+
+    filters = {k: (request.args.get(k) or "").strip() for k in ("city", "mode", "start", "end")}
+    try: start = datetime.strptime(filters["start"], "%Y-%m-%d") if filters["start"] else None
+    except ValueError: start = None
+    try: end = datetime.strptime(filters["end"], "%Y-%m-%d") + timedelta(days=1) if filters["end"] else None
+    except ValueError: end = None
+    before = request.args.get("before", type=int)
+
+    # One extra row tells us whether an older page exists
+    recs = query_history(filters["city"], filters["mode"], start, end, before, PAGE_SIZE + 1)
+    next_before = recs[PAGE_SIZE - 1].id if len(recs) > PAGE_SIZE else None
+    return render_template("admin_panel.html", records=recs[:PAGE_SIZE], filters=filters, next_before=next_before, paged=bool(before))
+
+@admin_bp.route("/delete_record/<int:record_id>")
+def delete_record(record_id):
     if not session.get('is_admin'): return redirect(url_for('admin.admin_login'))
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            rows = list(csv.reader(f))
-        if 0 < (index + 1) < len(rows):
-            rows.pop(index + 1)
-            with open(HISTORY_FILE, "w", newline="", encoding="utf-8") as f:
-                csv.writer(f).writerows(rows)
-    return redirect(url_for('admin.admin_panel'))
+    delete_history_record(record_id)
+    # The delete link carries the panel's query string so filters and page survive
+    return redirect(url_for('admin.admin_panel', **request.args))
 
 @admin_bp.route("/admin_logout")
 def admin_logout():
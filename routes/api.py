@@ -1,11 +1,23 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
-from PIL import Image, ImageStat
+from flask import Blueprint, Response, request, session, jsonify, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
 from models import db, P2PReport
-import os
+from services.report_cache import report_cache
+from services.votes import apply_votes, vote_buffer, VOTE_BUFFER
+from services.photo_verify import verify_photo, PhotoRejected
+from services.upload_store import store_upload
+from services.metrics import stage, render_metrics, REQUEST_ERRORS
+from services.fanout import fetch_conditions, FanoutOverBudget, FANOUT_MAX_ITEMS, FANOUT_DEADLINE
+from services.rain_timeline import build_timeline, TIMELINE_HOURS
+from services.geocache import geocode_city_async
+from services.weather_data import get_forecast
+import os, asyncio
 
 api_bp = Blueprint('api', __name__)
 
+@api_bp.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"status": "error", "message": "Upload too large."}), 413
+
 @api_bp.route("/report", methods=["POST"])
 def handle_report():
     try:
@@ -16,41 +28,37 @@ def handle_report():
         if not file: return jsonify({"status": "error", "message": "Photo is required!"})
         if not city: return jsonify({"status": "error", "message": "City is required!"})
         
-        # Fraud Check: Image metadata
-        img = Image.open(file)
-        exif_data = img._getexif()
-        if not exif_data: return jsonify({"status": "error", "message": "Anti-Fraud: No EXIF found."})
-        
-        img_time_str = exif_data.get(36867) or exif_data.get(306)
-        if not img_time_str: return jsonify({"status": "error", "message": "Metadata empty."})
-        
-        img_time = datetime.strptime(img_time_str.strip(), '%Y:%m:%d %H:%M:%S')
-        if datetime.now() - img_time > timedelta(minutes=10):
-            return jsonify({"status": "error", "message": "Verification Failed: Photo older than 10 mins."})
+        # Header checks first, then the detail heuristic on a reduced decode in the photo pool
+        timings = {}
+        data = file.read()
+        try:
+            with stage("verify"):
+                verify_photo(data, timings)
+        except PhotoRejected as e:
+            return jsonify({"status": "error", "message": str(e), "timings": timings})
 
-        # Heuristic Analysis: Check if image has details (not fully black/white)
-        gray_img = img.convert("L")
-        stat = ImageStat.Stat(gray_img)
-        if stat.stddev[0] < 5.0:
-            return jsonify({"status": "error", "message": "Quality Failed: Image details too low or blank."})
+        # Content-addressed: a resubmitted photo reuses the stored file
+        with stage("store"):
+            proof = store_upload(data)
 
         # Save to DB as 'pending'
-        new_report = P2PReport(city=city, report_type=user_choice, status="pending")
-        db.session.add(new_report)
-        db.session.commit()
+        with stage("db"):
+            new_report = P2PReport(city=city, report_type=user_choice, status="pending", proof_filename=proof)
+            db.session.add(new_report)
+            db.session.commit()
+        report_cache.invalidate(city)
+        report_cache.maybe_purge()
 
-        return jsonify({"status": "success", "message": "Report logged! Waiting for peer verification."})
+        return jsonify({"status": "success", "message": "Report logged! Waiting for peer verification.", "timings": timings})
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
+        REQUEST_ERRORS.inc(endpoint="api.handle_report")
         return jsonify({"status": "error", "message": str(e)})
 
 @api_bp.route("/check_status/<city>")
 def check_status(city):
-    recent_threshold = datetime.utcnow() - timedelta(hours=1)
-    report = P2PReport.query.filter(
-        P2PReport.city == city,
-        P2PReport.status == "verified",
-        P2PReport.timestamp >= recent_threshold
-    ).order_by(P2PReport.timestamp.desc()).first()
+    report = report_cache.latest(city, "verified")
     
     if report:
         return jsonify({"status": f"Verified {report.report_type} (Peer Consensus)"})
@@ -59,12 +67,7 @@ def check_status(city):
 
 @api_bp.route("/pending_report/<city>")
 def pending_report(city):
-    recent_threshold = datetime.utcnow() - timedelta(hours=1)
-    report = P2PReport.query.filter(
-        P2PReport.city == city,
-        P2PReport.status == "pending",
-        P2PReport.timestamp >= recent_threshold
-    ).order_by(P2PReport.timestamp.desc()).first()
+    report = report_cache.latest(city, "pending")
     
     if report:
         return jsonify({"exists": True, "id": report.id, "report_type": report.report_type})
@@ -72,21 +75,104 @@ def pending_report(city):
 
 @api_bp.route("/vote/<int:report_id>", methods=["POST"])
 def submit_vote(report_id):
-    vote = request.json.get("vote") # 'yes' or 'no'
-    report = P2PReport.query.get(report_id)
-    if not report or report.status != "pending":
-        return jsonify({"status": "error", "message": "Report unavailable."})
+    vote = (request.get_json(silent=True) or {}).get("vote") # 'yes' or 'no'
+    yes, no = (1, 0) if vote == "yes" else (0, 1) if vote == "no" else (0, 0)
 
-    if vote == "yes":
-        report.votes_yes += 1
-    elif vote == "no":
-        report.votes_no += 1
+    if VOTE_BUFFER:
+        # Write-behind: check the report is still open, then coalesce with other votes
+        status = db.session.query(P2PReport.status).filter(P2PReport.id == report_id).scalar()
+        if status != "pending":
+            return jsonify({"status": "error", "message": "Report unavailable."})
+        vote_buffer.add(current_app._get_current_object(), report_id, yes, no)
+    elif apply_votes(report_id, yes, no) is None:
+        return jsonify({"status": "error", "message": "Report unavailable."})
 
-    # Check for consensus threshold
-    if report.votes_yes >= 5:
-        report.status = "verified"
-    elif report.votes_no >= 3:
-        report.status = "rejected"
-        
-    db.session.commit()
     return jsonify({"status": "success", "message": "Vote accepted."})
+
+@api_bp.route("/api/predict_batch", methods=["POST"])
+def predict_batch():
+    # Body: {"rows": [{"temp", "hum", "press", "wind", "city", "mode"}, ...]}
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("rows")
+    if not isinstance(items, list) or not items:
+        return jsonify({"status": "error", "message": "rows must be a non-empty list."}), 400
+    try:
+        rows = [(float(r["temp"]), float(r["hum"]), float(r["press"]), float(r["wind"]), str(r.get("city", "")), str(r.get("mode") or "standard")) for r in items]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Invalid row: {e}"}), 400
+
+    from app import get_ai_prediction_batch
+    results = get_ai_prediction_batch(rows)
+    return jsonify({"status": "success", "results": [{"prediction": p, "ai_temp": t} for p, t in results]})
+
+@api_bp.route("/api/conditions", methods=["POST"])
+async def conditions():
+    # Body: {"cities": ["Pune", {"city": "Delhi"}, {"lat": 19.07, "lon": 72.87, "name": "Mumbai"}, ...],
+    #        "mode": "standard", "deadline": seconds}
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("cities")
+    if not isinstance(items, list) or not items:
+        return jsonify({"status": "error", "message": "cities must be a non-empty list."}), 400
+    if len(items) > FANOUT_MAX_ITEMS:
+        return jsonify({"status": "error", "message": f"At most {FANOUT_MAX_ITEMS} cities per request."}), 400
+    try:
+        deadline = min(float(payload.get("deadline") or FANOUT_DEADLINE), FANOUT_DEADLINE)
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "deadline must be a number of seconds."}), 400
+
+    from app import get_ai_prediction_batch
+    try:
+        with stage("fanout"):
+            results, elapsed_ms = await fetch_conditions(items, str(payload.get("mode") or "standard"), os.getenv("API_KEY", ""),
+                                                         get_ai_prediction_batch, deadline=deadline)
+    except FanoutOverBudget as e:
+        return jsonify({"status": "error", "message": str(e), "needed": e.needed, "available": e.available}), 429
+    errors = sum(1 for r in results if "error" in r)
+    return jsonify({"status": "success" if errors < len(results) else "error", "results": results, "errors": errors, "elapsed_ms": elapsed_ms})
+
+@api_bp.route("/api/timeline")
+async def rain_timeline():
+    # ?city=Pune or ?lat=..&lon=.. (default: the dashboard's last city), &mode=farmer, &hours=168
+    mode = request.args.get("mode") or session.get('last_mode') or "standard"
+    try:
+        hours = int(request.args.get("hours") or TIMELINE_HOURS)
+        if request.args.get("lat") and request.args.get("lon"):
+            lat, lon = float(request.args["lat"]), float(request.args["lon"])
+            name = request.args.get("city") or f"{lat:.2f},{lon:.2f}"
+        elif request.args.get("city"):
+            geo = await geocode_city_async(request.args["city"], os.getenv("API_KEY", ""))
+            if not geo: return jsonify({"status": "error", "message": "City not found."}), 404
+            lat, lon, name = geo["lat"], geo["lon"], geo["name"]
+        elif session.get('last_lat') is not None:
+            lat, lon, name = session['last_lat'], session['last_lon'], session.get('last_city')
+        else:
+            return jsonify({"status": "error", "message": "Pass city or lat/lon."}), 400
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid parameter: {e}"}), 400
+
+    with stage("upstream"):
+        forecast = await get_forecast(lat, lon)
+    if forecast is None: return jsonify({"status": "error", "message": "Forecast unavailable."}), 502
+    with stage("timeline"):
+        timeline = await asyncio.to_thread(build_timeline, forecast, name, mode, hours=max(hours, 1))
+    return jsonify(dict(timeline, status="success", city=name, lat=lat, lon=lon, mode=mode))
+
+@api_bp.route("/api/model_status")
+def model_status():
+    from app import model_registry
+    return jsonify(model_registry.stats())
+
+@api_bp.route("/api/cache_stats")
+def cache_stats():
+    from services.warmer import city_warmer
+    from services.weather_data import upstream_cache
+    from services.geocache import geocode_cache
+    from services import upload_store, upstream_scheduler
+    from services.prediction_log import prediction_logger
+    return jsonify({"warmer": city_warmer.snapshot(), "upstream": upstream_cache.stats, "geocode": geocode_cache.hits, "reports": report_cache.stats,
+                    "uploads": upload_store.stats, "scheduler": upstream_scheduler.snapshot(), "prediction_log": prediction_logger.snapshot()})
+
+@api_bp.route("/metrics")
+def metrics():
+    # Prometheus text exposition; the cache counters above are read at scrape time
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
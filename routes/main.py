@@ -1,6 +1,16 @@
-from flask import Blueprint, render_template, request, session, flash, redirect, url_for
-import requests, os, asyncio, aiohttp
-from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, session, flash, redirect, url_for, send_from_directory, abort, current_app
+import os, asyncio
+from services.geocache import geocode_city_async
+from services.weather_data import get_current_weather, get_forecast, get_air_quality, parse_current, parse_aqi
+from services.warmer import city_warmer
+from services.report_cache import report_cache
+from services.climatology import climate_summary
+from services.district_index import resolve_district
+from services.metrics import stage, REQUEST_ERRORS
+from services.rain_timeline import build_timeline, peak_rain
+from services.prediction_log import prediction_logger
+from services.upload_store import (UPLOAD_DIR, THUMB_DIR, IMMUTABLE_MAX_AGE, LEGACY_MAX_AGE,
+                                   is_content_addressed, thumb_name, ensure_thumbnail)
 
 main_bp = Blueprint('main', __name__)
 
@@ -12,7 +22,7 @@ HISTORY_FILE = "data/prediction_history.csv" # Deprecated location for old code
 # however for simplicity, we pass predictions back to the app context here.
 # Since ML models are loaded in app.py, we will import the app instance lazily.
 
-def generate_advice(temp, hum, wind, prediction, mode, weather_id, aqi=1):
+def generate_advice(temp, hum, wind, prediction, mode, weather_id, aqi=1, climate=None):
     is_rainy = (200 <= weather_id <= 531) or ("rain expected" in str(prediction).lower())
     advice_map = {
         "standard": {
@@ -39,33 +49,31 @@ def generate_advice(temp, hum, wind, prediction, mode, weather_id, aqi=1):
     elif aqi == 3:
         aqi_warning = f" ℹ️ Moderate AQI ({aqi}). Sensitive groups take care."
 
-    return {"dos": advice_map[selected_mode][key] + aqi_warning}
+    # Seasonal context from the rainfall climatology (normal for this month at this place)
+    climate_note = ""
+    if climate:
+        if climate["wet_month"] and key == "clear":
+            climate_note = f" 🌧️ {climate['month']} is a wet month here (normal {climate['normal_mm']:.0f} mm); showers can build quickly."
+        elif climate["dry_month"] and key == "rain":
+            climate_note = f" Rain is unusual here in {climate['month']} (normal {climate['normal_mm']:.0f} mm)."
+
+    return {"dos": advice_map[selected_mode][key] + aqi_warning + climate_note}
 
 
 async def fetch_weather_data(lat, lon):
-    async with aiohttp.ClientSession() as aio_session:
-        w_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
-        g_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=temperature_2m&timezone=auto"
-        aqi_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={API_KEY}"
-        
-        # Dispatch concurrently
-        responses = await asyncio.gather(
-            aio_session.get(w_url),
-            aio_session.get(g_url),
-            aio_session.get(aqi_url),
-            return_exceptions=True
-        )
-
-        w_data = await responses[0].json() if not isinstance(responses[0], Exception) else {}
-        g_data = await responses[1].json() if not isinstance(responses[1], Exception) else {}
-        aqi_data = await responses[2].json() if not isinstance(responses[2], Exception) else {}
-        
-        return w_data, g_data, aqi_data
+    # Dispatch concurrently; cached sources return immediately.
+    # forecast is a parsed ForecastData (hourly + daily) or None.
+    w_data, forecast, aqi_data = await asyncio.gather(
+        get_current_weather(lat, lon),
+        get_forecast(lat, lon),
+        get_air_quality(lat, lon),
+    )
+    return w_data, forecast, aqi_data
 
 
 @main_bp.route("/", methods=["GET", "POST"])
 async def index():
-    prediction, weather, advice, hourly_data = None, None, None, []
+    prediction, weather, advice, hourly_data, rain_peak = None, None, None, [], None
     current_mode = (request.form.get("user_mode") or request.args.get("user_mode") or session.get('last_mode') or 'standard')
     session['last_mode'] = current_mode
     city = request.form.get("city") or request.args.get("city") or session.get('last_city')
@@ -73,57 +81,59 @@ async def index():
     if city and city.strip():
         city = city.strip()
         try:
-            # 1. Fetch Geo Location (Synchronous because it dictates the next async steps)
-            geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city}&limit=1&appid={API_KEY}"
-            geo_data = requests.get(geo_url).json()
+            # 1. Fetch Geo Location (cached; it dictates the next async steps)
+            with stage("geocode"):
+                geo = await geocode_city_async(city, API_KEY)
 
-            if geo_data:
-                lat, lon, full_name = geo_data[0]['lat'], geo_data[0]['lon'], geo_data[0]['name']
+            if geo:
+                lat, lon, full_name = geo['lat'], geo['lon'], geo['name']
                 
                 # 2. Fetch Data Concurrently
-                w_data, g_data, aqi_data = await fetch_weather_data(lat, lon)
+                with stage("upstream"):
+                    w_data, forecast, aqi_data = await fetch_weather_data(lat, lon)
                 
                 # 3. Parse Responses
-                t = round(w_data["main"]["temp"])
-                h = w_data["main"]["humidity"]
-                p = w_data["main"]["pressure"]
-                w = round(w_data["wind"]["speed"] * 3.6, 1)
-                vis = round(w_data.get("visibility", 0) / 1000, 1)
-                fl = round(w_data["main"].get("feels_like", t))
-                condition_id = w_data["weather"][0]["id"]
-
-                curr_hour_str = datetime.now().strftime("%Y-%m-%dT%H:00")
-                try: 
-                    start_idx = g_data["hourly"]["time"].index(curr_hour_str)
-                except: 
-                    start_idx = datetime.now().hour
-
-                for i in range(start_idx, start_idx + 8):
-                    if i < len(g_data["hourly"]["time"]):
-                        hourly_data.append({
-                            "time": g_data["hourly"]["time"][i].split("T")[1],
-                            "temp": round(g_data["hourly"]["temperature_2m"][i])
-                        })
-
-                aqi = 1
-                if "list" in aqi_data and len(aqi_data["list"]) > 0:
-                    aqi = aqi_data["list"][0]["main"]["aqi"]
-
-
-                # 4. Perform AI logic
-                from app import get_ai_prediction
-                prediction, ai_temp = get_ai_prediction(t, h, p, w, full_name, current_mode)
+                with stage("parse"):
+                    cur = parse_current(w_data)
+                    t, h, p, w = cur["temp"], cur["hum"], cur["pressure"], cur["wind"]
+                    vis, fl, condition_id = cur["visibility"], cur["feels_like"], cur["condition_id"]
+
+                    aqi = parse_aqi(aqi_data)
+
+                if forecast is not None:
+                    # Rain probability for every forecast hour in one model pass; the chart shows 8
+                    with stage("timeline"):
+                        timeline = await asyncio.to_thread(build_timeline, forecast, full_name, current_mode)
+                    hourly_data = [{"time": ts[11:16], "temp": round(tmp), "rain": None if prob is None else round(prob * 100)}
+                                   for ts, tmp, prob in zip(timeline["time"][:8], timeline["temp"][:8], timeline["rain_prob"][:8]) if tmp is not None]
+                    rain_peak = peak_rain(timeline, 24)
+
+                with stage("climate"):
+                    # Geocodes cached before the district index existed resolve here (sub-ms once loaded)
+                    district = geo['district'] if 'district' in geo else await asyncio.to_thread(resolve_district, full_name, geo.get('state'), lat, lon, geo.get('country'))
+                    climate = await asyncio.to_thread(climate_summary, full_name, geo.get('state'), district=district, country=geo.get('country'))
+
+                # 4. Perform AI logic (precomputed by the warmer for hot cities)
+                with stage("inference"):
+                    city_warmer.record(full_name, lat, lon)
+                    # lookup() checks model_version(), which may ask the inference server
+                    warm = await asyncio.to_thread(city_warmer.lookup, full_name, current_mode, (t, h, p, w))
+                    if warm is not None:
+                        prediction, ai_temp = warm
+                    else:
+                        from app import get_ai_prediction
+                        prediction, ai_temp = await asyncio.to_thread(get_ai_prediction, t, h, p, w, full_name, current_mode)
+
+                # Training rows use OpenWeather's raw units like the existing history (wind in m/s)
+                raw = w_data.get("main", {})
+                prediction_logger.log(current_app._get_current_object(), full_name, raw.get("temp", t), raw.get("humidity", h),
+                                      raw.get("pressure", p), w_data.get("wind", {}).get("speed"), prediction, current_mode, lat, lon)
                 
-                weather = {"city": full_name, "temp": t, "hum": h, "wind": w, "pressure": p, "visibility": vis, "lat": lat, "lon": lon, "ai_temp": ai_temp, "aqi": aqi, "feels_like": fl}
-                advice = generate_advice(t, h, w, prediction, current_mode, condition_id, aqi)
+                weather = {"city": full_name, "temp": t, "hum": h, "wind": w, "pressure": p, "visibility": vis, "lat": lat, "lon": lon, "ai_temp": ai_temp, "aqi": aqi, "feels_like": fl, "climate": climate, "rain_peak": rain_peak}
+                advice = generate_advice(t, h, w, prediction, current_mode, condition_id, aqi, climate)
                 
-                from models import P2PReport
-                recent_time = datetime.utcnow() - timedelta(hours=1)
-                verified_report = P2PReport.query.filter(
-                    P2PReport.city == full_name,
-                    P2PReport.status == "verified",
-                    P2PReport.timestamp >= recent_time
-                ).order_by(P2PReport.timestamp.desc()).first()
+                with stage("reports"):
+                    verified_report = await asyncio.to_thread(report_cache.latest, full_name, "verified")
                 
                 if verified_report:
                     prediction = f"Verified {verified_report.report_type} (Peer Consensus)"
@@ -133,18 +143,46 @@ async def index():
             else:
                 flash(f"City '{city}' not found.", "error")
         except Exception as e:
+            REQUEST_ERRORS.inc(endpoint="main.index")
             print(f"Sync Error: {e}")
 
-    return render_template("dashboard.html", prediction=prediction or "", weather=weather, advice=advice, current_mode=current_mode, hourly_data=hourly_data, city=city)
+    with stage("render"):
+        return await asyncio.to_thread(render_template, "dashboard.html", prediction=prediction or "", weather=weather, advice=advice, current_mode=current_mode, hourly_data=hourly_data, city=city)
 
 @main_bp.route("/forecast")
-def detailed_forecast():
+async def detailed_forecast():
     city, lat, lon = session.get('last_city'), session.get('last_lat'), session.get('last_lon')
     if not lat: return redirect(url_for('main.index'))
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&daily=weathercode,temperature_2m_max,temperature_2m_min&timezone=auto&forecast_days=14"
-    res = requests.get(url).json()
-    daily_data = [{"day": datetime.strptime(res['daily']['time'][i], '%Y-%m-%d').strftime('%a'), "date": datetime.strptime(res['daily']['time'][i], '%Y-%m-%d').strftime('%d %b'), "temp_max": round(res['daily']['temperature_2m_max'][i]), "temp_min": round(res['daily']['temperature_2m_min'][i]), "condition": "Scan Complete"} for i in range(14)]
-    return render_template("forecast.html", city=city, daily=daily_data)
+    # Same cached Open-Meteo response the dashboard used for its hourly strip
+    with stage("upstream"):
+        forecast = await get_forecast(lat, lon)
+    if forecast is None: return redirect(url_for('main.index'))
+    dates, t_max, t_min, _ = forecast.daily_window(14)
+    daily_data = [{"day": d.strftime('%a'), "date": d.strftime('%d %b'), "temp_max": round(hi), "temp_min": round(lo), "condition": "Scan Complete"} for d, hi, lo in zip(dates, t_max.tolist(), t_min.tolist())]
+    with stage("render"):
+        return await asyncio.to_thread(render_template, "forecast.html", city=city, daily=daily_data)
+
+def send_upload(directory, filename, source_name):
+    # Hashed uploads never change, so clients may keep them forever; ETag covers the old names
+    immutable = is_content_addressed(source_name)
+    resp = send_from_directory(directory, filename, max_age=IMMUTABLE_MAX_AGE if immutable else LEGACY_MAX_AGE)
+    resp.cache_control.public = True
+    if immutable: resp.cache_control.immutable = True
+    return resp
+
+@main_bp.route("/uploads/<name>")
+def upload_file(name):
+    return send_upload(UPLOAD_DIR, name, name)
+
+@main_bp.route("/uploads/thumb/<name>")
+def upload_thumb(name):
+    if not os.path.isfile(os.path.join(UPLOAD_DIR, name)): abort(404)
+    try:
+        ensure_thumbnail(name)
+    except Exception as e:
+        print(f"Thumbnail Warning: {e}")
+        return send_upload(UPLOAD_DIR, name, name)
+    return send_upload(THUMB_DIR, thumb_name(name), name)
 
 @main_bp.route("/clear")
 def clear():
@@ -0,0 +1 @@
+# Support modules shared by the Flask app, the Streamlit app and the training scripts.
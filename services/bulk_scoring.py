@@ -0,0 +1,127 @@
+import os, tempfile
+import numpy as np
+import pandas as pd
+from services.dataset_index import resolve_columns
+from services.inference import rain_probability, corrected_temperature
+
+# Bulk scoring for the Streamlit dataset flow: the upload is read in chunks, columns are
+# mapped once from the first chunk, every chunk gets one vectorized rain and temperature
+# pass (the same functions the dashboard and API batch path use), and the scored chunk is
+# appended to a file on disk. Nothing but the current chunk is held in memory.
+
+BULK_CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "50000"))
+BULK_OUTPUT_DIR = os.getenv("BULK_OUTPUT_DIR", tempfile.gettempdir())
+
+# Same fallbacks as the single-row dataset path
+DEFAULTS = {"temp": 25.0, "hum": 60.0, "press": 1013.0, "wind": 10.0}
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def iter_chunks(source, filename, chunksize=BULK_CHUNK_ROWS, as_text=False):
+    # as_text keeps every input column as strings, so each chunk has the same schema no
+    # matter which values it happens to contain (needed for a single Parquet file)
+    source.seek(0)
+    if filename.endswith('.csv'):
+        yield from pd.read_csv(source, chunksize=chunksize, dtype=str if as_text else None)
+        return
+    if filename.endswith(('.jsonl', '.ndjson')):
+        chunks = pd.read_json(source, lines=True, chunksize=chunksize)
+    else:
+        # A JSON array cannot be streamed by pandas; parse once and score it in slices
+        df = pd.read_json(source)
+        chunks = (df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize))
+    for chunk in chunks:
+        yield chunk.where(chunk.isna(), chunk.astype(str)).astype(object) if as_text else chunk
+
+
+class ChunkScorer:
+    def __init__(self, bundle, mode_name):
+        # bundle: a ModelBundle from services.inference.model_registry, held for the whole run
+        self.bundle = bundle
+        self.m_code = float(bundle.mode_lookup.get(mode_name, 0))
+
+    def _numeric(self, chunk, columns, key):
+        col = columns[key]
+        if col is None: return np.full(len(chunk), DEFAULTS[key])
+        return pd.to_numeric(chunk[col], errors="coerce").fillna(DEFAULTS[key]).to_numpy(dtype=float)
+
+    def score(self, chunk, columns):
+        t, h, p, w = (self._numeric(chunk, columns, k) for k in ("temp", "hum", "press", "wind"))
+        out = chunk.copy()
+        m = self.bundle
+        if not m.loaded:
+            out["ai_prediction"], out["ai_rain_prob"], out["ai_temp"] = "AI Offline", np.nan, t
+            return out
+        if columns["city"] is not None:
+            # Unknown labels fall back to 0, same as get_ai_prediction
+            c_codes = chunk[columns["city"]].map(m.city_lookup).fillna(0).to_numpy(dtype=float)
+        else:
+            c_codes = np.zeros(len(chunk))
+
+        nums = np.column_stack([t, h, p, w])
+        probs, is_rain = rain_probability(m, np.column_stack([nums, c_codes]))
+        corrected = corrected_temperature(m, nums, c_codes, np.full(len(chunk), self.m_code))
+
+        out["ai_prediction"] = np.where(is_rain, "Rain Expected", "No Rain")
+        out["ai_rain_prob"] = np.round(probs, 4)
+        out["ai_temp"] = np.round(corrected, 1)
+        return out
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8", newline="")
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.f, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetSink:
+    def __init__(self, path):
+        import pyarrow as pa, pyarrow.parquet as pq
+        self.pa, self.pq, self.path, self.writer = pa, pq, path, None
+
+    def write(self, df):
+        if self.writer is None:
+            table = self.pa.Table.from_pandas(df, preserve_index=False)
+            # Text columns that are empty in the first chunk would otherwise be typed null
+            schema = self.pa.schema([f.with_type(self.pa.string()) if self.pa.types.is_null(f.type) else f for f in table.schema])
+            self.writer = self.pq.ParquetWriter(self.path, schema)
+        self.writer.write_table(self.pa.Table.from_pandas(df, schema=self.writer.schema, preserve_index=False))
+
+    def close(self):
+        if self.writer is not None: self.writer.close()
+
+
+def score_dataset(source, filename, scorer, fmt="csv", chunksize=BULK_CHUNK_ROWS, progress=None):
+    # Streams scored chunks to a file in BULK_OUTPUT_DIR; returns (path, rows scored).
+    # progress(rows_done, fraction_of_input_read) is called after every chunk.
+    size = getattr(source, "size", None) or len(source.getbuffer())
+    fd, path = tempfile.mkstemp(prefix="raincast_scored_", suffix=f".{fmt}", dir=BULK_OUTPUT_DIR)
+    os.close(fd)
+    sink = _ParquetSink(path) if fmt == "parquet" else _CsvSink(path)
+    columns, rows = None, 0
+    try:
+        for chunk in iter_chunks(source, filename, chunksize, as_text=fmt == "parquet"):
+            if columns is None: columns = resolve_columns(chunk)
+            sink.write(scorer.score(chunk, columns))
+            rows += len(chunk)
+            if progress: progress(rows, min(source.tell() / size, 1.0) if size else 0.0)
+    except Exception:
+        sink.close()
+        os.remove(path)
+        raise
+    sink.close()
+    return path, rows
@@ -0,0 +1,284 @@
+import os, re, json, threading, warnings
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Rainfall climatology from the IMD tables in csv/: 1901-2015 monthly series for 36
+# meteorological subdivisions and monthly normals for 641 districts.
+# `flask build-climatology` (or `python -m services.climatology`) turns them into a small
+# store of .npy arrays under model/climatology/ with every per-month statistic precomputed;
+# the app memory-maps it and answers lookups from dicts, without pandas.
+#
+# Regions: subdivisions, states (mean of their subdivisions' series) and districts. Districts
+# only have a normal, so their spread and trend are the parent state's scaled to that normal.
+
+RAINFALL_CSV = "csv/rainfall in india 1901-2015.csv"
+DISTRICT_CSV = "csv/district wise rainfall normal.csv"
+CLIMATOLOGY_DIR = "model/climatology"
+
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+STATS = ["mean", "std", "p10", "p25", "p50", "p75", "p90", "trend_per_decade", "recent_mean", "share_of_annual"]
+RECENT_YEARS = 30
+WET_MONTH_MM = 100.0
+DRY_MONTH_MM = 20.0
+
+# District-table state names -> IMD subdivisions covering them
+STATE_SUBDIVISIONS = {
+    "ANDAMAN AND NICOBAR ISLANDS": ["ANDAMAN & NICOBAR ISLANDS"],
+    "ARUNACHAL PRADESH": ["ARUNACHAL PRADESH"],
+    "ASSAM": ["ASSAM & MEGHALAYA"],
+    "MEGHALAYA": ["ASSAM & MEGHALAYA"],
+    "MANIPUR": ["NAGA MANI MIZO TRIPURA"],
+    "MIZORAM": ["NAGA MANI MIZO TRIPURA"],
+    "NAGALAND": ["NAGA MANI MIZO TRIPURA"],
+    "TRIPURA": ["NAGA MANI MIZO TRIPURA"],
+    "WEST BENGAL": ["SUB HIMALAYAN WEST BENGAL & SIKKIM", "GANGETIC WEST BENGAL"],
+    "SIKKIM": ["SUB HIMALAYAN WEST BENGAL & SIKKIM"],
+    "ORISSA": ["ORISSA"],
+    "JHARKHAND": ["JHARKHAND"],
+    "BIHAR": ["BIHAR"],
+    "UTTAR PRADESH": ["EAST UTTAR PRADESH", "WEST UTTAR PRADESH"],
+    "UTTARANCHAL": ["UTTARAKHAND"],
+    "HARYANA": ["HARYANA DELHI & CHANDIGARH"],
+    "CHANDIGARH": ["HARYANA DELHI & CHANDIGARH"],
+    "DELHI": ["HARYANA DELHI & CHANDIGARH"],
+    "PUNJAB": ["PUNJAB"],
+    "HIMACHAL": ["HIMACHAL PRADESH"],
+    "JAMMU AND KASHMIR": ["JAMMU & KASHMIR"],
+    "RAJASTHAN": ["WEST RAJASTHAN", "EAST RAJASTHAN"],
+    "MADHYA PRADESH": ["WEST MADHYA PRADESH", "EAST MADHYA PRADESH"],
+    "GUJARAT": ["GUJARAT REGION", "SAURASHTRA & KUTCH"],
+    "DADAR NAGAR HAVELI": ["GUJARAT REGION"],
+    "DAMAN AND DUI": ["GUJARAT REGION"],
+    "MAHARASHTRA": ["KONKAN & GOA", "MADHYA MAHARASHTRA", "MATATHWADA", "VIDARBHA"],
+    "GOA": ["KONKAN & GOA"],
+    "CHATISGARH": ["CHHATTISGARH"],
+    "ANDHRA PRADESH": ["COASTAL ANDHRA PRADESH", "TELANGANA", "RAYALSEEMA"],
+    "TAMIL NADU": ["TAMIL NADU"],
+    "PONDICHERRY": ["TAMIL NADU"],
+    "KARNATAKA": ["COASTAL KARNATAKA", "NORTH INTERIOR KARNATAKA", "SOUTH INTERIOR KARNATAKA"],
+    "KERALA": ["KERALA"],
+    "LAKSHADWEEP": ["LAKSHADWEEP"],
+}
+
+# Current spellings (as returned by geocoders) -> names used in the tables
+ALIASES = {
+    "ODISHA": "ORISSA", "UTTARAKHAND": "UTTARANCHAL", "CHHATTISGARH": "CHATISGARH",
+    "HIMACHAL PRADESH": "HIMACHAL", "PUDUCHERRY": "PONDICHERRY", "LADAKH": "JAMMU AND KASHMIR",
+    "NCT OF DELHI": "DELHI", "NATIONAL CAPITAL TERRITORY OF DELHI": "DELHI",
+    "DADRA AND NAGAR HAVELI AND DAMAN AND DIU": "DAMAN AND DUI", "MARATHWADA": "MATATHWADA",
+}
+
+MonthNormal = namedtuple("MonthNormal", ["region", "kind", "month"] + STATS + ["source"])
+
+
+def clean_name(name):
+    name = str(name or "").upper().replace("&", " AND ")
+    name = re.sub(r"[^A-Z0-9 ]+", " ", name)
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def normalize_region(name):
+    name = clean_name(name)
+    return ALIASES.get(name, name)
+
+
+def _trend_per_decade(years, series):
+    # Least-squares slope over the years that have data; series is [years, months]
+    slopes = np.full(series.shape[1], np.nan)
+    for m in range(series.shape[1]):
+        ok = ~np.isnan(series[:, m])
+        if ok.sum() >= 10:
+            slopes[m] = np.polyfit(years[ok], series[ok, m], 1)[0] * 10
+    return slopes
+
+
+def _series_stats(years, series):
+    # series: [years, 12] monthly totals -> [12, len(STATS)]
+    annual = np.nanmean(np.nansum(series, axis=1))
+    mean = np.nanmean(series, axis=0)
+    q = np.nanpercentile(series, [10, 25, 50, 75, 90], axis=0)
+    recent = np.nanmean(series[-RECENT_YEARS:], axis=0)
+    share = mean / annual if annual > 0 else np.full(12, np.nan)
+    return np.column_stack([mean, np.nanstd(series, axis=0), q[0], q[1], q[2], q[3], q[4],
+                            _trend_per_decade(years, series), recent, share])
+
+
+def build_climatology(rainfall_csv=RAINFALL_CSV, district_csv=DISTRICT_CSV, out_dir=CLIMATOLOGY_DIR):
+    rain = pd.read_csv(rainfall_csv, encoding="utf-8-sig")
+    districts = pd.read_csv(district_csv, encoding="utf-8-sig")
+    years = np.arange(int(rain["YEAR"].min()), int(rain["YEAR"].max()) + 1)
+
+    # Full monthly history: subdivisions, then states derived from them
+    names, kinds, parents, history = [], [], [], []
+    for sub, grp in rain.groupby("SUBDIVISION", sort=True):
+        grid = np.full((len(years), 12), np.nan)
+        grid[grp["YEAR"].to_numpy() - years[0]] = grp[MONTHS].to_numpy(dtype=float)
+        names.append(sub); kinds.append("subdivision"); parents.append(None); history.append(grid)
+    sub_ids = {n: i for i, n in enumerate(names)}
+    for state, subs in STATE_SUBDIVISIONS.items():
+        grids = [history[sub_ids[s]] for s in subs if s in sub_ids]
+        if not grids: continue
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # years no subdivision reported
+            history.append(np.nanmean(np.stack(grids), axis=0))
+        names.append(state); kinds.append("state"); parents.append(None)
+    history = np.stack(history)  # [R_hist, years, 12]
+
+    stats = [_series_stats(years, h) for h in history]
+    hist_ids = {(k, n): i for i, (k, n) in enumerate(zip(kinds, names))}
+
+    # Districts: the table's normal as the mean, spread/trend scaled from the parent state
+    for _, row in districts.iterrows():
+        state = normalize_region(row["STATE_UT_NAME"])
+        parent = hist_ids.get(("state", state))
+        normal = row[MONTHS].to_numpy(dtype=float)
+        s = np.full((12, len(STATS)), np.nan)
+        s[:, 0] = normal
+        annual = normal.sum()
+        s[:, STATS.index("share_of_annual")] = normal / annual if annual > 0 else np.nan
+        if parent is not None:
+            ps = stats[parent]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.where(ps[:, 0] > 0, normal / ps[:, 0], np.nan)
+            for col in ("std", "p10", "p25", "p50", "p75", "p90", "trend_per_decade", "recent_mean"):
+                k = STATS.index(col)
+                s[:, k] = ps[:, k] * ratio
+        names.append(str(row["DISTRICT"]).strip()); kinds.append("district"); parents.append(parent)
+        stats.append(s)
+    stats = np.stack(stats)  # [R, 12, len(STATS)]
+
+    # Sorted values per region-month for percentile ranks, anomalies against the monthly mean
+    sorted_history = np.sort(np.transpose(history, (0, 2, 1)), axis=2)  # NaN sort last
+    anomalies = history - stats[:len(history), :, 0][:, None, :]
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "stats.npy"), stats.astype(np.float32))
+    np.save(os.path.join(out_dir, "sorted.npy"), sorted_history.astype(np.float32))
+    np.save(os.path.join(out_dir, "anomalies.npy"), anomalies.astype(np.float32))
+    meta = {"names": names, "kinds": kinds, "parents": parents, "stats": STATS,
+            "first_year": int(years[0]), "last_year": int(years[-1]), "history_regions": len(history)}
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return len(names)
+
+
+class Climatology:
+    def __init__(self, path=CLIMATOLOGY_DIR):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.names, self.kinds, self.parents = meta["names"], meta["kinds"], meta["parents"]
+        self.first_year, self.last_year = meta["first_year"], meta["last_year"]
+        self.history_regions = meta["history_regions"]
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        self.stats, self.sorted, self.anomalies = load("stats"), load("sorted"), load("anomalies")
+        self._counts = (~np.isnan(self.sorted)).sum(axis=2)  # [R_hist, 12]
+
+        # Name index: districts win over states over subdivisions for the same spelling
+        self.index = {}
+        for kind in ("subdivision", "state", "district"):
+            for i, (k, n) in enumerate(zip(self.kinds, self.names)):
+                if k == kind: self.index.setdefault(kind, {})[normalize_region(n)] = i
+        self._normals = {}
+
+    def resolve(self, name, state=None):
+        # Region id for a place name (district, state or subdivision) or, failing that, its state
+        key, state_key = normalize_region(name), normalize_region(state)
+        for kind in ("district", "state", "subdivision"):
+            rid = self.index.get(kind, {}).get(key)
+            if rid is not None: return rid
+        if state_key:
+            return self.index.get("state", {}).get(state_key, self.index.get("subdivision", {}).get(state_key))
+        return None
+
+    def normal(self, region, month):
+        # MonthNormal for a region id and month 1-12; built once per pair, then a dict hit
+        cached = self._normals.get((region, month))
+        if cached is None:
+            values = [None if v != v else round(float(v), 3) for v in self.stats[region, month - 1].tolist()]
+            parent = self.parents[region]
+            source = f"district normal, spread from {self.names[parent].title()}" if parent is not None else \
+                     f"IMD {self.first_year}-{self.last_year}" if self.kinds[region] != "district" else "district normal"
+            cached = self._normals[(region, month)] = MonthNormal(self.names[region], self.kinds[region], month, *values, source)
+        return cached
+
+    def compare(self, region, month, observed_mm):
+        # Observed monthly rainfall against the normal: anomaly, % of normal, percentile rank
+        n = self.normal(region, month)
+        hist = region if region < self.history_regions else self.parents[region]
+        rank = None
+        if hist is not None:
+            # Districts are ranked against the parent's years scaled to the district normal
+            parent_mean = float(self.stats[hist, month - 1, 0])
+            scale = n.mean / parent_mean if region >= self.history_regions and parent_mean > 0 else 1.0
+            count = int(self._counts[hist, month - 1])
+            if count:
+                below = np.searchsorted(self.sorted[hist, month - 1, :count], observed_mm / scale, side="right")
+                rank = round(100.0 * int(below) / count, 1)
+        return {
+            "normal_mm": n.mean,
+            "anomaly_mm": round(observed_mm - n.mean, 1),
+            "percent_of_normal": round(100.0 * observed_mm / n.mean, 1) if n.mean else None,
+            "percentile": rank,
+        }
+
+    def anomaly(self, region, year, month):
+        # Historical anomaly (mm vs. the monthly mean) for subdivisions and states
+        if region >= self.history_regions or not self.first_year <= year <= self.last_year: return None
+        v = float(self.anomalies[region, year - self.first_year, month - 1])
+        return None if v != v else round(v, 1)
+
+    def summary(self, region, month):
+        # Compact dict for templates and JSON
+        n = self.normal(region, month)
+        return {
+            "region": n.region.title(), "kind": n.kind, "month": MONTHS[month - 1].title(),
+            "normal_mm": n.mean, "p10_mm": n.p10, "p90_mm": n.p90,
+            "trend_per_decade": n.trend_per_decade, "share_of_annual": n.share_of_annual,
+            "wet_month": n.mean >= WET_MONTH_MM, "dry_month": n.mean < DRY_MONTH_MM, "source": n.source,
+        }
+
+
+_climatology = None
+_lock = threading.Lock()
+
+
+def get_climatology():
+    # Shared instance; builds the store from the CSVs on first use if it is missing
+    global _climatology
+    if _climatology is None:
+        with _lock:
+            if _climatology is None:
+                try:
+                    if not os.path.exists(os.path.join(CLIMATOLOGY_DIR, "meta.json")):
+                        build_climatology()
+                    _climatology = Climatology()
+                except Exception as e:
+                    print(f"Climatology Warning: {e}")
+                    _climatology = False
+    return _climatology or None
+
+
+def climate_summary(name, state=None, month=None, district=None, country=None):
+    # district: a resolve_district() result; its row is the district's region, which is
+    # more specific than anything the name alone resolves to. The tables are Indian only.
+    from datetime import datetime
+    if country is not None and country != "IN": return None
+    clim = get_climatology()
+    if clim is None: return None
+    region = clim.history_regions + district["row"] if district else clim.resolve(name, state)
+    if region is None: return None
+    return clim.summary(region, month or datetime.now().month)
+
+
+def register_commands(app):
+    import click
+
+    @app.cli.command("build-climatology")
+    def build_command():
+        """Precompute the rainfall climatology store from the csv/ tables."""
+        click.echo(f"Built {build_climatology()} regions into {CLIMATOLOGY_DIR}")
+
+
+if __name__ == "__main__":
+    print(f"Built {build_climatology()} regions into {CLIMATOLOGY_DIR}")
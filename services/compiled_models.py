@@ -0,0 +1,168 @@
+import numpy as np
+
+# sklearn's predict() validates and converts its input on every call, which costs far
+# more than the arithmetic for a 1x5 row. These evaluators copy the fitted parameters
+# into flat NumPy arrays once and reproduce predict() exactly without sklearn.
+
+MODEL_REG_PATH = "model/temp_regressor.pkl"
+MODEL_CLF_PATH = "model/rain_classifier.pkl"
+HISTORY_FILE = "data/prediction_history.csv"
+
+
+class CompiledLinear:
+    def __init__(self, coef, intercept):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = intercept
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1: X = X.reshape(1, -1)
+        return X @ self.coef + self.intercept
+
+
+class CompiledForest:
+    # All trees are concatenated into one node table; node ids are global offsets.
+    # Leaves point to themselves so every row can step max_depth times without branching.
+    def __init__(self, trees, classes=None):
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for tree in trees:
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            ids = np.arange(n) + offset
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, ids, tree.children_left + offset))
+            right.append(np.where(is_leaf, ids, tree.children_right + offset))
+            if classes is not None:
+                proba = tree.value[:, 0, :len(classes)].copy()
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+                value.append(proba)
+            else:
+                value.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.feature = np.ascontiguousarray(np.concatenate(feature), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(threshold), dtype=np.float64)
+        self.left = np.ascontiguousarray(np.concatenate(left), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.concatenate(right), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(value), dtype=np.float64)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = max_depth
+        self.classes = classes
+
+    def apply(self, X):
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1: X = X.reshape(1, -1)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # Accumulate tree by tree, in order, so float sums match sklearn bit for bit
+        total = np.zeros((leaves.shape[0], self.value.shape[1]))
+        for t in range(leaves.shape[1]):
+            total += self.value[leaves[:, t]]
+        total /= leaves.shape[1]
+        return total
+
+    def predict(self, X):
+        if self.classes is not None:
+            return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+        leaves = self.apply(X)
+        total = np.zeros(leaves.shape[0])
+        for t in range(leaves.shape[1]):
+            total += self.value[leaves[:, t]]
+        return total / leaves.shape[1]
+
+
+def _supported_models():
+    from sklearn.linear_model import LinearRegression, Ridge, Lasso, ElasticNet
+    from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor
+    # Forests average equally weighted trees that each see every feature; AdaBoost (weighted
+    # votes) and Bagging (per-estimator feature subsets) do not, so they stay on sklearn
+    return ((LinearRegression, Ridge, Lasso, ElasticNet), (DecisionTreeClassifier, DecisionTreeRegressor),
+            (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor))
+
+
+def compile_estimator(est):
+    # Plain linear regressors, single decision trees and random/extra-trees forests are
+    # supported; anything else raises TypeError so callers keep the sklearn object.
+    linear, single, forests = _supported_models()
+    if isinstance(est, forests):
+        trees = [e.tree_ for e in est.estimators_]
+    elif isinstance(est, single):
+        trees = [est.tree_]
+    elif isinstance(est, linear):
+        coef = np.asarray(est.coef_)
+        if coef.ndim != 1: raise TypeError("Only single-output linear models can be compiled")
+        return CompiledLinear(coef, float(est.intercept_))
+    else:
+        raise TypeError(f"Cannot compile {type(est).__name__}")
+
+    if getattr(est, "n_outputs_", 1) != 1:
+        raise TypeError("Only single-output tree models can be compiled")
+    return CompiledForest(trees, getattr(est, "classes_", None))
+
+
+def compile_or_keep(est):
+    # Unsupported estimators stay on the sklearn path instead of taking the AI offline
+    try:
+        return compile_estimator(est)
+    except TypeError as e:
+        print(f"Model Compile Warning: {e}")
+        return est
+
+
+def load_compiled(path):
+    import joblib
+    return compile_estimator(joblib.load(path))
+
+
+def _history_features(le_city, le_mode, path=HISTORY_FILE):
+    import pandas as pd
+    df = pd.read_csv(path).dropna(subset=['Temp', 'Hum', 'Press', 'Wind'])
+    city_lookup = {c: i for i, c in enumerate(le_city.classes_)}
+    mode_lookup = {m: i for i, m in enumerate(le_mode.classes_)}
+    c_codes = df['City'].map(city_lookup).fillna(0).to_numpy(dtype=float)
+    m_codes = df['Mode'].fillna('standard').map(mode_lookup).fillna(0).to_numpy(dtype=float)
+    nums = df[['Temp', 'Hum', 'Press', 'Wind']].to_numpy(dtype=float)
+    rain_X = np.column_stack([nums, c_codes])
+    temp_X = np.column_stack([nums[:, 1:], c_codes, m_codes])
+    return rain_X, temp_X
+
+
+def benchmark(repeat=2000):
+    # Per-row and batch timings on the logged history (exactness: tests/test_compiled_models.py)
+    import joblib, time
+    le_city = joblib.load("model/city_encoder.pkl")
+    le_mode = joblib.load("model/mode_encoder.pkl")
+    rain_X, temp_X = _history_features(le_city, le_mode)
+
+    for name, path, X in [("temp_regressor", MODEL_REG_PATH, temp_X), ("rain_classifier", MODEL_CLF_PATH, rain_X)]:
+        est = joblib.load(path)
+        compiled = compile_estimator(est)
+        row = X[:1].tolist()
+        t0 = time.perf_counter()
+        for _ in range(repeat): est.predict(row)
+        t1 = time.perf_counter()
+        for _ in range(repeat): compiled.predict(row)
+        t2 = time.perf_counter()
+        est.predict(X); t3 = time.perf_counter()
+        compiled.predict(X); t4 = time.perf_counter()
+        print(f"{name}: {len(X)} rows | single row sklearn {(t1 - t0) / repeat * 1e6:.1f}us, "
+              f"compiled {(t2 - t1) / repeat * 1e6:.1f}us | batch sklearn {(t3 - t2) * 1e3:.2f}ms, compiled {(t4 - t3) * 1e3:.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,142 @@
+import io, re, bisect, hashlib
+import numpy as np
+import pandas as pd
+
+# Search index for datasets uploaded to the Streamlit "Process from Dataset" flow.
+# Each text column is factorized once, so lookups run over distinct values instead of rows:
+# a normalized value -> row positions map plus a sorted token list for prefix matches.
+# Matches are ranked: exact value, whole-word, word prefix, then plain substring.
+
+CITY_COLUMNS = ['city', 'location', 'name', 'place', 'district', 'subdivision', 'state_ut_name', 'state']
+TEMP_COLUMNS = ['temp', 'temperature', 't', 'avgtemp']
+HUM_COLUMNS = ['humidity', 'hum', 'h']
+PRESS_COLUMNS = ['pressure', 'press', 'p']
+WIND_COLUMNS = ['wind', 'windspeed', 'wind_speed', 'w']
+
+EXACT, WORD, PREFIX, SUBSTRING = 0, 1, 2, 3
+MATCH_LABELS = {EXACT: "exact", WORD: "word", PREFIX: "prefix", SUBSTRING: "substring"}
+
+_SPACES = re.compile(r"[\s,_\-/]+")
+
+
+def content_digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def normalize_text(value):
+    return _SPACES.sub(" ", str(value).lower()).strip()
+
+
+def read_dataset(data, filename):
+    if filename.endswith('.csv'):
+        return pd.read_csv(io.BytesIO(data))
+    return pd.read_json(io.BytesIO(data))
+
+
+def find_col(dataframe, possible_names):
+    for col in dataframe.columns:
+        if str(col).lower() in possible_names: return col
+    return None
+
+
+def resolve_columns(df):
+    return {
+        "city": find_col(df, CITY_COLUMNS),
+        "temp": find_col(df, TEMP_COLUMNS),
+        "hum": find_col(df, HUM_COLUMNS),
+        "press": find_col(df, PRESS_COLUMNS),
+        "wind": find_col(df, WIND_COLUMNS),
+    }
+
+
+class DatasetIndex:
+    def __init__(self, df):
+        self.df = df
+        self.columns = resolve_columns(df)
+        self.values = []  # normalized distinct values across all text columns
+        self.value_rows = []  # row positions holding each value
+        self.value_column = []
+        tokens = {}
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            series = df[col]
+            normalized = series.where(series.isna(), series.astype(str).str.lower().str.replace(_SPACES, " ", regex=True).str.strip())
+            codes, uniques = pd.factorize(normalized)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            for i, value in enumerate(uniques):
+                value_id = len(self.values)
+                self.values.append(value)
+                self.value_rows.append(order[bounds[i]:bounds[i + 1]])
+                self.value_column.append(col)
+                for token in set(value.split()):
+                    tokens.setdefault(token, []).append(value_id)
+        self.tokens = tokens
+        self.sorted_tokens = sorted(tokens)
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        i = bisect.bisect_left(self.sorted_tokens, prefix)
+        while i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(prefix):
+            ids.update(self.tokens[self.sorted_tokens[i]])
+            i += 1
+        return ids
+
+    def _rank_values(self, query):
+        # value id -> match rank; every query word must match a word (or word prefix) of the value
+        words = query.split()
+        if not words: return {}
+        word_sets = [set(self.tokens.get(w, ())) for w in words]
+        prefix_sets = [self._prefix_ids(w) for w in words]
+        ranks = {}
+        for vid in set.intersection(*prefix_sets):
+            whole = all(vid in s for s in word_sets)
+            ranks[vid] = EXACT if self.values[vid] == query else WORD if whole else PREFIX
+        if not ranks:
+            # Same semantics as the old str.contains scan, but over distinct values only
+            for vid, value in enumerate(self.values):
+                if query in value: ranks[vid] = SUBSTRING
+        return ranks
+
+    def search(self, query, limit=20):
+        # Ranked matching rows: the original columns plus match/matched_column, best first and
+        # in file order within a rank; result.attrs["total"] counts every matching row and
+        # result.attrs["positions"] holds each returned row's position in the file
+        ranks = self._rank_values(normalize_text(query))
+        by_rank = {}
+        for vid, rank in ranks.items():
+            by_rank.setdefault(rank, []).append(vid)
+        picked, labels, matched, seen, total = [], [], [], np.zeros(0, dtype=np.int64), 0
+        for rank in sorted(by_rank):
+            vids = by_rank[rank]
+            rows = np.concatenate([self.value_rows[v] for v in vids])
+            owner = np.repeat(np.array(vids), [len(self.value_rows[v]) for v in vids])
+            rows, first = np.unique(rows, return_index=True)
+            keep = ~np.isin(rows, seen)
+            rows, owner = rows[keep], owner[first][keep]
+            total += len(rows)
+            seen = np.concatenate([seen, rows])
+            take = max(0, limit - len(picked))
+            picked.extend(rows[:take].tolist())
+            labels.extend([MATCH_LABELS[rank]] * len(rows[:take]))
+            matched.extend(self.value_column[v] for v in owner[:take].tolist())
+        result = self.df.iloc[picked].copy()
+        result.insert(0, "match", labels)
+        result.insert(1, "matched_column", matched)
+        result.attrs["total"] = total
+        result.attrs["positions"] = picked
+        return result
+
+    def row_inputs(self, row, position):
+        # (name, temp, hum, press, wind) from a row, with the dashboard's defaults for gaps
+        cols = self.columns
+        def num(key, default):
+            col = cols[key]
+            if col is None or pd.isnull(row[col]): return default
+            try: return float(row[col])
+            except (TypeError, ValueError): return default
+        name = str(row[cols["city"]]) if cols["city"] is not None else f"Location {position + 1}"
+        return name, num("temp", 25.0), num("hum", 60.0), num("press", 1013.0), num("wind", 10.0)
+
+
+def build_index(data, filename):
+    return DatasetIndex(read_dataset(data, filename))
@@ -0,0 +1,241 @@
+import os, re, json, threading
+from functools import lru_cache
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from services.climatology import DISTRICT_CSV, clean_name, normalize_region
+
+# Maps a geocoded place to a row of csv/district wise rainfall normal.csv.
+# 1. Names: a trie over normalized district names and their short forms ("MUMBAI CITY" is
+#    also "MUMBAI", "KHUNTI(RANCHI" also "KHUNTI"), walked with a bounded edit distance
+#    so spelling drift still matches. When the geocoder names the state, only districts of
+#    that state match; places outside India never match.
+# 2. Coordinates: nearest anchor point in a KD-tree (unit vectors on the sphere), for places
+#    whose name is not a district. Anchors come from model/district_centroids.json, built by
+#    `flask build-district-index` (geocodes every district when API_KEY is set and adds the
+#    named points found in the prediction history). The shipped file holds the history points
+#    only; without the file the history points are read directly.
+# Everything is built once per process; a lookup is a few dict/trie steps or one tree query.
+
+CENTROIDS_PATH = "model/district_centroids.json"
+HISTORY_FILE = "data/prediction_history.csv"
+DISTRICT_MAX_KM = float(os.getenv("DISTRICT_MAX_KM", "60"))
+EARTH_RADIUS_KM = 6371.0
+
+# Table abbreviations and old names: short form -> extra spellings it should answer to.
+# The bare city name prefers its urban district ("BANGALORE" is URB, not RUR)
+URBAN_SUFFIXES = {"CITY", "URB", "URBAN"}
+SUFFIXES = URBAN_SUFFIXES | {"SUB", "RUR", "RURAL", "SUBURBAN", "F D"}
+PREFIXES = {"NORTH", "SOUTH", "EAST", "WEST", "CENTRAL", "NE", "NW", "SE", "SW", "NEW", "UPPER", "LOWER"}
+CITY_ALIASES = {
+    "BENGALURU": "BANGALORE", "GURUGRAM": "GURGAON", "PRAYAGRAJ": "ALLAHABAD", "MYSURU": "MYSORE",
+    "BELAGAVI": "BELGAUM", "KALABURAGI": "GULBARGA", "MANGALURU": "DAKSHIN KANNADA",
+    "BOMBAY": "MUMBAI", "CALCUTTA": "KOLKATA", "MADRAS": "CHENNAI", "TRIVANDRUM": "THIRUVANANTHAPURAM",
+}
+
+# Geocoder states -> the table's states; the table predates Telangana and the 2020 UT merger
+TABLE_STATES = {"TELANGANA": {"ANDHRA PRADESH"}, "DAMAN AND DUI": {"DAMAN AND DUI", "DADAR NAGAR HAVELI"}}
+COUNTRY = "IN"
+
+DistrictMatch = namedtuple("DistrictMatch", ["row", "state", "district", "method", "distance"])
+
+
+def normalize_place(name):
+    key = clean_name(name)
+    return CITY_ALIASES.get(key, key)
+
+
+def name_variants(district):
+    # (spelling, penalty): the full normalized name first, then derived short forms
+    full = clean_name(district)
+    variants = [(full, 0)]
+    base = clean_name(re.split(r"[(/]", district)[0])
+    if base and base != full: variants.append((base, 1))
+    words = base.split()
+    if len(words) > 1 and " ".join(words[1:]) in SUFFIXES:
+        variants.append((words[0], 1 if " ".join(words[1:]) in URBAN_SUFFIXES else 2))
+    if len(words) > 1 and words[0] in PREFIXES: variants.append((" ".join(words[1:]), 2))
+    return variants
+
+
+class NameTrie:
+    # Nodes are dicts keyed by character; None holds the values of a complete name and
+    # LENGTHS the shortest/longest name below the node, so the fuzzy walk can skip subtrees
+    # whose names are too short or too long to be within the edit budget
+    LENGTHS = ""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, word, value):
+        node = self.root
+        for ch in word:
+            lo, hi = node.get(self.LENGTHS, (len(word), len(word)))
+            node[self.LENGTHS] = (min(lo, len(word)), max(hi, len(word)))
+            node = node.setdefault(ch, {})
+        node[self.LENGTHS] = node.get(self.LENGTHS, (len(word), len(word)))
+        node.setdefault(None, []).append(value)
+
+    def exact(self, word):
+        node = self.root
+        for ch in word:
+            node = node.get(ch)
+            if node is None: return []
+        return node.get(None, [])
+
+    def fuzzy(self, word, max_edits):
+        # (edits, value) for every entry within max_edits Levenshtein edits of word.
+        # Only names sharing the first letter are walked: misspellings rarely start wrong,
+        # and it keeps the walk to one small subtree
+        results = []
+        n = len(word)
+        child = self.root.get(word[0]) if word else None
+        if child is None: return results
+
+        def walk(node, ch, prev):
+            lo, hi = node[self.LENGTHS]
+            if n < lo - max_edits or n > hi + max_edits: return
+            row = [prev[0] + 1]
+            for i in range(1, n + 1):
+                row.append(min(row[i - 1] + 1, prev[i] + 1, prev[i - 1] + (word[i - 1] != ch)))
+            if row[-1] <= max_edits and None in node:
+                results.extend((row[-1], v) for v in node[None])
+            if min(row) <= max_edits:
+                for nch, nxt in node.items():
+                    if nch: walk(nxt, nch, row)
+
+        walk(child, word[0], list(range(n + 1)))
+        return results
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class DistrictIndex:
+    def __init__(self, district_csv=DISTRICT_CSV, centroids_path=CENTROIDS_PATH, history_file=HISTORY_FILE):
+        table = pd.read_csv(district_csv, encoding="utf-8-sig")
+        self.rows = list(zip(table["STATE_UT_NAME"].str.strip(), table["DISTRICT"].str.strip()))
+        self.row_states = [normalize_region(s) for s, _ in self.rows]
+        self.trie = NameTrie()
+        for row, (_, district) in enumerate(self.rows):
+            for spelling, penalty in name_variants(district):
+                self.trie.insert(spelling, (penalty, row))
+        self.by_name = lru_cache(maxsize=4096)(self._by_name)
+        self._load_anchors(centroids_path, history_file)
+
+    def _load_anchors(self, path, history_file):
+        keys = {(normalize_region(s), clean_name(d)): row for row, (s, d) in enumerate(self.rows)}
+        points, rows = [], []
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f: items = json.load(f)
+        else:
+            items = history_anchors(self, history_file) if history_file else []
+        for item in items:
+            row = keys.get((normalize_region(item["state"]), clean_name(item["district"])))
+            if row is not None and item.get("lat") is not None:
+                points.append((item["lat"], item["lon"])); rows.append(row)
+        self.anchor_rows = np.array(rows, dtype=int)
+        self.tree = None
+        if points:
+            from scipy.spatial import cKDTree
+            self.tree = cKDTree(_unit_vectors(*zip(*points)))
+
+    def _match(self, row, method, distance):
+        state, district = self.rows[row]
+        return DistrictMatch(row, state, district, method, distance)
+
+    def _by_name(self, name, state=None):
+        key = normalize_place(name)
+        if not key: return None
+        states = None
+        if state:
+            state_key = normalize_region(state)
+            states = TABLE_STATES.get(state_key, {state_key})
+        # Short names only match exactly; longer ones tolerate one or two typos
+        max_edits = 0 if len(key) <= 4 else 1 if len(key) <= 8 else 2
+        # A known state must agree: Salem, Oregon is not Salem, Tamil Nadu
+        in_state = lambda cands: cands if states is None else [c for c in cands if self.row_states[c[1][1]] in states]
+        found = in_state([(0, v) for v in self.trie.exact(key)]) or (in_state(self.trie.fuzzy(key, max_edits)) if max_edits else [])
+        if not found: return None
+        edits, (penalty, row) = min(found, key=lambda c: (c[0], c[1][0], c[1][1]))
+        return self._match(row, "fuzzy" if edits else "name" if penalty == 0 else "short_name", edits)
+
+    def nearest(self, lat, lon, max_km=DISTRICT_MAX_KM):
+        if self.tree is None or lat is None or lon is None: return None
+        chord, i = self.tree.query(_unit_vectors([lat], [lon])[0])
+        km = 2 * EARTH_RADIUS_KM * np.arcsin(min(chord / 2, 1.0))
+        if km > max_km: return None
+        return self._match(int(self.anchor_rows[i]), "nearest", round(float(km), 1))
+
+    def resolve(self, name, state=None, lat=None, lon=None, country=None):
+        # The table only covers India; country None means the caller does not know it
+        if country is not None and country != COUNTRY: return None
+        return self.by_name(name, state) or self.nearest(lat, lon)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_district_index():
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                try: _index = DistrictIndex()
+                except Exception as e:
+                    print(f"District Index Warning: {e}")
+                    _index = False
+    return _index or None
+
+
+def resolve_district(name, state=None, lat=None, lon=None, country=None):
+    # Plain dict (stored with cached geocodes) or None
+    index = get_district_index()
+    match = index.resolve(name, state, lat, lon, country) if index is not None else None
+    return match._asdict() if match is not None else None
+
+
+def history_anchors(index, history_file=HISTORY_FILE):
+    # Median point of every logged city whose name is a district (not a fuzzy guess)
+    anchors = []
+    if not os.path.exists(history_file): return anchors
+    seen = pd.read_csv(history_file).dropna(subset=["Lat", "Lon"]).groupby("City")[["Lat", "Lon"]].median()
+    for city, (lat, lon) in seen.iterrows():
+        match = index.by_name(city)
+        if match is not None and match.method != "fuzzy":
+            anchors.append({"state": match.state, "district": match.district, "lat": float(lat), "lon": float(lon), "source": "history"})
+    return anchors
+
+
+def build_centroids(geocode=None, out_path=CENTROIDS_PATH, history_file=HISTORY_FILE):
+    # geocode(query) -> {"lat", "lon", ...} or None; one call per district, then the named
+    # places from the prediction history as extra anchors. Without geocode, history only
+    index = DistrictIndex(centroids_path=None, history_file=None)
+    anchors = []
+    for state, district in index.rows if geocode is not None else []:
+        query = clean_name(re.split(r"[(/]", district)[0]).title()
+        try: geo = geocode(f"{query},{state.title()},IN")
+        except Exception as e:
+            print(f"Geocode Warning: {district}: {e}")
+            geo = None
+        if geo and geo.get("country") in (None, COUNTRY): anchors.append({"state": state, "district": district, "lat": geo["lat"], "lon": geo["lon"], "source": "geocode"})
+    anchors += history_anchors(index, history_file)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(anchors, f, indent=0)
+    return len(anchors)
+
+
+def register_commands(app):
+    import click
+
+    @app.cli.command("build-district-index")
+    def build_command():
+        """Geocode every district once and store the anchor points for nearest-district lookups."""
+        from services.geocache import geocode_city
+        api_key = os.getenv("API_KEY", "")
+        if not api_key: click.echo("API_KEY is not set: storing the prediction-history anchors only")
+        geocode = (lambda q: geocode_city(q, api_key)) if api_key else None
+        click.echo(f"Stored {build_centroids(geocode)} anchors in {CENTROIDS_PATH}")
@@ -0,0 +1,132 @@
+import os, time, asyncio
+from services.geocache import geocode_city_async, cached_geocode, normalize_city
+from services.weather_data import (get_current_weather, get_air_quality, parse_current, parse_aqi,
+                                   upstream_cache, coord_key, WEATHER_TTL, AQI_TTL)
+from services.upstream_scheduler import FANOUT, priority, capacity
+
+# Current conditions plus the AI prediction for many places in one call (/api/conditions).
+# Each place is geocoded and fetched on the shared loop, at most FANOUT_CONCURRENCY at a
+# time, through the same caches as the dashboard; duplicates are fetched once. Whatever
+# has not finished by the deadline is reported as an error for that place, and all the
+# places that did finish are scored with a single batch prediction.
+# Budget: an uncached city costs up to 3 OpenWeather calls (geocode, current weather, AQI).
+# Fan-out calls queue behind page views for up to the deadline, so a request is admitted only
+# if its uncached calls fit in the bucket by then (burst + rate * deadline, about 30 calls or
+# 10 new cities at the free-plan defaults); larger ones are rejected up front with
+# FanoutOverBudget instead of coming back as per-city "quota exhausted" errors.
+# FANOUT_MAX_ITEMS caps the list itself, mostly cached places.
+
+OPENWEATHER_URL = "https://api.openweathermap.org/"
+FANOUT_MAX_ITEMS = int(os.getenv("FANOUT_MAX_ITEMS", "500"))
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "32"))
+FANOUT_DEADLINE = float(os.getenv("FANOUT_DEADLINE", "20"))
+
+
+class InvalidPlace(ValueError):
+    pass
+
+
+class FanoutOverBudget(Exception):
+    def __init__(self, needed, available, deadline):
+        super().__init__(f"Uncached places in this request need about {needed} OpenWeather calls but only {available} fit "
+                         f"in {deadline:g}s; send fewer uncached places or retry shortly.")
+        self.needed, self.available = needed, available
+
+
+def parse_place(item):
+    # "Pune", {"city": "Pune"} or {"lat": 18.52, "lon": 73.86, "name": "Pune"} -> (key, place)
+    if isinstance(item, str): item = {"city": item}
+    if not isinstance(item, dict): raise InvalidPlace(f"Unsupported entry: {item!r}")
+    if item.get("lat") is not None and item.get("lon") is not None:
+        try: lat, lon = float(item["lat"]), float(item["lon"])
+        except (TypeError, ValueError): raise InvalidPlace(f"Invalid coordinates: {item!r}")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180): raise InvalidPlace(f"Coordinates out of range: {item!r}")
+        name = str(item.get("name") or f"{lat:.2f},{lon:.2f}")
+        return ("coords", round(lat, 4), round(lon, 4)), {"lat": lat, "lon": lon, "name": name}
+    city = str(item.get("city") or "").strip()
+    if not city: raise InvalidPlace(f"Entry needs a city or lat/lon: {item!r}")
+    return ("city", normalize_city(city)), {"city": city}
+
+
+def _is_cached(source, lat, lon, ttls):
+    # Fresh or stale-servable: answered without an interactive upstream call
+    age = upstream_cache.age((source,) + coord_key(lat, lon))
+    return age is not None and age < sum(ttls)
+
+
+def upstream_calls(places):
+    # OpenWeather calls the places still need; reads the geocode cache (SQLite), so run it in a thread
+    calls = 0
+    for place in places:
+        if "city" in place:
+            cached, geo = cached_geocode(place["city"])
+            if not cached:
+                calls += 3
+                continue
+            if geo is None: continue  # known unknown city
+            lat, lon = geo["lat"], geo["lon"]
+        else:
+            lat, lon = place["lat"], place["lon"]
+        calls += (not _is_cached("weather", lat, lon, WEATHER_TTL)) + (not _is_cached("aqi", lat, lon, AQI_TTL))
+    return calls
+
+
+async def _conditions(place, api_key, sem):
+    priority.set(FANOUT)  # this task only
+    async with sem:
+        if "city" in place:
+            geo = await geocode_city_async(place["city"], api_key)
+            if not geo: raise LookupError(f"City '{place['city']}' not found.")
+            lat, lon, name = geo["lat"], geo["lon"], geo["name"]
+        else:
+            lat, lon, name = place["lat"], place["lon"], place["name"]
+        w_data, aqi_data = await asyncio.gather(get_current_weather(lat, lon), get_air_quality(lat, lon))
+    cur = parse_current(w_data)
+    return {"city": name, "lat": lat, "lon": lon, "temp": cur["temp"], "hum": cur["hum"], "pressure": cur["pressure"],
+            "wind": cur["wind"], "feels_like": cur["feels_like"], "condition_id": cur["condition_id"], "aqi": parse_aqi(aqi_data)}
+
+
+def _error(e):
+    if isinstance(e, (LookupError, InvalidPlace)): return str(e)
+    return f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+
+
+async def fetch_conditions(items, mode, api_key, predict_batch, concurrency=FANOUT_CONCURRENCY, deadline=FANOUT_DEADLINE):
+    # One result per input entry, in order: the conditions and prediction, or {"error": ...}
+    start = time.perf_counter()
+    sem = asyncio.Semaphore(concurrency)
+    keys, places, invalid = [], {}, {}
+    for i, item in enumerate(items):
+        try:
+            key, place = parse_place(item)
+        except InvalidPlace as e:
+            keys.append(None); invalid[i] = str(e)
+            continue
+        keys.append(key)
+        places.setdefault(key, place)
+
+    needed = await asyncio.to_thread(upstream_calls, places.values())
+    available = capacity(OPENWEATHER_URL, deadline)
+    if needed > available: raise FanoutOverBudget(needed, available, deadline)
+    tasks = {key: asyncio.ensure_future(_conditions(place, api_key, sem)) for key, place in places.items()}
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=deadline) if tasks else (set(), set())
+    for task in pending: task.cancel()
+
+    outcomes = {}
+    for key, task in tasks.items():
+        if task in pending: outcomes[key] = {"error": f"Deadline of {deadline:g}s exceeded."}
+        elif task.exception() is not None: outcomes[key] = {"error": _error(task.exception())}
+        else: outcomes[key] = task.result()
+
+    scored = [k for k, v in outcomes.items() if "error" not in v]
+    # Off the shared loop: a model load or a remote inference call blocks
+    predictions = await asyncio.to_thread(predict_batch, [(outcomes[k]["temp"], outcomes[k]["hum"], outcomes[k]["pressure"], outcomes[k]["wind"], outcomes[k]["city"], mode) for k in scored])
+    for key, (prediction, ai_temp) in zip(scored, predictions):
+        outcomes[key] = dict(outcomes[key], prediction=prediction, ai_temp=ai_temp)
+
+    results = []
+    for i, (item, key) in enumerate(zip(items, keys)):
+        outcome = {"error": invalid[i]} if key is None else outcomes[key]
+        results.append(dict(outcome, query=item))
+    return results, round((time.perf_counter() - start) * 1000, 1)
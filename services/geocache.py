@@ -0,0 +1,178 @@
+import os, json, time, asyncio, sqlite3, threading
+from collections import OrderedDict
+import requests
+
+# Two-tier cache in front of the OpenWeather geocoding endpoint: an in-process LRU
+# backed by a table in weather_intelligence.db, so every gunicorn worker and the
+# Streamlit app share results. Misses ("city not found") are cached too, for less time.
+
+DB_PATH = os.getenv("GEOCODE_DB_PATH", "instance/weather_intelligence.db")
+GEOCODE_TTL = float(os.getenv("GEOCODE_TTL", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", "3600"))
+GEOCODE_LRU_SIZE = int(os.getenv("GEOCODE_LRU_SIZE", "2048"))
+
+_MISSING = object()
+
+
+def normalize_city(city):
+    return " ".join(str(city).split()).casefold()
+
+
+class GeocodeCache:
+    def __init__(self, db_path=DB_PATH, ttl=GEOCODE_TTL, negative_ttl=GEOCODE_NEGATIVE_TTL, maxsize=GEOCODE_LRU_SIZE):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.hits = {"memory": 0, "sqlite": 0, "miss": 0}
+
+    def _connect(self):
+        if not self._table_ready:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        if not self._table_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                "query TEXT PRIMARY KEY, lat REAL, lon REAL, name TEXT, expires_at REAL NOT NULL)"
+            )
+            # Added later: state, country, and the resolved rainfall district as JSON ("null" = no match)
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(geocode_cache)")}
+            for column in ("state", "district", "country"):
+                if column not in columns: conn.execute(f"ALTER TABLE geocode_cache ADD COLUMN {column} TEXT")
+            conn.commit()
+            self._table_ready = True
+        return conn
+
+    def _execute(self, sql, params):
+        # The SQLite tier is best effort: on error the request just goes upstream
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    return conn.execute(sql, params).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Geocode Cache Warning: {e}")
+            return None
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._lru[key] = (expires_at, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    def get(self, key, memory_only=False):
+        # Returns the cached location dict, None for a cached miss, or _MISSING
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._lru.move_to_end(key)
+                    self.hits["memory"] += 1
+                    return entry[1]
+                del self._lru[key]
+        if memory_only: return _MISSING
+        # Hits stored before the country was kept are refetched, so their district is re-resolved
+        row = self._execute(
+            "SELECT lat, lon, name, expires_at, state, district, country FROM geocode_cache "
+            "WHERE query = ? AND expires_at > ? AND (lat IS NULL OR country IS NOT NULL)",
+            (key, now),
+        )
+        if row is None:
+            self.hits["miss"] += 1
+            return _MISSING
+        value = None if row[0] is None else {"lat": row[0], "lon": row[1], "name": row[2], "state": row[4], "country": row[6] or None}
+        if value is not None and row[5] is not None:
+            value["district"] = json.loads(row[5])
+        self._remember(key, value, row[3])
+        self.hits["sqlite"] += 1
+        return value
+
+    def set(self, key, value):
+        expires_at = time.time() + (self.ttl if value is not None else self.negative_ttl)
+        self._remember(key, value, expires_at)
+        lat, lon, name, state, district, country = (None,) * 6
+        if value is not None:
+            lat, lon, name, state, country = value["lat"], value["lon"], value["name"], value.get("state"), value.get("country") or ""
+            if "district" in value: district = json.dumps(value["district"])
+        self._execute(
+            "INSERT OR REPLACE INTO geocode_cache (query, lat, lon, name, expires_at, state, district, country) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, lat, lon, name, expires_at, state, district, country),
+        )
+
+
+geocode_cache = GeocodeCache()
+
+
+def _parse_geocode(geo_data):
+    if isinstance(geo_data, list) and geo_data:
+        top = geo_data[0]
+        return {"lat": top["lat"], "lon": top["lon"], "name": top["name"], "state": top.get("state"), "country": top.get("country")}
+    if isinstance(geo_data, list):
+        return None  # Empty list: the city genuinely does not exist
+    raise ValueError(f"Unexpected geocoding response: {geo_data}")
+
+
+def _with_district(value):
+    # Resolve the rainfall-normals district once per geocode and keep it in the cached value
+    if value is not None:
+        from services.district_index import resolve_district
+        value["district"] = resolve_district(value["name"], value.get("state"), value["lat"], value["lon"], value.get("country"))
+    return value
+
+
+def _fetch_geocode(city, api_key):
+    from services.upstream_scheduler import schedule_blocking
+    geo_url = "http://api.openweathermap.org/geo/1.0/direct"
+
+    def call():
+        resp = requests.get(geo_url, params={"q": city, "limit": 1, "appid": api_key}, timeout=10)
+        resp.raise_for_status()
+        return resp.json()
+    return _parse_geocode(schedule_blocking(geo_url, call))
+
+
+def geocode_city(city, api_key, cache=geocode_cache):
+    # Returns {"lat", "lon", "name", "state", "country", "district"} or None when the city is unknown.
+    # Network and API errors propagate and are never cached.
+    key = normalize_city(city)
+    if not key: return None
+    cached = cache.get(key)
+    if cached is not _MISSING:
+        return cached
+    value = _with_district(_fetch_geocode(city, api_key))
+    cache.set(key, value)
+    return value
+
+
+def cached_geocode(city, cache=geocode_cache):
+    # (True, value) when the lookup is answered without the API, else (False, None)
+    value = cache.get(normalize_city(city))
+    return (False, None) if value is _MISSING else (True, value)
+
+
+def _store(cache, key, value):
+    value = _with_district(value)
+    cache.set(key, value)
+    return value
+
+
+async def geocode_city_async(city, api_key, cache=geocode_cache):
+    # Same contract as geocode_city, with the upstream hop on the pooled aiohttp session;
+    # SQLite reads/writes run in a thread so a locked database never stalls the shared loop
+    from services.http_client import fetch_json
+    key = normalize_city(city)
+    if not key: return None
+    cached = cache.get(key, memory_only=True)
+    if cached is _MISSING:
+        cached = await asyncio.to_thread(cache.get, key)
+    if cached is not _MISSING:
+        return cached
+    geo_data = await fetch_json("http://api.openweathermap.org/geo/1.0/direct", {"q": city, "limit": 1, "appid": api_key})
+    return await asyncio.to_thread(_store, cache, key, _parse_geocode(geo_data))
@@ -0,0 +1,99 @@
+import csv, os
+from datetime import datetime
+import click
+from models import db, PredictionHistory
+
+# Prediction history lives in the prediction_history table of weather_intelligence.db.
+# data/prediction_history.csv is imported once with `flask import-history`; the CSV is
+# left in place because train_dl_model.py and the report notebook still read it.
+
+HISTORY_FILE = "data/prediction_history.csv"
+PAGE_SIZE = 50
+
+TIME_FORMATS = ["%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%d-%m-%Y %H:%M", "%Y-%m-%dT%H:%M:%S"]
+
+
+def _parse_time(value):
+    value = (value or "").strip()
+    for fmt in TIME_FORMATS:
+        try: return datetime.strptime(value, fmt)
+        except ValueError: continue
+    return None
+
+
+def _float(value):
+    try: return float(value)
+    except (TypeError, ValueError): return None
+
+
+def _int(value):
+    try: return int(float(value))
+    except (TypeError, ValueError): return 0
+
+
+def _csv_row_to_record(row):
+    return {
+        "time": _parse_time(row.get("Time")),
+        "city": (row.get("City") or "Unknown").strip(),
+        "temp": _float(row.get("Temp")),
+        "hum": _float(row.get("Hum")),
+        "press": _float(row.get("Press")),
+        "wind": _float(row.get("Wind")),
+        "prediction": row.get("ML") or None,
+        "report": row.get("Report") or None,
+        "mode": row.get("Mode") or None,
+        "lat": _float(row.get("Lat")),
+        "lon": _float(row.get("Lon")),
+        "proof_filename": row.get("Proof") or None,
+        "status": row.get("Status") or None,
+        "votes_yes": _int(row.get("Yes_Votes")),
+        "votes_no": _int(row.get("No_Votes")),
+    }
+
+
+def import_history_csv(path=HISTORY_FILE, batch_size=1000):
+    # Streams the CSV into the table with executemany inserts; returns the row count
+    imported, batch = 0, []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            batch.append(_csv_row_to_record(row))
+            if len(batch) >= batch_size:
+                db.session.execute(PredictionHistory.__table__.insert(), batch)
+                imported += len(batch)
+                batch = []
+    if batch:
+        db.session.execute(PredictionHistory.__table__.insert(), batch)
+        imported += len(batch)
+    db.session.commit()
+    return imported
+
+
+def query_history(city=None, mode=None, start=None, end=None, before_id=None, limit=PAGE_SIZE):
+    # Keyset pagination on the primary key: newest first, each page starts below the
+    # last id of the previous one, so page N costs the same as page 1
+    q = PredictionHistory.query
+    if city: q = q.filter(PredictionHistory.city == city)
+    if mode: q = q.filter(PredictionHistory.mode == mode)
+    if start: q = q.filter(PredictionHistory.time >= start)
+    if end: q = q.filter(PredictionHistory.time < end)
+    if before_id: q = q.filter(PredictionHistory.id < before_id)
+    return q.order_by(PredictionHistory.id.desc()).limit(limit).all()
+
+
+def delete_history_record(record_id):
+    deleted = PredictionHistory.query.filter_by(id=record_id).delete()
+    db.session.commit()
+    return deleted
+
+
+def register_commands(app):
+    @app.cli.command("import-history")
+    @click.option("--path", default=HISTORY_FILE, show_default=True)
+    @click.option("--force", is_flag=True, help="Import even if the table already has rows.")
+    def import_history(path, force):
+        """One-time import of the CSV prediction history into the database."""
+        if not os.path.exists(path):
+            raise click.ClickException(f"{path} not found")
+        if not force and db.session.query(PredictionHistory.id).first() is not None:
+            raise click.ClickException("prediction_history already has rows; use --force to import again")
+        click.echo(f"Imported {import_history_csv(path)} rows from {path}")
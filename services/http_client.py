@@ -0,0 +1,102 @@
+import os, time, asyncio, threading, atexit
+import concurrent.futures
+from urllib.parse import urlsplit
+import aiohttp
+from services.metrics import UPSTREAM_SECONDS, UPSTREAM_ERRORS
+from services.upstream_scheduler import schedule, in_background
+
+# One event loop per worker process, running in a daemon thread, owns one pooled
+# aiohttp session. Flask's async views are dispatched onto this loop (see install),
+# so TCP/TLS connections and DNS answers are reused across requests instead of being
+# rebuilt by a fresh loop and ClientSession on every page view.
+# Every in-flight request in the worker shares this loop, so views must not block it:
+# SQLite/SQLAlchemy, model inference and template rendering go through asyncio.to_thread.
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "200"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "50"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+# Longest a WSGI thread waits on the shared loop for one async view
+ASYNC_VIEW_TIMEOUT = float(os.getenv("ASYNC_VIEW_TIMEOUT", "60"))
+
+_loop = None
+_loop_pid = None
+_session = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    # Started lazily and per process: threads do not survive a gunicorn fork
+    global _loop, _loop_pid, _session
+    if _loop is None or _loop_pid != os.getpid():
+        with _lock:
+            if _loop is None or _loop_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="raincast-io", daemon=True).start()
+                _loop, _loop_pid, _session = loop, os.getpid(), None
+    return _loop
+
+
+def _get_session():
+    # Only valid on the shared loop; aiohttp sessions are bound to the loop that made them
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE, limit_per_host=HTTP_POOL_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE, ttl_dns_cache=300,
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+    return _session
+
+
+async def _get_json(session, url, params):
+    async with session.get(url, params=params) as resp:
+        resp.raise_for_status()
+        return await resp.json()
+
+
+async def fetch_json(url, params=None):
+    host = urlsplit(url).hostname or ""
+    start = time.perf_counter()
+    try:
+        if _loop is not None and asyncio.get_running_loop() is _loop:
+            return await schedule(url, lambda: _get_json(_get_session(), url, params))
+        # Called from some other loop (asyncio.run in a script, Streamlit): short-lived session
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)) as session:
+            return await schedule(url, lambda: _get_json(session, url, params))
+    except Exception as e:
+        UPSTREAM_ERRORS.inc(host=host, error=type(e).__name__)
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+
+
+def run_sync(coro, timeout=None):
+    # Block the calling (WSGI) thread until the coroutine finishes on the shared loop;
+    # on timeout the coroutine is cancelled and TimeoutError raised
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout=ASYNC_VIEW_TIMEOUT if timeout is None else timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+def spawn(coro):
+    # Fire-and-forget on the shared loop, used for background cache refreshes; their upstream
+    # calls queue behind interactive ones
+    return asyncio.run_coroutine_threadsafe(in_background(coro), get_loop())
+
+
+def install(app):
+    # Route every async view/handler through the shared loop instead of asgiref's
+    # per-call event loop
+    app.async_to_sync = lambda func: (lambda *args, **kwargs: run_sync(func(*args, **kwargs)))
+    return app
+
+
+@atexit.register
+def _close_session():
+    if _loop is not None and _session is not None and not _session.closed:
+        try: asyncio.run_coroutine_threadsafe(_session.close(), _loop).result(timeout=2)
+        except Exception: pass
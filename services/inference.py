@@ -0,0 +1,144 @@
+import os, time
+import numpy as np
+
+# Models live in a registry that loads them on first use (or before gunicorn forks when
+# PRELOAD_MODELS=1 and gunicorn runs with --preload) and hot-swaps them when model/ changes.
+# With INFERENCE_SERVER set, predictions go to the shared inference server
+# (services/inference_server.py) and the local registry is only loaded if it is unreachable.
+from services.model_registry import ModelRegistry
+from services.metrics import INFERENCE_SECONDS
+from services import inference_server
+
+# RAIN_ENGINE: "auto" prefers the exported NumPy weights (no TensorFlow import),
+# "keras" forces the original model, "numpy" requires the exported artifact.
+RAIN_ENGINE = os.getenv("RAIN_ENGINE", "auto").lower()
+# MODEL_EVAL: "compiled" swaps the sklearn estimators for flat-array evaluators with
+# identical output, "sklearn" keeps the original objects.
+MODEL_EVAL = os.getenv("MODEL_EVAL", "compiled").lower()
+# MODEL_RELOAD_INTERVAL: seconds between checks of model/ for new artifacts, 0 disables.
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+
+model_registry = ModelRegistry(RAIN_ENGINE, MODEL_EVAL, MODEL_RELOAD_INTERVAL)
+if os.getenv("PRELOAD_MODELS") == "1":
+    model_registry.preload()
+
+def predict_local(temp, hum, press, wind, city_name, mode_name):
+    m = model_registry.get()
+    if not m.loaded: return "AI Offline", temp
+    start = time.perf_counter()
+    try:
+        c_code = m.city_lookup.get(city_name, 0)
+        m_code = m.mode_lookup.get(mode_name, 0)
+            
+        if m.dl_scaler is not None:
+            raw_features = [[temp, hum, press, wind, c_code]]
+            scaled_features = m.dl_scaler.transform(raw_features)
+            dl_prob = m.rain_model.predict(scaled_features, verbose=0)[0][0]
+            prediction_text = "Rain Expected" if dl_prob > 0.50 else "No Rain"
+        else:
+            rain_features = [[temp, hum, press, wind, c_code]]
+            is_rain = m.rain_model.predict(rain_features)[0]
+            prediction_text = "Rain Expected" if is_rain == 1 else "No Rain"
+        
+        temp_features = [[hum, press, wind, c_code, m_code]]
+        ml_guess = m.temp_model.predict(temp_features)[0]
+        diff = ml_guess - temp
+        max_correction = 3.5
+        corrected_temp = temp + (max_correction if diff > 0 else -max_correction) if abs(diff) > max_correction else ml_guess
+
+        return prediction_text, round(corrected_temp, 1)
+    except:
+        return "Prediction Error", temp
+    finally:
+        INFERENCE_SECONDS.observe(time.perf_counter() - start, kind="single")
+
+def rain_probability(m, rain_features):
+    # P(rain) per row and the label the single-row path would give
+    if m.dl_scaler is not None:
+        probs = m.rain_model.predict(m.dl_scaler.transform(rain_features), verbose=0).reshape(-1).astype(float)
+        return probs, probs > 0.50
+    classes = getattr(m.rain_model, "classes_", getattr(m.rain_model, "classes", None))
+    if classes is not None and hasattr(m.rain_model, "predict_proba") and 1 in list(classes):
+        # predict() is argmax over these same probabilities, so the labels are unchanged
+        proba = m.rain_model.predict_proba(rain_features)
+        return proba[:, list(classes).index(1)], np.asarray(classes).take(np.argmax(proba, axis=1)) == 1
+    is_rain = m.rain_model.predict(rain_features) == 1
+    return is_rain.astype(float), is_rain
+
+def corrected_temperature(m, nums, c_codes, m_codes):
+    # The regressor's guess, kept within 3.5 degrees of the observed/forecast temperature
+    temp_features = np.column_stack([nums[:, 1:4], c_codes, m_codes])
+    ml_guess = m.temp_model.predict(temp_features)
+    diff = ml_guess - nums[:, 0]
+    max_correction = 3.5
+    return np.where(np.abs(diff) > max_correction, nums[:, 0] + np.sign(diff) * max_correction, ml_guess)
+
+def score_local_batch(rows, strict=False):
+    # rows: iterable of (temp, hum, press, wind, city_name, mode_name)
+    # -> [(prediction, ai_temp, rain_probability), ...] with one scaler pass, one rain model
+    # call and one regressor call for all rows. strict raises instead of marking every row
+    # "Prediction Error", so a caller merging several requests can isolate the bad one
+    rows = list(rows)
+    if not rows: return []
+    temps = [r[0] for r in rows]
+    m = model_registry.get()
+    if not m.loaded: return [("AI Offline", t, None) for t in temps]
+    start = time.perf_counter()
+    try:
+        nums = np.array([r[:4] for r in rows], dtype=float)
+        # Unknown labels fall back to 0, same as the single-row path
+        c_codes = np.array([m.city_lookup.get(r[4], 0) for r in rows], dtype=float)
+        m_codes = np.array([m.mode_lookup.get(r[5], 0) for r in rows], dtype=float)
+
+        probs, is_rain = rain_probability(m, np.column_stack([nums, c_codes]))
+        corrected = corrected_temperature(m, nums, c_codes, m_codes)
+
+        return [("Rain Expected" if r else "No Rain", round(float(c), 1), round(float(p), 4)) for r, c, p in zip(is_rain, corrected, probs)]
+    except:
+        if strict: raise
+        return [("Prediction Error", t, None) for t in temps]
+    finally:
+        INFERENCE_SECONDS.observe(time.perf_counter() - start, kind="batch")
+
+def predict_local_batch(rows):
+    return [r[:2] for r in score_local_batch(rows)]
+
+
+def get_ai_prediction(temp, hum, press, wind, city_name, mode_name):
+    results = inference_server.remote_predict([(temp, hum, press, wind, city_name, mode_name)])
+    if results is not None: return results[0]
+    return predict_local(temp, hum, press, wind, city_name, mode_name)
+
+def get_ai_prediction_batch(rows):
+    rows = list(rows)
+    if not rows: return []
+    results = inference_server.remote_predict(rows)
+    if results is not None: return results
+    return predict_local_batch(rows)
+
+def score_series(nums, city_name, mode_name):
+    # nums: (n, 4) array of temp, hum, press, wind for one place (e.g. every forecast hour)
+    # -> (rain probability, corrected temperature) arrays, or None when the models are offline
+    if len(nums) == 0: return np.empty(0), np.empty(0)
+    results = inference_server.remote_predict([tuple(r) + (city_name, mode_name) for r in nums.tolist()], with_probability=True)
+    if results is not None:
+        if results[0][2] is None: return None
+        return np.array([r[2] for r in results], dtype=float), np.array([r[1] for r in results], dtype=float)
+    m = model_registry.get()
+    if not m.loaded: return None
+    start = time.perf_counter()
+    try:
+        c_codes = np.full(len(nums), m.city_lookup.get(city_name, 0), dtype=float)
+        m_codes = np.full(len(nums), m.mode_lookup.get(mode_name, 0), dtype=float)
+        probs, _ = rain_probability(m, np.column_stack([nums, c_codes]))
+        return probs, np.round(corrected_temperature(m, nums, c_codes, m_codes), 1)
+    except Exception as e:
+        print(f"Timeline Warning: {e}")
+        return None
+    finally:
+        INFERENCE_SECONDS.observe(time.perf_counter() - start, kind="series")
+
+def model_version():
+    # Version of the model that produced the latest predictions, without loading it here
+    # when the inference server is answering
+    return inference_server.remote_version() or model_registry.get().version
@@ -0,0 +1,213 @@
+import os, sys, json, time, socket, asyncio, threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from services.metrics import INFERENCE_SECONDS
+
+load_dotenv()
+
+# One process owns the models and answers every gunicorn worker and Streamlit session:
+#   python -m services.inference_server            (address from INFERENCE_SERVER)
+# INFERENCE_SERVER is "unix:/path/to.sock" or "host:port"; clients with it unset, or whose
+# server is unreachable, predict in-process as before.
+# Requests arriving together are merged into one get_ai_prediction_batch call: the batch
+# closes at INFERENCE_MAX_BATCH rows or INFERENCE_MAX_WAIT_US after its first request,
+# and while one batch runs the next one fills up.
+# Wire format: one JSON object per line each way, {"rows": [[temp, hum, press, wind,
+# city, mode], ...]} -> {"results": [[prediction, ai_temp, rain_probability], ...], "version": ...}.
+
+INFERENCE_SERVER = os.getenv("INFERENCE_SERVER", "")
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "64"))
+INFERENCE_MAX_WAIT_US = int(os.getenv("INFERENCE_MAX_WAIT_US", "1000"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "1.0"))
+# After a failed call the server is skipped for this long, so an outage costs one timeout
+INFERENCE_RETRY_SECONDS = float(os.getenv("INFERENCE_RETRY_SECONDS", "5"))
+
+stats = {"requests": 0, "batches": 0, "rows": 0, "largest_batch": 0, "errors": 0}
+
+
+def parse_address(address):
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+# --- Client -------------------------------------------------------------------------
+
+_local = threading.local()
+_down_until = 0.0
+_version = None
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        family, addr = parse_address(INFERENCE_SERVER)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(INFERENCE_TIMEOUT)
+        try: sock.connect(addr)
+        except OSError:
+            sock.close()
+            raise
+        conn = _local.conn = (sock, sock.makefile("rb"))
+    return conn
+
+
+def _drop_connection():
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try: conn[1].close(); conn[0].close()
+        except OSError: pass
+
+
+def remote_predict(rows, with_probability=False):
+    # [(prediction, ai_temp[, rain_probability]), ...] from the server, or None to predict in-process
+    global _down_until, _version
+    if not INFERENCE_SERVER or time.monotonic() < _down_until: return None
+    start = time.perf_counter()
+    payload = {"rows": [[float(r[0]), float(r[1]), float(r[2]), float(r[3]), str(r[4]), str(r[5])] for r in rows]}
+    try:
+        sock, reader = _connection()
+        sock.sendall(json.dumps(payload).encode() + b"\n")
+        line = reader.readline()
+        if not line: raise ConnectionError("inference server closed the connection")
+        reply = json.loads(line)
+    except (OSError, ValueError) as e:
+        _drop_connection()
+        _down_until = time.monotonic() + INFERENCE_RETRY_SECONDS
+        print(f"Inference Server Warning: {e}")
+        return None
+    if "error" in reply:
+        # The server is up but rejected these rows; only this call falls back to in-process
+        print(f"Inference Server Warning: {reply['error']}")
+        return None
+    _version = reply.get("version")
+    INFERENCE_SECONDS.observe(time.perf_counter() - start, kind="remote")
+    width = 3 if with_probability else 2
+    return [tuple(r[:width]) for r in reply["results"]]
+
+
+def remote_version():
+    # Model version last reported by the server while it is in use
+    if not INFERENCE_SERVER or time.monotonic() < _down_until: return None
+    return _version
+
+
+# --- Server -------------------------------------------------------------------------
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch=INFERENCE_MAX_BATCH, max_wait_us=INFERENCE_MAX_WAIT_US):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait_us / 1e6
+        self.queue = asyncio.Queue()
+        # One thread: the model runs one batch at a time while the loop keeps accepting
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    async def submit(self, rows):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while size < self.max_batch:
+            if self.queue.empty():
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0: break
+                try: item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError: break
+            else:
+                item = self.queue.get_nowait()
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, size = await self._collect()
+            rows = [row for rows, _ in batch for row in rows]
+            try:
+                results = await loop.run_in_executor(self.executor, self.predict, rows)
+            except Exception:
+                # One bad row must not fail everyone else's request: rescore row by row
+                results = await loop.run_in_executor(self.executor, self._predict_rows, rows)
+            stats["batches"] += 1
+            stats["rows"] += size
+            stats["largest_batch"] = max(stats["largest_batch"], size)
+            offset = 0
+            for rows, future in batch:
+                part = results[offset:offset + len(rows)]
+                offset += len(rows)
+                if future.done(): continue
+                error = next((r for r in part if isinstance(r, Exception)), None)
+                if error is not None: future.set_exception(error)
+                else: future.set_result(part)
+
+    def _predict_rows(self, rows):
+        results = []
+        for row in rows:
+            try: results.extend(self.predict([row]))
+            except Exception as e: results.append(e)
+        return results
+
+
+def check_rows(rows):
+    # Rejects a malformed request before it is merged into a batch with other clients' rows
+    for i, row in enumerate(rows):
+        if len(row) != 6 or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in row[:4]):
+            raise ValueError(f"row {i}: expected [temp, hum, press, wind, city, mode]")
+    return rows
+
+
+async def _handle(reader, writer, batcher, version):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line: break
+            try:
+                rows = check_rows([tuple(r) for r in json.loads(line)["rows"]])
+                results = await batcher.submit(rows)
+                reply = {"results": results, "version": version()}
+            except Exception as e:
+                stats["errors"] += 1
+                reply = {"error": str(e)}
+            stats["requests"] += 1
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(address=INFERENCE_SERVER, ready=None):
+    from services.inference import model_registry, score_local_batch
+    bundle = model_registry.preload()
+    print(f"Inference server: {bundle.engine} model {bundle.version} loaded in {bundle.load_seconds:.2f}s")
+
+    # strict: a failing batch raises, and MicroBatcher rescores it row by row
+    batcher = MicroBatcher(partial(score_local_batch, strict=True))
+    handler = lambda r, w: _handle(r, w, batcher, lambda: model_registry.get().version)
+    family, addr = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(addr): os.remove(addr)  # stale socket from a previous run
+        server = await asyncio.start_unix_server(handler, addr)
+    else:
+        server = await asyncio.start_server(handler, *addr)
+    print(f"Inference server listening on {address} (batch {batcher.max_batch}, wait {INFERENCE_MAX_WAIT_US}us)")
+    if ready is not None: ready.set()
+    async with server:
+        await asyncio.gather(server.serve_forever(), batcher.run())
+
+
+if __name__ == "__main__":
+    # Run the importable copy of this module so services.inference sees the same state
+    from services import inference_server
+    address = sys.argv[1] if len(sys.argv) > 1 else INFERENCE_SERVER or "unix:/tmp/raincast-inference.sock"
+    asyncio.run(inference_server.serve(address))
@@ -0,0 +1,174 @@
+import os, time, bisect, threading
+from contextlib import contextmanager
+from flask import g, request, has_app_context, has_request_context
+
+# Request-stage timing and Prometheus-format metrics without a client library.
+# `with stage("geocode"):` inside a view records the duration twice: into the request's
+# Server-Timing header and into the raincast_stage_seconds histogram. Counters and
+# histograms are a dict update under a lock; cache statistics the services already keep
+# are read only when /metrics is scraped (see register_collector).
+# METRICS_ENABLED=0 turns both the header and the recording off.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs: return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("raincast_request_seconds", "Request latency by endpoint.", ["endpoint", "method", "status"])
+STAGE_SECONDS = Histogram("raincast_stage_seconds", "Latency of each stage inside a request.", ["endpoint", "stage"])
+STAGE_ERRORS = Counter("raincast_stage_errors_total", "Exceptions raised inside a timed stage.", ["endpoint", "stage"])
+REQUEST_ERRORS = Counter("raincast_request_errors_total", "Errors a view caught and reported instead of raising.", ["endpoint"])
+UPSTREAM_SECONDS = Histogram("raincast_upstream_seconds", "Latency of upstream HTTP calls.", ["host"])
+UPSTREAM_ERRORS = Counter("raincast_upstream_errors_total", "Failed upstream HTTP calls.", ["host", "error"])
+INFERENCE_SECONDS = Histogram("raincast_inference_seconds", "Model inference time per call.", ["kind"],
+                              buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5))
+MODEL_LOAD_SECONDS = Histogram("raincast_model_load_seconds", "Time to load the model artifacts.", ["engine"],
+                               buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+
+_metrics = [REQUEST_SECONDS, STAGE_SECONDS, STAGE_ERRORS, REQUEST_ERRORS, UPSTREAM_SECONDS, UPSTREAM_ERRORS, INFERENCE_SECONDS, MODEL_LOAD_SECONDS]
+_collectors = []
+
+
+def register_collector(name, help_text, read, metric_type="counter", label="kind"):
+    # read() -> {label value: number}, {(label values): number} for a tuple of labels, or a
+    # bare number with label=None; evaluated at scrape time only. Counters are named *_total,
+    # gauges are not, so a family is never both
+    if metric_type not in ("counter", "gauge"): raise ValueError(f"Unsupported metric type {metric_type}")
+    if name.endswith("_total") != (metric_type == "counter"):
+        raise ValueError(f"{name}: counters must end in _total and gauges must not")
+    labels = () if label is None else (label,) if isinstance(label, str) else tuple(label)
+    # Re-registering (a second create_app) replaces the family instead of duplicating it
+    _collectors[:] = [c for c in _collectors if c[0] != name]
+    _collectors.append((name, help_text, read, metric_type, labels))
+
+
+def render_metrics():
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    for name, help_text, read, metric_type, labels in _collectors:
+        try: values = read()
+        except Exception as e:
+            print(f"Metrics Warning: {name}: {e}")
+            continue
+        if not labels: values = {(): values}
+        elif len(labels) == 1: values = {(k,): v for k, v in (values or {}).items()}
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        # Numbers and flags only; None (e.g. an unset lag) is skipped
+        lines += [f"{name}{_format_labels(labels, k)} {int(v) if isinstance(v, bool) else v}"
+                  for k, v in sorted(values.items()) if isinstance(v, (int, float))]
+    return "\n".join(lines) + "\n"
+
+
+def _request_timings():
+    if not has_app_context(): return None
+    timings = g.get("_stage_timings")
+    if timings is None:
+        timings = g._stage_timings = []
+    return timings
+
+
+@contextmanager
+def stage(name):
+    if not METRICS_ENABLED:
+        yield
+        return
+    endpoint = request.endpoint if has_request_context() else ""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(endpoint=endpoint, stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, endpoint=endpoint, stage=name)
+        timings = _request_timings()
+        if timings is not None: timings.append((name, elapsed))
+
+
+def server_timing_header(timings, total=None):
+    # Repeated stages (e.g. two upstream calls) are summed into one entry
+    merged = {}
+    for name, elapsed in timings:
+        merged[name] = merged.get(name, 0.0) + elapsed
+    parts = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in merged.items()]
+    if total is not None: parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def install(app):
+    if not METRICS_ENABLED: return app
+
+    @app.before_request
+    def _start_timer():
+        g._request_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.get("_request_start")
+        if start is None: return response
+        total = time.perf_counter() - start
+        REQUEST_SECONDS.observe(total, endpoint=request.endpoint or "unmatched", method=request.method, status=response.status_code)
+        response.headers["Server-Timing"] = server_timing_header(g.get("_stage_timings") or [], total)
+        return response
+
+    return app
@@ -0,0 +1,179 @@
+import os, time, threading, hashlib
+from datetime import datetime
+import joblib
+from services.metrics import MODEL_LOAD_SECONDS
+
+# Model artifacts are loaded on first use instead of at import time, versioned by a
+# fingerprint of the files in model/, and swapped atomically when a retrain lands.
+# Requests grab one bundle reference and use it to the end, so a swap never mixes
+# old and new artifacts inside one prediction.
+
+MODEL_DIR = "model"
+MODEL_REG_PATH = "model/temp_regressor.pkl"
+MODEL_CLF_PATH = "model/rain_classifier.pkl"
+LE_CITY_PATH = "model/city_encoder.pkl"
+LE_MODE_PATH = "model/mode_encoder.pkl"
+DL_MODEL_PATH = "model/rain_dl_model.keras"
+DL_SCALER_PATH = "model/dl_scaler.pkl"
+NUMPY_MODEL_PATH = "model/rain_dl_model.npz"
+
+ARTIFACT_PATHS = [MODEL_REG_PATH, MODEL_CLF_PATH, LE_CITY_PATH, LE_MODE_PATH, DL_MODEL_PATH, DL_SCALER_PATH, NUMPY_MODEL_PATH]
+
+
+class ModelBundle:
+    def __init__(self, temp_model=None, rain_model=None, le_city=None, le_mode=None, dl_scaler=None,
+                 engine="offline", version=None, load_seconds=0.0, error=None):
+        self.temp_model = temp_model
+        self.rain_model = rain_model
+        self.le_city = le_city
+        self.le_mode = le_mode
+        self.dl_scaler = dl_scaler
+        self.engine = engine
+        self.version = version
+        self.loaded_at = datetime.utcnow()
+        self.load_seconds = load_seconds
+        self.error = error
+        self.loaded = error is None and temp_model is not None
+        # Label lookups built once per bundle instead of per prediction
+        self.city_lookup = {c: i for i, c in enumerate(le_city.classes_)} if le_city is not None else {}
+        self.mode_lookup = {m: i for i, m in enumerate(le_mode.classes_)} if le_mode is not None else {}
+
+
+def artifact_fingerprint(paths=ARTIFACT_PATHS):
+    # Cheap version id: path, size and mtime of every artifact that exists
+    h = hashlib.sha1()
+    newest = 0.0
+    for path in paths:
+        try: st = os.stat(path)
+        except OSError: continue
+        h.update(f"{path}:{st.st_size}:{st.st_mtime_ns};".encode())
+        newest = max(newest, st.st_mtime)
+    return h.hexdigest()[:12], newest
+
+
+def numpy_export_usable():
+    # An export older than the .keras model would serve the previous network
+    if not os.path.exists(NUMPY_MODEL_PATH): return False
+    from services.numpy_engine import is_current
+    if is_current(NUMPY_MODEL_PATH, DL_MODEL_PATH): return True
+    print(f"Model Load Warning: {NUMPY_MODEL_PATH} is older than {DL_MODEL_PATH}; re-run python -m services.numpy_engine")
+    return False
+
+
+def _tensorflow_available():
+    import importlib.util
+    return importlib.util.find_spec("tensorflow") is not None
+
+
+def load_bundle(rain_engine="auto", model_eval="compiled"):
+    version, _ = artifact_fingerprint()
+    start = time.perf_counter()
+    try:
+        temp_model = joblib.load(MODEL_REG_PATH)
+        le_city = joblib.load(LE_CITY_PATH)
+        le_mode = joblib.load(LE_MODE_PATH)
+        dl_scaler = None
+
+        use_numpy = rain_engine == "numpy" or (rain_engine != "keras" and numpy_export_usable())
+        if not use_numpy and rain_engine != "keras" and os.path.exists(NUMPY_MODEL_PATH) and not _tensorflow_available():
+            use_numpy = True  # a stale export still beats no rain network on workers without TensorFlow
+        if use_numpy:
+            from services.numpy_engine import load_numpy_engine
+            rain_model, dl_scaler = load_numpy_engine(NUMPY_MODEL_PATH)
+            engine = "numpy"
+        elif os.path.exists(DL_MODEL_PATH):
+            from tensorflow.keras.models import load_model
+            rain_model = load_model(DL_MODEL_PATH)
+            dl_scaler = joblib.load(DL_SCALER_PATH)
+            engine = "keras"
+        else:
+            rain_model = joblib.load(MODEL_CLF_PATH)
+            engine = "sklearn"
+
+        if model_eval == "compiled":
+            from services.compiled_models import compile_or_keep
+            temp_model = compile_or_keep(temp_model)
+            if dl_scaler is None:
+                rain_model = compile_or_keep(rain_model)
+
+        bundle = ModelBundle(temp_model, rain_model, le_city, le_mode, dl_scaler, engine, version, time.perf_counter() - start)
+    except Exception as e:
+        print(f"Model Load Warning: {e}")
+        bundle = ModelBundle(version=version, load_seconds=time.perf_counter() - start, error=str(e))
+    MODEL_LOAD_SECONDS.observe(bundle.load_seconds, engine=bundle.engine)
+    return bundle
+
+
+class ModelRegistry:
+    def __init__(self, rain_engine="auto", model_eval="compiled", check_interval=30.0, settle_seconds=2.0):
+        self.rain_engine = rain_engine
+        self.model_eval = model_eval
+        self.check_interval = check_interval  # 0 disables hot reload
+        self.settle_seconds = settle_seconds  # wait for a retrain to finish writing files
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._last_check = 0.0
+        self.reload_count = 0
+        self.last_reload_error = None
+
+    def get(self):
+        bundle = self._bundle
+        if bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    self._bundle = load_bundle(self.rain_engine, self.model_eval)
+                    self._last_check = time.monotonic()
+                bundle = self._bundle
+        elif self.check_interval and time.monotonic() - self._last_check >= self.check_interval:
+            self._check_for_update()
+        return bundle
+
+    def preload(self):
+        # Call before gunicorn forks (gunicorn --preload) so workers share the pages copy-on-write
+        return self.get()
+
+    def _check_for_update(self):
+        with self._lock:
+            if self._reloading: return
+            self._last_check = time.monotonic()
+            version, newest = artifact_fingerprint()
+            if version == self._bundle.version or time.time() - newest < self.settle_seconds:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, daemon=True).start()
+
+    def _reload(self):
+        try:
+            bundle = load_bundle(self.rain_engine, self.model_eval)
+            if bundle.loaded or not self._bundle.loaded:
+                self._bundle = bundle  # single reference assignment, in-flight requests keep the old one
+                self.reload_count += 1
+                self.last_reload_error = None
+            else:
+                # Keep serving the previous artifacts; retry on the next check
+                self.last_reload_error = bundle.error
+        finally:
+            self._reloading = False
+
+    def reload(self):
+        # Synchronous reload, e.g. right after train_dl_model.py in the same process
+        with self._lock:
+            self._reloading = True
+        self._reload()
+        return self._bundle
+
+    def stats(self):
+        bundle = self._bundle
+        if bundle is None:
+            return {"loaded": False, "version": None, "pending_first_use": True}
+        return {
+            "loaded": bundle.loaded,
+            "engine": bundle.engine,
+            "version": bundle.version,
+            "loaded_at": bundle.loaded_at.isoformat() + "Z",
+            "load_seconds": round(bundle.load_seconds, 4),
+            "reload_count": self.reload_count,
+            "error": bundle.error,
+            "last_reload_error": self.last_reload_error,
+        }
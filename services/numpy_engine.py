@@ -0,0 +1,117 @@
+import os, hashlib
+import numpy as np
+
+# The rain network is a plain Dense stack, so the forward pass is a handful of
+# matmuls. Exporting the weights lets web workers score without importing TensorFlow.
+
+DL_MODEL_PATH = "model/rain_dl_model.keras"
+DL_SCALER_PATH = "model/dl_scaler.pkl"
+NUMPY_MODEL_PATH = "model/rain_dl_model.npz"
+
+ACTIVATIONS = {
+    "relu": lambda x: np.maximum(x, 0.0),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+    "linear": lambda x: x,
+}
+
+
+class NumpyScaler:
+    # Drop-in for the fitted StandardScaler (transform only)
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class NumpyRainModel:
+    # Mirrors the Keras predict() signature so get_ai_prediction can use either engine
+    def __init__(self, weights, biases, activations):
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self.activations = [ACTIVATIONS[a] for a in activations]
+
+    def predict(self, X, verbose=0):
+        out = np.asarray(X, dtype=np.float32)
+        if out.ndim == 1: out = out.reshape(1, -1)
+        for w, b, act in zip(self.weights, self.biases, self.activations):
+            out = act(out @ w + b)
+        return out
+
+
+def load_numpy_engine(path=NUMPY_MODEL_PATH):
+    # Returns (rain_model, scaler) built from the exported artifact
+    with np.load(path, allow_pickle=False) as art:
+        n_layers = int(art["n_layers"])
+        weights = [art[f"W{i}"] for i in range(n_layers)]
+        biases = [art[f"b{i}"] for i in range(n_layers)]
+        activations = [str(a) for a in art["activations"]]
+        scaler = NumpyScaler(art["scaler_mean"], art["scaler_scale"])
+    return NumpyRainModel(weights, biases, activations), scaler
+
+
+def source_digest(path=DL_MODEL_PATH):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def is_current(path=NUMPY_MODEL_PATH, model_path=DL_MODEL_PATH):
+    # False when the .keras model was retrained after this export; exports record the
+    # digest of the model they came from, older ones fall back to file times
+    if not os.path.exists(model_path): return True
+    try:
+        with np.load(path, allow_pickle=False) as art:
+            if "source_digest" in art.files:
+                return str(art["source_digest"]) == source_digest(model_path)
+    except (OSError, ValueError):
+        return False
+    return os.path.getmtime(path) >= os.path.getmtime(model_path)
+
+
+def export_dl_model(model_path=DL_MODEL_PATH, scaler_path=DL_SCALER_PATH, out_path=NUMPY_MODEL_PATH, check=True):
+    import joblib
+    from tensorflow.keras.models import load_model
+
+    model = load_model(model_path)
+    scaler = joblib.load(scaler_path)
+
+    arrays, activations = {}, []
+    for layer in model.layers:
+        params = layer.get_weights()
+        if not params: continue  # Dropout etc. are identity at inference time
+        cfg = layer.get_config()
+        act = cfg.get("activation", "linear")
+        if act not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation '{act}' in layer {layer.name}")
+        idx = len(activations)
+        arrays[f"W{idx}"], arrays[f"b{idx}"] = params[0], params[1]
+        activations.append(act)
+
+    np.savez_compressed(
+        out_path,
+        n_layers=np.int64(len(activations)),
+        activations=np.array(activations),
+        scaler_mean=scaler.mean_,
+        scaler_scale=scaler.scale_,
+        source_digest=np.array(source_digest(model_path)),
+        **arrays,
+    )
+
+    if check:
+        # Parity check against Keras on random inputs around the training distribution
+        rng = np.random.default_rng(42)
+        X = rng.normal(scaler.mean_, scaler.scale_, size=(512, len(scaler.mean_)))
+        np_model, np_scaler = load_numpy_engine(out_path)
+        keras_out = model.predict(scaler.transform(X), verbose=0).reshape(-1)
+        numpy_out = np_model.predict(np_scaler.transform(X)).reshape(-1)
+        max_err = float(np.max(np.abs(keras_out - numpy_out)))
+        if max_err > 1e-5 or np.any((keras_out > 0.5) != (numpy_out > 0.5)):
+            raise RuntimeError(f"NumPy engine diverges from Keras (max abs error {max_err:.2e})")
+        print(f"NumPy engine parity OK (max abs error {max_err:.2e}) -> {out_path}")
+    return out_path
+
+
+if __name__ == "__main__":
+    export_dl_model()
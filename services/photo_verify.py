@@ -0,0 +1,130 @@
+import io, os, time, threading
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageStat, UnidentifiedImageError
+
+# Proof-photo checks for /report, cheapest first:
+# 1. header: Image.open only parses the header, so size and EXIF come without decoding pixels
+# 2. detail: stddev of a reduced grayscale decode (JPEG draft mode decodes at 1/2..1/8 scale)
+#    in a small process pool, with a bounded number of photos in flight per worker
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(12 * 1024 * 1024)))
+MAX_PHOTO_PIXELS = int(os.getenv("MAX_PHOTO_PIXELS", str(50_000_000)))
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", "2"))  # 0 runs the detail check inline
+PHOTO_MAX_IN_FLIGHT = int(os.getenv("PHOTO_MAX_IN_FLIGHT", "8"))
+PHOTO_QUEUE_WAIT = float(os.getenv("PHOTO_QUEUE_WAIT", "2"))
+PHOTO_TIMEOUT = float(os.getenv("PHOTO_TIMEOUT", "10"))
+# Workers run the loop and registry threads, so pool processes must not be plain forks of them
+PHOTO_START_METHOD = os.getenv("PHOTO_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+DETAIL_SIZE = 256
+MAX_PHOTO_AGE = timedelta(minutes=10)
+
+EXIF_IFD = 0x8769
+DATETIME_ORIGINAL = 36867
+DATETIME = 306
+
+
+class PhotoRejected(Exception):
+    pass
+
+
+def detail_stddev(data):
+    # Runs in the pool: reduced-size grayscale decode, then one stddev
+    Image.MAX_IMAGE_PIXELS = MAX_PHOTO_PIXELS
+    img = Image.open(io.BytesIO(data))
+    img.draft("L", (DETAIL_SIZE, DETAIL_SIZE))
+    img.thumbnail((DETAIL_SIZE, DETAIL_SIZE))
+    return ImageStat.Stat(img.convert("L")).stddev[0]
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PHOTO_MAX_IN_FLIGHT)
+
+
+def _get_pool():
+    # Created lazily in each gunicorn worker, after the fork
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            context = multiprocessing.get_context(PHOTO_START_METHOD)
+            _pool, _pool_pid = ProcessPoolExecutor(max_workers=PHOTO_WORKERS, mp_context=context), os.getpid()
+        return _pool
+
+
+def _discard_pool(pool):
+    # A pool whose process died stays broken; the next request builds a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool: _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _detail_in_pool(data):
+    # Takes over the caller's in-flight slot and frees it when the task ends, not when the
+    # caller stops waiting: a timed-out photo still occupies a worker until it finishes
+    pool = _get_pool()
+    try:
+        future = pool.submit(detail_stddev, data)
+    except BaseException as e:
+        _slots.release()
+        if isinstance(e, BrokenProcessPool):
+            _discard_pool(pool)
+            raise PhotoRejected("Verification unavailable, please retry shortly.")
+        raise
+    future.add_done_callback(lambda f: _slots.release())
+    try:
+        return future.result(timeout=PHOTO_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()  # still queued: drop it now
+        raise PhotoRejected("Verification timed out, please retry shortly.")
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise PhotoRejected("Verification unavailable, please retry shortly.")
+
+
+def read_photo_time(img):
+    exif = img.getexif()
+    if not exif: raise PhotoRejected("Anti-Fraud: No EXIF found.")
+    img_time_str = exif.get_ifd(EXIF_IFD).get(DATETIME_ORIGINAL) or exif.get(DATETIME)
+    if not img_time_str: raise PhotoRejected("Metadata empty.")
+    return datetime.strptime(str(img_time_str).strip(), '%Y:%m:%d %H:%M:%S')
+
+
+def verify_photo(data, timings=None):
+    # Fills and returns per-stage timings in ms; raises PhotoRejected with a user-facing message
+    timings = {} if timings is None else timings
+    t0 = time.perf_counter()
+    try:
+        img = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        raise PhotoRejected("Unsupported image format.")
+    if img.width * img.height > MAX_PHOTO_PIXELS:
+        raise PhotoRejected("Image resolution too large.")
+
+    # Fraud Check: Image metadata
+    try:
+        img_time = read_photo_time(img)
+    finally:
+        timings["header_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    if datetime.now() - img_time > MAX_PHOTO_AGE:
+        raise PhotoRejected("Verification Failed: Photo older than 10 mins.")
+
+    # Heuristic Analysis: Check if image has details (not fully black/white)
+    t1 = time.perf_counter()
+    if not _slots.acquire(timeout=PHOTO_QUEUE_WAIT):
+        raise PhotoRejected("Verification busy, please retry shortly.")
+    if PHOTO_WORKERS > 0:
+        stddev = _detail_in_pool(data)
+    else:
+        try: stddev = detail_stddev(data)
+        finally: _slots.release()
+    timings["detail_ms"] = round((time.perf_counter() - t1) * 1000, 2)
+    if stddev < 5.0:
+        raise PhotoRejected("Quality Failed: Image details too low or blank.")
+
+    timings["total_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return timings
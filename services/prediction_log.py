@@ -0,0 +1,147 @@
+import os, io, csv, queue, threading, atexit
+from datetime import datetime
+from models import db, PredictionHistory
+
+# Dashboard predictions are logged write-behind so training data keeps growing from live
+# traffic without disk I/O on the request path. log() only appends to a bounded queue
+# (a full queue drops the row and counts it); one thread per process drains it every
+# PREDICTION_LOG_INTERVAL seconds, or as soon as PREDICTION_LOG_BATCH rows are waiting,
+# and writes each batch of up to PREDICTION_LOG_BATCH rows as
+# - csv: one appended block of rows in data/prediction_history.csv, which train_dl_model.py
+#   and the notebook read (the cleaned-history cache only parses the appended tail)
+# - db: one executemany insert into the prediction_history table shown in the admin panel
+# Remaining rows are flushed when the worker exits.
+
+HISTORY_FILE = "data/prediction_history.csv"
+CSV_COLUMNS = ["Time", "City", "Temp", "Hum", "Press", "Wind", "ML", "API", "Report", "Mode", "Lat", "Lon", "Proof", "Status", "Yes_Votes", "No_Votes"]
+
+PREDICTION_LOG = [s.strip() for s in os.getenv("PREDICTION_LOG", "csv,db").split(",") if s.strip() in ("csv", "db")]
+PREDICTION_LOG_QUEUE = int(os.getenv("PREDICTION_LOG_QUEUE", "10000"))
+PREDICTION_LOG_BATCH = int(os.getenv("PREDICTION_LOG_BATCH", "500"))
+PREDICTION_LOG_INTERVAL = float(os.getenv("PREDICTION_LOG_INTERVAL", "5"))
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from several workers are not serialized
+    fcntl = None
+
+
+def _csv_block(rows):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    for r in rows:
+        writer.writerow([r["time"].strftime("%Y-%m-%d %H:%M"), r["city"], r["temp"], r["hum"], r["press"], r["wind"],
+                         r["prediction"], "OK", "", r["mode"], r["lat"], r["lon"], "", "Pending", 0, 0])
+    return out.getvalue().encode("utf-8")
+
+
+def append_csv(rows, path=HISTORY_FILE):
+    # One locked O_APPEND write per batch, so blocks from different workers never interleave
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None: fcntl.flock(fd, fcntl.LOCK_EX)
+        data = _csv_block(rows)
+        size = os.fstat(fd).st_size
+        if size == 0:
+            data = (",".join(CSV_COLUMNS) + "\n").encode() + data
+        else:
+            # Keep the file line-aligned if the last writer did not end with a newline
+            with open(path, "rb") as f:
+                f.seek(size - 1)
+                if f.read(1) != b"\n": data = b"\n" + data
+        os.write(fd, data)
+    finally:
+        if fcntl is not None: fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def insert_rows(rows):
+    db.session.execute(PredictionHistory.__table__.insert(), [
+        {"time": r["time"], "city": r["city"], "temp": r["temp"], "hum": r["hum"], "press": r["press"], "wind": r["wind"],
+         "prediction": r["prediction"], "mode": r["mode"], "lat": r["lat"], "lon": r["lon"], "status": "Pending",
+         "votes_yes": 0, "votes_no": 0}
+        for r in rows])
+    db.session.commit()
+
+
+class PredictionLogger:
+    def __init__(self, sinks=PREDICTION_LOG, maxsize=PREDICTION_LOG_QUEUE, batch_size=PREDICTION_LOG_BATCH,
+                 flush_interval=PREDICTION_LOG_INTERVAL, path=HISTORY_FILE):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.path = path
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self.stats = {"queued": 0, "dropped": 0, "written": 0, "flushes": 0, "errors": 0}
+
+    def log(self, app, city, temp, hum, press, wind, prediction, mode, lat, lon):
+        if not self.sinks: return False
+        row = {"time": datetime.now(), "city": city, "temp": temp, "hum": hum, "press": press, "wind": wind,
+               "prediction": prediction, "mode": mode, "lat": lat, "lon": lon}
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["queued"] += 1
+        if self._queue.qsize() >= self.batch_size: self._wake.set()
+        if self._thread is None or self._pid != os.getpid():
+            with self._lock:
+                self._app = app
+                # Started per process: the thread does not survive a gunicorn fork
+                if self._thread is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+                    self._thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        # Drain and write everything queued so far, in batches; also called on worker exit
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try: batch.append(self._queue.get_nowait())
+                    except queue.Empty: break
+                if not batch: return written
+                self._write(batch)
+                written += len(batch)
+
+    def _write(self, batch):
+        try:
+            if "csv" in self.sinks: append_csv(batch, self.path)
+            if "db" in self.sinks:
+                with self._app.app_context():
+                    insert_rows(batch)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Prediction Log Warning: {e}")
+            return
+        self.stats["flushes"] += 1
+        self.stats["written"] += len(batch)
+
+    def snapshot(self):
+        return dict(self.stats, pending=self._queue.qsize(), sinks=",".join(self.sinks))
+
+
+prediction_logger = PredictionLogger()
+
+
+@atexit.register
+def _flush_on_exit():
+    if prediction_logger._app is not None:
+        prediction_logger.flush()
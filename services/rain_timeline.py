@@ -0,0 +1,41 @@
+import os
+import numpy as np
+
+# Hour-by-hour rain probability and corrected temperature over the forecast horizon.
+# The forecast's hourly temperature, humidity, pressure and wind go through the rain
+# model and the temperature corrector as one array (services.inference.score_series),
+# so a 168-hour timeline costs about as much as a single prediction.
+
+TIMELINE_HOURS = int(os.getenv("TIMELINE_HOURS", "168"))
+
+
+def _json_list(values, digits):
+    return [None if v != v else round(v, digits) for v in np.asarray(values, dtype=float).tolist()]
+
+
+def build_timeline(forecast, city_name, mode_name, hours=TIMELINE_HOURS, now_local=None):
+    # {"time": ["YYYY-MM-DDTHH:MM", ...], "temp", "rain_prob", "ai_temp"}; hours whose
+    # inputs are missing, or all hours if the models are offline, are None
+    from services.inference import score_series
+    times, temp, hum, press, wind = forecast.hourly_inputs(min(hours, TIMELINE_HOURS), now_local)
+    nums = np.column_stack([temp, hum, press, wind])
+    valid = ~np.isnan(nums).any(axis=1)
+    rain_prob, ai_temp = np.full(len(times), np.nan), np.full(len(times), np.nan)
+    if valid.any():
+        scores = score_series(nums[valid], city_name, mode_name)
+        if scores is not None:
+            rain_prob[valid], ai_temp[valid] = scores
+    return {
+        "time": [str(t) for t in times],
+        "temp": _json_list(temp, 1),
+        "rain_prob": _json_list(rain_prob, 3),
+        "ai_temp": _json_list(ai_temp, 1),
+    }
+
+
+def peak_rain(timeline, hours=24):
+    # {"prob", "time"} for the likeliest rain hour in the first `hours`, or None
+    probs = [(p, t) for p, t in zip(timeline["rain_prob"][:hours], timeline["time"][:hours]) if p is not None]
+    if not probs: return None
+    prob, ts = max(probs, key=lambda item: item[0])
+    return {"prob": round(prob * 100), "time": ts[11:16]}
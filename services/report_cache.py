@@ -0,0 +1,73 @@
+import os, time, threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from models import db, P2PReport
+
+# Per-city "latest verified / latest pending report" cache in front of the P2PReport
+# window query that main.index, check_status and pending_report all run.
+# Entries are dropped on report inserts and vote-driven status changes in this worker;
+# REPORT_CACHE_TTL bounds how long other workers can lag behind.
+
+REPORT_WINDOW = timedelta(hours=1)
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "30"))
+# Opt-in cleanup of stale pending/rejected reports; verified reports are always kept
+REPORT_RETENTION_HOURS = float(os.getenv("REPORT_RETENTION_HOURS", "0"))  # 0 disables it
+REPORT_PURGE_INTERVAL = float(os.getenv("REPORT_PURGE_INTERVAL", "600"))
+
+ReportSnapshot = namedtuple("ReportSnapshot", ["id", "report_type", "timestamp"])
+
+
+class ReportCache:
+    def __init__(self, ttl=REPORT_CACHE_TTL):
+        self.ttl = ttl
+        self._data = {}  # (city, status) -> (valid_until monotonic, ReportSnapshot or None)
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "purged": 0}
+
+    def latest(self, city, status):
+        now = time.monotonic()
+        entry = self._data.get((city, status))
+        if entry is not None and entry[0] > now:
+            self.stats["hits"] += 1
+            return entry[1]
+        self.stats["misses"] += 1
+
+        threshold = datetime.utcnow() - REPORT_WINDOW
+        report = P2PReport.query.filter(
+            P2PReport.city == city,
+            P2PReport.status == status,
+            P2PReport.timestamp >= threshold
+        ).order_by(P2PReport.timestamp.desc()).first()
+
+        valid_for = self.ttl
+        snapshot = None
+        if report is not None:
+            snapshot = ReportSnapshot(report.id, report.report_type, report.timestamp)
+            # Never serve a report past the end of its one-hour window
+            valid_for = min(valid_for, (report.timestamp - threshold).total_seconds())
+        with self._lock:
+            self._data[(city, status)] = (now + valid_for, snapshot)
+        return snapshot
+
+    def invalidate(self, city):
+        with self._lock:
+            for status in ("pending", "verified", "rejected"):
+                self._data.pop((city, status), None)
+        self.stats["invalidations"] += 1
+
+    def maybe_purge(self):
+        # Delete pending/rejected reports older than the retention window, at most once per interval
+        if REPORT_RETENTION_HOURS <= 0: return 0
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_purge < REPORT_PURGE_INTERVAL: return 0
+            self._last_purge = now
+        cutoff = datetime.utcnow() - timedelta(hours=REPORT_RETENTION_HOURS)
+        purged = P2PReport.query.filter(P2PReport.timestamp < cutoff, P2PReport.status.in_(("pending", "rejected"))).delete(synchronize_session=False)
+        db.session.commit()
+        self.stats["purged"] += purged
+        return purged
+
+
+report_cache = ReportCache()
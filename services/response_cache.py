@@ -0,0 +1,94 @@
+import time, asyncio, threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Upstream response cache shared by every request in the worker process.
+# - fresh (age < ttl): served from memory
+# - stale (age < ttl + stale_ttl): served from memory while one background refresh runs
+# - missing/expired: one caller fetches, concurrent callers for the same key await its result
+# Async views share one event loop per worker (services/http_client.py), but Streamlit and
+# scripts call in from their own loops, so in-flight fetches are tracked with thread-safe
+# futures that any loop can await.
+
+
+class ResponseCache:
+    def __init__(self, maxsize=4096, background_runner=None):
+        self.maxsize = maxsize
+        # Runs a refresh coroutine without blocking the caller; defaults to a throwaway thread + loop
+        self.background_runner = background_runner or (lambda coro: threading.Thread(target=asyncio.run, args=(coro,), daemon=True).start())
+        self._data = OrderedDict()  # key -> (fetched_at, value)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.stats = {"fresh": 0, "stale": 0, "miss": 0, "coalesced": 0, "errors": 0, "refreshes": 0}
+
+    def _store(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def peek(self, key):
+        entry = self._data.get(key)
+        return entry[1] if entry else None
+
+    def age(self, key):
+        entry = self._data.get(key)
+        return time.monotonic() - entry[0] if entry else None
+
+    async def refresh(self, key, loader):
+        # Unconditional reload (cache warmers); joins a fetch already in flight
+        with self._lock:
+            entry = self._data.get(key)
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+                self.stats["refreshes"] += 1
+        if not leader:
+            return await asyncio.wrap_future(fut)
+        return await self._load(key, loader, entry, fut)
+
+    async def get(self, key, loader, ttl, stale_ttl=0.0):
+        # loader: no-argument coroutine function returning the value or raising
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            age = now - entry[0] if entry else None
+            if entry and age < ttl:
+                self.stats["fresh"] += 1
+                return entry[1]
+            if entry and age < ttl + stale_ttl:
+                self.stats["stale"] += 1
+                if key not in self._inflight:
+                    fut = self._inflight[key] = Future()
+                    self.stats["refreshes"] += 1
+                    self.background_runner(self._load(key, loader, entry, fut))
+                return entry[1]
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+                self.stats["miss"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return await asyncio.wrap_future(fut)
+        return await self._load(key, loader, entry, fut)
+
+    async def _load(self, key, loader, previous, fut):
+        value = previous[1] if previous else None
+        try:
+            value = await loader()
+            self._store(key, value)
+        except Exception as e:
+            # Stale-if-error: keep serving the last good value, never cache the failure
+            self.stats["errors"] += 1
+            print(f"Upstream Error ({key[0]}): {e}")
+        finally:
+            # Also reached when the leader is cancelled (fan-out deadline): coalesced
+            # followers get the last good value instead of waiting forever
+            with self._lock:
+                self._inflight.pop(key, None)
+            if not fut.done(): fut.set_result(value)
+        return value
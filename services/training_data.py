@@ -0,0 +1,96 @@
+import os, json, hashlib, io
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+# Shared preprocessing for train_dl_model.py and the report notebook.
+# The cleaned history is cached under data/cache/ together with the size and sha256 of the
+# CSV it came from. If the CSV is unchanged the cache is returned as is; if rows were only
+# appended (the old bytes are an unchanged prefix) just the new tail is parsed and merged;
+# anything else rebuilds from scratch.
+# The cache holds the frame after dedupe but before the numeric dropna, so an incremental
+# merge gives exactly what a full rebuild would.
+
+HISTORY_FILE = "data/prediction_history.csv"
+CACHE_DIR = "data/cache"
+FEATURES = ['Temp', 'Hum', 'Press', 'Wind', 'City_Code']
+NUMERIC = ['Temp', 'Hum', 'Press', 'Wind']
+
+
+def _sha256(path, limit=None):
+    h = hashlib.sha256()
+    remaining = os.path.getsize(path) if limit is None else limit
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block: break
+            h.update(block)
+            remaining -= len(block)
+    return h.hexdigest()
+
+
+def clean_rows(df):
+    # Row-level cleaning plus dedupe on (Time, City), keeping the first occurrence
+    df = df.copy()
+    df['Time'] = pd.to_datetime(df['Time'], format='mixed', errors='coerce')
+    df['Hour'] = df['Time'].dt.hour
+    df = df.drop_duplicates(subset=['Time', 'City'])
+    df['Report'] = df['Report'].fillna('Normal')
+    df['Mode'] = df['Mode'].fillna('standard')
+    df['Status'] = df['Status'].replace('Pending', 'No Report')
+    return df
+
+
+def _cache_paths(path, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}.pkl"), os.path.join(cache_dir, f"{stem}.json")
+
+
+def _read_tail(path, offset):
+    # The header line plus everything after the old end of file
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        tail = f.read()
+    return pd.read_csv(io.BytesIO(header + tail))
+
+
+def load_clean_history(path=HISTORY_FILE, cache_dir=CACHE_DIR, verbose=True):
+    # Cleaned history ready for feature building; see the module comment for the cache rules
+    frame_path, meta_path = _cache_paths(path, cache_dir)
+    size = os.path.getsize(path)
+    meta = None
+    if os.path.exists(frame_path) and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+
+    df, mode = None, "rebuild"
+    if meta is not None and meta["size"] == size and meta["sha256"] == _sha256(path):
+        df, mode = pd.read_pickle(frame_path), "cached"
+    elif meta is not None and meta["size"] < size and meta.get("ends_with_newline") and meta["sha256"] == _sha256(path, meta["size"]):
+        cached = pd.read_pickle(frame_path)
+        new_rows = clean_rows(_read_tail(path, meta["size"]))
+        df = pd.concat([cached, new_rows], ignore_index=True).drop_duplicates(subset=['Time', 'City'])
+        mode = f"appended {len(df) - len(cached)} rows"
+    if df is None:
+        df = clean_rows(pd.read_csv(path))
+
+    if mode != "cached":
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, "rb") as f:
+            f.seek(max(size - 1, 0))
+            ends_with_newline = f.read(1) in (b"\n", b"")
+        df.to_pickle(frame_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"source": path, "size": size, "sha256": _sha256(path), "ends_with_newline": ends_with_newline, "rows": len(df)}, f)
+    if verbose: print(f"History: {len(df)} rows ({mode})")
+    return df.dropna(subset=NUMERIC).reset_index(drop=True)
+
+
+def build_features(df):
+    # X (FEATURES), y (rain reported) and the fitted city encoder
+    df = df.copy()
+    le_city = LabelEncoder()
+    df['City_Code'] = le_city.fit_transform(df['City'])
+    X = df[FEATURES]
+    y = df['Report'].apply(lambda x: 1 if 'Rain' in str(x) else 0)
+    return X, y, le_city
@@ -0,0 +1,112 @@
+import io, os, re, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor
+import click
+from PIL import Image, ImageOps, features
+
+# Proof photos are stored under the sha256 of their bytes, so resubmitting the same photo
+# reuses the existing file. A small thumbnail is rendered in the background next to it
+# (thumbs/<name>_<size>.webp); pages link the thumbnail and open the original on click.
+# Hashed names never change content, so both are served as immutable with an ETag.
+# Older uploads (City_<ts>_....jpg) keep working; their thumbnail is built on first request
+# or in bulk with `flask build-thumbnails`.
+
+UPLOAD_DIR = "static/uploads"
+THUMB_DIR = os.path.join(UPLOAD_DIR, "thumbs")
+THUMB_SIZE = int(os.getenv("THUMB_SIZE", "320"))
+THUMB_FORMAT = "webp" if features.check("webp") else "jpg"
+THUMB_WORKERS = int(os.getenv("THUMB_WORKERS", "1"))
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+LEGACY_MAX_AGE = 24 * 3600
+
+HASHED_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "MPO": "jpg"}
+
+_executor = None
+_executor_lock = threading.Lock()
+stats = {"stored": 0, "deduplicated": 0, "thumbnails": 0, "thumbnail_errors": 0}
+
+
+def is_content_addressed(name):
+    return bool(HASHED_NAME.match(name))
+
+
+def thumb_name(name):
+    return f"{os.path.splitext(name)[0]}_{THUMB_SIZE}.{THUMB_FORMAT}"
+
+
+def _write_atomic(path, data):
+    # Concurrent writers of the same hash produce identical bytes, so last rename wins harmlessly
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def make_thumbnail(name):
+    # Draft decode at reduced scale, honour the EXIF orientation, then save the small copy
+    src = os.path.join(UPLOAD_DIR, name)
+    dst = os.path.join(THUMB_DIR, thumb_name(name))
+    with Image.open(src) as img:
+        img.draft("RGB", (THUMB_SIZE, THUMB_SIZE))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((THUMB_SIZE, THUMB_SIZE))
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, "WEBP" if THUMB_FORMAT == "webp" else "JPEG", quality=75)
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    _write_atomic(dst, buf.getvalue())
+    stats["thumbnails"] += 1
+    return dst
+
+
+def _make_thumbnail_safe(name):
+    try:
+        return make_thumbnail(name)
+    except Exception as e:
+        stats["thumbnail_errors"] += 1
+        print(f"Thumbnail Warning: {e}")
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix="thumbs")
+    return _executor
+
+
+def ensure_thumbnail(name):
+    # Path of the thumbnail, building it now if the background job has not run (or for old uploads)
+    path = os.path.join(THUMB_DIR, thumb_name(name))
+    if not os.path.exists(path):
+        make_thumbnail(name)
+    return path
+
+
+def store_upload(data):
+    # Returns the stored file name; identical bytes map to the same file
+    with Image.open(io.BytesIO(data)) as img:
+        ext = EXTENSIONS.get(img.format, "jpg")
+    name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+    path = os.path.join(UPLOAD_DIR, name)
+    if os.path.exists(path):
+        stats["deduplicated"] += 1
+    else:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        _write_atomic(path, data)
+        stats["stored"] += 1
+    if not os.path.exists(os.path.join(THUMB_DIR, thumb_name(name))):
+        _get_executor().submit(_make_thumbnail_safe, name)
+    return name
+
+
+def register_commands(app):
+    @app.cli.command("build-thumbnails")
+    def build_thumbnails():
+        """Render missing thumbnails for every stored upload."""
+        built = 0
+        for name in sorted(os.listdir(UPLOAD_DIR)) if os.path.isdir(UPLOAD_DIR) else []:
+            if not os.path.isfile(os.path.join(UPLOAD_DIR, name)) or name.endswith(".tmp"): continue
+            if os.path.exists(os.path.join(THUMB_DIR, thumb_name(name))): continue
+            if _make_thumbnail_safe(name): built += 1
+        click.echo(f"Built {built} thumbnails in {THUMB_DIR}")
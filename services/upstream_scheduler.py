@@ -0,0 +1,251 @@
+import os, time, heapq, random, asyncio, threading, itertools
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+import aiohttp, requests
+
+# Every outbound OpenWeather / Open-Meteo call passes through here (fetch_json, and the
+# blocking geocode used by Streamlit and the CLI):
+# - a token bucket per provider keeps the worker within its share of the paid quota;
+#   callers that must wait queue by priority: interactive page views, then /api/conditions
+#   fan-out, then background cache refreshes and the warmer
+# - retryable failures (429, 5xx, connection errors, timeouts) are retried with jittered
+#   exponential backoff, honouring Retry-After
+# - a circuit breaker stops calling a provider after repeated failures; calls fail fast with
+#   UpstreamUnavailable and the response cache keeps serving the last value it has
+# Buckets are per process: with N gunicorn workers set the rates to quota / N.
+
+INTERACTIVE, FANOUT, BACKGROUND = 0, 1, 2
+
+PROVIDERS = {"api.openweathermap.org": "openweather", "api.open-meteo.com": "openmeteo"}
+# Requests per second and burst size; OpenWeather's free plan allows 60 calls/minute
+PROVIDER_LIMITS = {
+    "openweather": (float(os.getenv("OPENWEATHER_RATE", "1.0")), float(os.getenv("OPENWEATHER_BURST", "10"))),
+    "openmeteo": (float(os.getenv("OPENMETEO_RATE", "5.0")), float(os.getenv("OPENMETEO_BURST", "20"))),
+}
+DEFAULT_LIMIT = (float(os.getenv("UPSTREAM_RATE", "5.0")), float(os.getenv("UPSTREAM_BURST", "20")))
+# Longest a caller queues for a token before giving up, by priority. Fan-out calls may wait
+# out the whole fan-out deadline; the endpoint only admits what the bucket can serve by then
+MAX_QUEUE_SECONDS = {INTERACTIVE: float(os.getenv("UPSTREAM_MAX_WAIT", "5")),
+                     FANOUT: float(os.getenv("UPSTREAM_FANOUT_MAX_WAIT", "20")),
+                     BACKGROUND: float(os.getenv("UPSTREAM_BACKGROUND_MAX_WAIT", "30"))}
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.5"))
+BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+priority = ContextVar("upstream_priority", default=INTERACTIVE)
+stats = {"calls": 0, "throttled": 0, "rejected": 0, "retries": 0, "short_circuited": 0, "breaker_trips": 0}
+
+
+class UpstreamUnavailable(Exception):
+    # Raised without calling the provider: circuit open or no token within the wait limit
+    pass
+
+
+class Provider:
+    def __init__(self, name, rate, burst):
+        self.name, self.rate, self.burst = name, rate, burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.waiters = []  # heap of (priority, seq)
+        self.failures = 0
+        self.open_until = 0.0
+        self.probe_until = 0.0  # half-open: one trial call in flight
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _try_take(self, ticket):
+        # (True, 0) once this ticket holds a token, else (False, seconds to sleep)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if ticket is None:
+                if self.tokens >= 1 and not self.waiters:
+                    self.tokens -= 1
+                    return True, 0.0
+                return False, None
+            if self.waiters[0] == ticket and self.tokens >= 1:
+                heapq.heappop(self.waiters)
+                self.tokens -= 1
+                return True, 0.0
+            ahead = sum(1 for w in self.waiters if w < ticket)
+            return False, max((ahead + 1 - self.tokens) / self.rate, 0.002)
+
+    def capacity(self, seconds):
+        # Calls that can start within `seconds`, after the callers already queued
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(int(self.tokens + self.rate * seconds) - len(self.waiters), 0)
+
+    def _enqueue(self, level):
+        ticket = (level, next(_sequence))
+        with self._lock:
+            heapq.heappush(self.waiters, ticket)
+        stats["throttled"] += 1
+        return ticket
+
+    def _leave(self, ticket):
+        with self._lock:
+            if ticket in self.waiters:
+                self.waiters.remove(ticket)
+                heapq.heapify(self.waiters)
+
+    def _wait_plan(self, level):
+        # Fast path, or the ticket and deadline for a queued wait
+        if self._try_take(None)[0]: return None, None
+        return self._enqueue(level), time.monotonic() + MAX_QUEUE_SECONDS[level]
+
+    def _reject(self, ticket):
+        self._leave(ticket)
+        stats["rejected"] += 1
+        raise UpstreamUnavailable(f"{self.name}: request quota exhausted")
+
+    async def acquire(self, level):
+        ticket, deadline = self._wait_plan(level)
+        if ticket is None: return
+        try:
+            while True:
+                ok, wait = self._try_take(ticket)
+                if ok: return
+                if time.monotonic() + wait > deadline: self._reject(ticket)
+                await asyncio.sleep(wait)
+        finally:
+            self._leave(ticket)
+
+    def acquire_blocking(self, level):
+        ticket, deadline = self._wait_plan(level)
+        if ticket is None: return
+        try:
+            while True:
+                ok, wait = self._try_take(ticket)
+                if ok: return
+                if time.monotonic() + wait > deadline: self._reject(ticket)
+                time.sleep(wait)
+        finally:
+            self._leave(ticket)
+
+    # --- circuit breaker ---
+
+    def check_circuit(self):
+        with self._lock:
+            now = time.monotonic()
+            if now < self.open_until or now < self.probe_until:
+                stats["short_circuited"] += 1
+                raise UpstreamUnavailable(f"{self.name}: circuit open")
+            if self.open_until:
+                # Cooldown over: let this call through as the trial; expires if it never reports
+                self.probe_until = now + BREAKER_COOLDOWN
+
+    def record(self, ok):
+        with self._lock:
+            self.probe_until = 0.0
+            if ok:
+                self.failures, self.open_until = 0, 0.0
+                return
+            self.failures += 1
+            if self.failures >= BREAKER_FAILURES or self.open_until:
+                if not self.open_until or time.monotonic() >= self.open_until: stats["breaker_trips"] += 1
+                self.open_until = time.monotonic() + BREAKER_COOLDOWN
+
+    def snapshot(self):
+        with self._lock:
+            return {"queue_depth": len(self.waiters), "tokens": round(self.tokens, 2), "failures": self.failures,
+                    "circuit_open": time.monotonic() < self.open_until}
+
+
+_sequence = itertools.count()
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def provider_for(url):
+    host = urlsplit(url).hostname or ""
+    name = PROVIDERS.get(host, host)
+    provider = _providers.get(name)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = _providers[name] = Provider(name, *PROVIDER_LIMITS.get(name, DEFAULT_LIMIT))
+    return provider
+
+
+def _retry_delay(attempt, retry_after=None):
+    if retry_after is not None: return min(retry_after, 30.0)
+    return UPSTREAM_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def classify(exc):
+    # (retryable, counts against the provider, Retry-After seconds)
+    status = getattr(exc, "status", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = exc.response.status_code  # requests.HTTPError
+    if status is not None:
+        retry_after = None
+        headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None) or {}
+        try: retry_after = float(headers.get("Retry-After")) if headers.get("Retry-After") else None
+        except (TypeError, ValueError): pass
+        return status in RETRY_STATUSES, status in RETRY_STATUSES, retry_after
+    if isinstance(exc, (aiohttp.ClientError, requests.RequestException, asyncio.TimeoutError, TimeoutError, OSError)):
+        return True, True, None  # connection errors and timeouts
+    return False, False, None
+
+
+async def schedule(url, call):
+    # Await call() under the provider's quota, retries and circuit breaker
+    provider = provider_for(url)
+    level = priority.get()
+    for attempt in range(UPSTREAM_RETRIES + 1):
+        provider.check_circuit()
+        await provider.acquire(level)
+        stats["calls"] += 1
+        try:
+            result = await call()
+        except Exception as e:
+            retryable, counts, retry_after = classify(e)
+            provider.record(not counts)
+            if not retryable or attempt == UPSTREAM_RETRIES: raise
+            stats["retries"] += 1
+            await asyncio.sleep(_retry_delay(attempt, retry_after))
+            continue
+        provider.record(True)
+        return result
+
+
+def schedule_blocking(url, call):
+    # Same as schedule() for synchronous callers (requests)
+    provider = provider_for(url)
+    level = priority.get()
+    for attempt in range(UPSTREAM_RETRIES + 1):
+        provider.check_circuit()
+        provider.acquire_blocking(level)
+        stats["calls"] += 1
+        try:
+            result = call()
+        except Exception as e:
+            retryable, counts, retry_after = classify(e)
+            provider.record(not counts)
+            if not retryable or attempt == UPSTREAM_RETRIES: raise
+            stats["retries"] += 1
+            time.sleep(_retry_delay(attempt, retry_after))
+            continue
+        provider.record(True)
+        return result
+
+
+def capacity(url, seconds):
+    return provider_for(url).capacity(seconds)
+
+
+async def in_background(coro):
+    # Run coro at background priority (cache refreshes, the warmer)
+    priority.set(BACKGROUND)
+    return await coro
+
+
+def snapshot():
+    return dict(stats, providers={name: p.snapshot() for name, p in list(_providers.items())})
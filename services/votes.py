@@ -0,0 +1,98 @@
+import os, time, threading, atexit
+from sqlalchemy import text
+from models import db
+from services.report_cache import report_cache
+
+# Votes are applied as one atomic UPDATE that increments the counter and evaluates the
+# consensus transition from the post-increment values, so concurrent voters can neither
+# lose increments nor race the status change. With VOTE_BUFFER=1 votes are first
+# coalesced per report in memory and flushed as a single UPDATE per report.
+# A flush can carry more votes than the report needed; the counters are clamped at the
+# quorum that closed it (yes wins a tie), so votes past it are accepted but not counted,
+# the same as votes that reach a closed report in direct mode.
+
+YES_QUORUM = 5
+NO_QUORUM = 3
+
+VOTE_BUFFER = os.getenv("VOTE_BUFFER", "0") == "1"
+VOTE_FLUSH_INTERVAL = float(os.getenv("VOTE_FLUSH_INTERVAL", "0.5"))
+VOTE_FLUSH_MAX = int(os.getenv("VOTE_FLUSH_MAX", "500"))
+
+# SET expressions see the pre-update row, so "votes_yes + :yes" is the new total
+VOTE_SQL = text("""
+    UPDATE p2_p_report SET
+        votes_yes = MIN(COALESCE(votes_yes, 0) + :yes, :yes_quorum),
+        votes_no = CASE
+            WHEN COALESCE(votes_yes, 0) + :yes >= :yes_quorum THEN MIN(COALESCE(votes_no, 0) + :no, :no_quorum - 1)
+            ELSE MIN(COALESCE(votes_no, 0) + :no, :no_quorum) END,
+        status = CASE
+            WHEN COALESCE(votes_yes, 0) + :yes >= :yes_quorum THEN 'verified'
+            WHEN COALESCE(votes_no, 0) + :no >= :no_quorum THEN 'rejected'
+            ELSE status END
+    WHERE id = :id AND status = 'pending'
+    RETURNING city, status
+""")
+
+
+def apply_votes(report_id, yes=0, no=0):
+    # Returns (city, status) after the update, or None if the report is not pending
+    row = db.session.execute(VOTE_SQL, {"id": report_id, "yes": yes, "no": no,
+                                        "yes_quorum": YES_QUORUM, "no_quorum": NO_QUORUM}).fetchone()
+    db.session.commit()
+    if row is not None and row.status != "pending":
+        report_cache.invalidate(row.city)
+    return row
+
+
+class VoteBuffer:
+    def __init__(self, flush_interval=VOTE_FLUSH_INTERVAL, max_pending=VOTE_FLUSH_MAX):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}  # report_id -> [yes, no]
+        self._count = 0
+        self._lock = threading.Lock()
+        self._app = None
+        self._thread = None
+        self.stats = {"buffered": 0, "flushes": 0, "updates": 0}
+
+    def add(self, app, report_id, yes, no):
+        with self._lock:
+            self._app = app
+            counts = self._pending.setdefault(report_id, [0, 0])
+            counts[0] += yes
+            counts[1] += no
+            self._count += 1
+            self.stats["buffered"] += 1
+            full = self._count >= self.max_pending
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vote-flusher", daemon=True)
+                self._thread.start()
+        if full: self.flush()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try: self.flush()
+            except Exception as e: print(f"Vote Flush Error: {e}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending, self._count = self._pending, {}, 0
+            app = self._app
+        if not pending: return 0
+        with app.app_context():
+            for report_id, (yes, no) in pending.items():
+                apply_votes(report_id, yes, no)
+        self.stats["flushes"] += 1
+        self.stats["updates"] += len(pending)
+        return len(pending)
+
+
+vote_buffer = VoteBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    if vote_buffer._app is not None:
+        try: vote_buffer.flush()
+        except Exception as e: print(f"Vote Flush Error: {e}")
@@ -0,0 +1,138 @@
+import os, time, asyncio, threading
+from collections import Counter
+from services.http_client import spawn
+from services.weather_data import (get_current_weather, get_forecast, get_air_quality, parse_current,
+                                   upstream_cache, coord_key, FORECAST_TTL, AQI_TTL)
+
+# Keeps the most requested cities warm: every cycle the top-N cities by recent traffic get
+# their weather refreshed (forecast/AQI once half their TTL has passed) and their AI
+# predictions precomputed for every user mode in one batch. main.index then finds fresh
+# upstream data in the response cache and the prediction here.
+# Runs as a task on the worker's shared event loop, since the caches it fills are per process.
+
+WARM_CACHE_TOP_N = int(os.getenv("WARM_CACHE_TOP_N", "0"))  # 0 disables the scheduler
+WARM_CACHE_INTERVAL = float(os.getenv("WARM_CACHE_INTERVAL", "240"))
+WARM_CACHE_CONCURRENCY = int(os.getenv("WARM_CACHE_CONCURRENCY", "8"))
+
+MODES = ["standard", "farmer", "construction"]
+
+
+class CityWarmer:
+    def __init__(self, top_n=WARM_CACHE_TOP_N, interval=WARM_CACHE_INTERVAL, concurrency=WARM_CACHE_CONCURRENCY):
+        self.top_n = top_n
+        self.interval = interval
+        self.concurrency = concurrency
+        self.counts = Counter()
+        self.locations = {}  # city -> (lat, lon)
+        self.predictions = {}  # (city, mode) -> (inputs, model version, (prediction, ai_temp))
+        self.refreshed_at = {}  # city -> epoch seconds
+        self.stats = {"hits": 0, "misses": 0, "cycles": 0, "refresh_errors": 0, "last_cycle_seconds": 0.0}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def record(self, city, lat, lon):
+        with self._lock:
+            self.counts[city] += 1
+            self.locations[city] = (lat, lon)
+        if self.top_n and not self._started:
+            self.start()
+
+    def lookup(self, city, mode, inputs):
+        # Only a prediction made from exactly these inputs by the current model counts as a hit
+        entry = self.predictions.get((city, mode))
+        if entry is not None and entry[0] == inputs:
+            from app import model_version
+            if entry[1] == model_version():
+                self.stats["hits"] += 1
+                return entry[2]
+        self.stats["misses"] += 1
+        return None
+
+    def hot_cities(self):
+        with self._lock:
+            return [city for city, _ in self.counts.most_common(self.top_n)]
+
+    async def _refresh_city(self, city, sem):
+        lat, lon = self.locations[city]
+        key = coord_key(lat, lon)
+        async with sem:
+            jobs = [get_current_weather(lat, lon, force=True)]
+            age = upstream_cache.age(("forecast",) + key)
+            if age is None or age > FORECAST_TTL[0] / 2:
+                jobs.append(get_forecast(lat, lon, force=True))
+            age = upstream_cache.age(("aqi",) + key)
+            if age is None or age > AQI_TTL[0] / 2:
+                jobs.append(get_air_quality(lat, lon, force=True))
+            results = await asyncio.gather(*jobs)
+        cur = parse_current(results[0])
+        return city, (cur["temp"], cur["hum"], cur["pressure"], cur["wind"])
+
+    async def refresh_once(self):
+        start = time.perf_counter()
+        sem = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*[self._refresh_city(c, sem) for c in self.hot_cities()], return_exceptions=True)
+
+        rows, keys = [], []
+        for res in results:
+            if isinstance(res, Exception):
+                self.stats["refresh_errors"] += 1
+                continue
+            city, inputs = res
+            for mode in MODES:
+                rows.append(inputs + (city, mode))
+                keys.append((city, mode, inputs))
+
+        # Both may block on the inference server socket or run the model locally; keep them
+        # off the shared loop so interactive requests are not stalled while warming
+        from app import get_ai_prediction_batch, model_version
+        version = await asyncio.to_thread(model_version)
+        preds = await asyncio.to_thread(get_ai_prediction_batch, rows)
+        now = time.time()
+        for (city, mode, inputs), pred in zip(keys, preds):
+            if pred[0] in ("Rain Expected", "No Rain"):
+                self.predictions[(city, mode)] = (inputs, version, pred)
+            self.refreshed_at[city] = now
+
+        with self._lock:
+            # Halve the counters so the hot set follows recent traffic; a single request
+            # keeps a city tracked for about three cycles
+            self.counts = Counter({c: n * 0.5 for c, n in self.counts.items() if n * 0.5 >= 0.1})
+            hot = set(self.counts) | {city for city, _, _ in keys}
+            self.locations = {c: loc for c, loc in self.locations.items() if c in hot}
+        self.predictions = {k: v for k, v in self.predictions.items() if k[0] in hot}
+        self.refreshed_at = {c: t for c, t in self.refreshed_at.items() if c in hot}
+
+        self.stats["cycles"] += 1
+        self.stats["last_cycle_seconds"] = round(time.perf_counter() - start, 3)
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                print(f"Warm Cache Error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        with self._lock:
+            if self._started: return
+            self._started = True
+        spawn(self.run())
+
+    def snapshot(self):
+        now = time.time()
+        lags = [now - t for t in self.refreshed_at.values()]
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(
+            self.stats,
+            enabled=bool(self.top_n),
+            top_n=self.top_n,
+            tracked_cities=len(self.counts),
+            warm_cities=len(self.refreshed_at),
+            hit_rate=round(self.stats["hits"] / lookups, 4) if lookups else None,
+            refresh_lag_max=round(max(lags), 1) if lags else None,
+            refresh_lag_avg=round(sum(lags) / len(lags), 1) if lags else None,
+        )
+
+
+city_warmer = CityWarmer()
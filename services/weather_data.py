@@ -0,0 +1,144 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from services.response_cache import ResponseCache
+from services.http_client import fetch_json, spawn
+
+# Upstream data layer shared by the dashboard, /forecast and the Streamlit app.
+# Open-Meteo is asked once per location for hourly and daily fields together and the
+# response is parsed once into arrays; the parsed object is what gets cached.
+
+API_KEY = os.getenv("API_KEY", "")
+
+# Per-source cache windows in seconds: (ttl, stale-while-revalidate)
+WEATHER_TTL = (300, 900)
+FORECAST_TTL = (1800, 3600)
+AQI_TTL = (900, 1800)
+
+FORECAST_DAYS = 14
+# Humidity, sea-level pressure and wind (km/h) match the model inputs parse_current produces
+HOURLY_FIELDS = "temperature_2m,relative_humidity_2m,pressure_msl,wind_speed_10m"
+DAILY_FIELDS = "weathercode,temperature_2m_max,temperature_2m_min"
+
+upstream_cache = ResponseCache(background_runner=spawn)
+
+
+def coord_key(lat, lon):
+    # ~1 km rounding so nearby lookups share one upstream response
+    return round(float(lat), 2), round(float(lon), 2)
+
+
+class ForecastData:
+    def __init__(self, hourly_time, hourly_temp, daily_time, daily_max, daily_min, daily_code=None, utc_offset_seconds=0,
+                 hourly_hum=None, hourly_press=None, hourly_wind=None):
+        self.hourly_time = hourly_time  # datetime64[m], location-local
+        self.hourly_temp = hourly_temp
+        missing = np.full(len(hourly_time), np.nan)
+        self.hourly_hum = hourly_hum if hourly_hum is not None else missing
+        self.hourly_press = hourly_press if hourly_press is not None else missing
+        self.hourly_wind = hourly_wind if hourly_wind is not None else missing
+        self.daily_time = daily_time  # datetime64[D]
+        self.daily_max = daily_max
+        self.daily_min = daily_min
+        self.daily_code = daily_code if daily_code is not None else np.zeros(len(daily_time), dtype=int)
+        self.utc_offset_seconds = utc_offset_seconds
+
+    def local_now(self):
+        return np.datetime64(datetime.utcnow() + timedelta(seconds=self.utc_offset_seconds), "m")
+
+    def hourly_start(self, now_local=None):
+        # First hour slot at or after the current local hour
+        now = now_local if now_local is not None else self.local_now()
+        now = now.astype("datetime64[h]").astype("datetime64[m]")
+        return int(np.searchsorted(self.hourly_time, now))
+
+    def hourly_window(self, hours=8, now_local=None):
+        # (["HH:MM", ...], temps) for the next `hours` slots
+        start = self.hourly_start(now_local)
+        times = self.hourly_time[start:start + hours]
+        labels = [str(t)[11:16] for t in times]
+        return labels, self.hourly_temp[start:start + hours]
+
+    def hourly_inputs(self, hours=168, now_local=None):
+        # (times, temp, hum, press, wind) from the current hour on, as arrays
+        start = self.hourly_start(now_local)
+        window = slice(start, start + hours)
+        return (self.hourly_time[window], self.hourly_temp[window], self.hourly_hum[window],
+                self.hourly_press[window], self.hourly_wind[window])
+
+    def daily_window(self, days=FORECAST_DAYS):
+        # ([date, ...], max, min, weathercode)
+        return (self.daily_time[:days].tolist(), self.daily_max[:days], self.daily_min[:days], self.daily_code[:days])
+
+
+def _hourly_series(hourly, field):
+    # None entries (gaps in the model run) become NaN; a field the response lacks stays None
+    values = hourly.get(field)
+    return None if values is None else np.array(values, dtype=float)
+
+
+def parse_forecast(raw):
+    if not raw or "hourly" not in raw or "daily" not in raw:
+        return None
+    hourly, daily = raw["hourly"], raw["daily"]
+    return ForecastData(
+        hourly_time=np.array(hourly["time"], dtype="datetime64[m]"),
+        hourly_temp=_hourly_series(hourly, "temperature_2m"),
+        hourly_hum=_hourly_series(hourly, "relative_humidity_2m"),
+        hourly_press=_hourly_series(hourly, "pressure_msl"),
+        hourly_wind=_hourly_series(hourly, "wind_speed_10m"),
+        daily_time=np.array(daily["time"], dtype="datetime64[D]"),
+        daily_max=np.array(daily["temperature_2m_max"], dtype=float),
+        daily_min=np.array(daily["temperature_2m_min"], dtype=float),
+        daily_code=np.array([c if c is not None else 0 for c in daily.get("weathercode", [])], dtype=int),
+        utc_offset_seconds=raw.get("utc_offset_seconds", 0),
+    )
+
+
+async def _load_forecast(lat, lon):
+    url = (f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
+           f"&hourly={HOURLY_FIELDS}&daily={DAILY_FIELDS}&timezone=auto&forecast_days={FORECAST_DAYS}")
+    forecast = parse_forecast(await fetch_json(url))
+    if forecast is None: raise ValueError("Open-Meteo response missing hourly/daily blocks")
+    return forecast
+
+
+async def _cached(source, lat, lon, loader, ttls, force=False):
+    key = (source,) + coord_key(lat, lon)
+    if force:
+        return await upstream_cache.refresh(key, loader)
+    return await upstream_cache.get(key, loader, *ttls)
+
+
+async def get_forecast(lat, lon, force=False):
+    return await _cached("forecast", lat, lon, lambda: _load_forecast(lat, lon), FORECAST_TTL, force)
+
+
+async def get_current_weather(lat, lon, force=False):
+    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
+    return await _cached("weather", lat, lon, lambda: fetch_json(url), WEATHER_TTL, force) or {}
+
+
+async def get_air_quality(lat, lon, force=False):
+    url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={API_KEY}"
+    return await _cached("aqi", lat, lon, lambda: fetch_json(url), AQI_TTL, force) or {}
+
+
+def parse_current(w_data):
+    # OpenWeather current-weather JSON -> the rounded inputs the dashboard and models use
+    t = round(w_data["main"]["temp"])
+    return {
+        "temp": t,
+        "hum": w_data["main"]["humidity"],
+        "pressure": w_data["main"]["pressure"],
+        "wind": round(w_data["wind"]["speed"] * 3.6, 1),
+        "visibility": round(w_data.get("visibility", 0) / 1000, 1),
+        "feels_like": round(w_data["main"].get("feels_like", t)),
+        "condition_id": w_data["weather"][0]["id"],
+    }
+
+
+def parse_aqi(aqi_data):
+    if "list" in aqi_data and len(aqi_data["list"]) > 0:
+        return aqi_data["list"][0]["main"]["aqi"]
+    return 1
@@ -1,75 +1,24 @@
 import streamlit as st
-import joblib
 import pandas as pd
 from datetime import datetime
 import asyncio
-import aiohttp
-import requests
 import os
 from dotenv import load_dotenv
+from services.geocache import geocode_city
 
 # Load Environment Variables
 load_dotenv()
 API_KEY = os.getenv("API_KEY", "")
+from services.weather_data import get_current_weather, get_forecast
+# Same model registry, engine selection and scoring code as the Flask app; predictions go
+# to the shared inference server when INFERENCE_SERVER is set
+from services.inference import get_ai_prediction, model_registry
 
-# --- Caching App Models ---
-@st.cache_resource
 def load_models():
-    try:
-        # These models are stored in the model/ directory of the project
-        temp_model = joblib.load("model/temp_regressor.pkl")
-        le_city = joblib.load("model/city_encoder.pkl")
-        le_mode = joblib.load("model/mode_encoder.pkl")
-        
-        dl_scaler = None
-        dl_loaded = False
-        if os.path.exists("model/rain_dl_model.keras"):
-            try:
-                from tensorflow.keras.models import load_model
-                rain_model = load_model("model/rain_dl_model.keras")
-                dl_scaler = joblib.load("model/dl_scaler.pkl")
-                dl_loaded = True
-            except Exception:
-                pass  # TF not available – fall back to sklearn below
-
-        if not dl_loaded:
-            rain_model = joblib.load("model/rain_classifier.pkl")
-            
-        return temp_model, rain_model, le_city, le_mode, dl_scaler
-    except Exception as e:
-        st.warning(f"Error loading models: {e}")
-        return None, None, None, None, None
-
-temp_model, rain_model, le_city, le_mode, dl_scaler = load_models()
-
-def get_ai_prediction(temp, hum, press, wind, city_name, mode_name):
-    if not all([temp_model, rain_model, le_city, le_mode]):
-        return "AI Offline", temp
-    try:
-        try: c_code = le_city.transform([city_name])[0]
-        except: c_code = 0
-        try: m_code = le_mode.transform([mode_name])[0]
-        except: m_code = 0
-            
-        if dl_scaler is not None:
-            raw_features = [[temp, hum, press, wind, c_code]]
-            scaled_features = dl_scaler.transform(raw_features)
-            dl_prob = rain_model.predict(scaled_features, verbose=0)[0][0]
-            prediction_text = "Rain Expected" if dl_prob > 0.50 else "No Rain"
-        else:
-            rain_features = [[temp, hum, press, wind, c_code]]
-            is_rain = rain_model.predict(rain_features)[0]
-            prediction_text = "Rain Expected" if is_rain == 1 else "No Rain"
-        
-        temp_features = [[hum, press, wind, c_code, m_code]]
-        ml_guess = temp_model.predict(temp_features)[0]
-        diff = ml_guess - temp
-        max_correction = 3.5
-        corrected_temp = temp + (max_correction if diff > 0 else -max_correction) if abs(diff) > max_correction else ml_guess
-
-        return prediction_text, round(corrected_temp, 1)
-    except:
-        return "Prediction Error", temp
+    # The registry loads once per process and picks up retrained artifacts itself
+    bundle = model_registry.get()
+    if bundle.error: st.warning(f"Error loading models: {bundle.error}")
+    return bundle
 
 def generate_advice(temp, hum, wind, prediction, mode, weather_id):
     is_rainy = (200 <= weather_id <= 531) or ("rain expected" in str(prediction).lower())
@@ -89,27 +38,39 @@ def generate_advice(temp, hum, wind, prediction, mode, weather_id):
         else:
              return "Clear weather expected; no umbrella needed."
 
+# --- Dataset search: parsed once per file content, shared across reruns ---
+@st.cache_resource(max_entries=4, show_spinner="Indexing dataset...")
+def load_dataset_index(digest, _data, filename):
+    # Keyed on the content digest only; cache_resource hands back the same frame
+    # instead of unpickling a copy of a large upload on every search
+    from services.dataset_index import build_index
+    return build_index(_data, filename)
+
+def uploaded_dataset_index(uploaded_file):
+    from services.dataset_index import content_digest
+    data = uploaded_file.getvalue()
+    # file_id is new for every upload, even of a same-named, same-sized file
+    file_id = getattr(uploaded_file, "file_id", None)
+    if file_id is None: return load_dataset_index(content_digest(data), data, uploaded_file.name)
+    key = ("dataset_digest", file_id)
+    if key not in st.session_state:
+        st.session_state[key] = content_digest(data)
+    return load_dataset_index(st.session_state[key], data, uploaded_file.name)
+
 async def fetch_weather_data(lat, lon):
-    async with aiohttp.ClientSession() as aio_session:
-        w_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
-        g_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=temperature_2m&timezone=auto"
-        daily_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&daily=weathercode,temperature_2m_max,temperature_2m_min&timezone=auto&forecast_days=14"
-        
-        # Dispatch concurrently
-        responses = await asyncio.gather(
-            aio_session.get(w_url),
-            aio_session.get(g_url),
-            aio_session.get(daily_url),
-            return_exceptions=True
-        )
+    # Same cached data layer as the Flask app: one Open-Meteo call covers hourly and daily
+    return await asyncio.gather(get_current_weather(lat, lon), get_forecast(lat, lon))
 
-        w_data = await responses[0].json() if not isinstance(responses[0], Exception) else {}
-        g_data = await responses[1].json() if not isinstance(responses[1], Exception) else {}
-        daily_data = await responses[2].json() if not isinstance(responses[2], Exception) else {}
-        
-        return w_data, g_data, daily_data
+def forecast_rows(forecast, hours=8, days=14):
+    # ForecastData -> chart rows for render_dashboard
+    if forecast is None: return [], []
+    labels, temps = forecast.hourly_window(hours)
+    hourly_data = [{"Time": lbl, "Temperature": round(tmp, 1)} for lbl, tmp in zip(labels, temps.tolist())]
+    dates, t_max, t_min, _ = forecast.daily_window(days)
+    daily_rows = [{"Date": d.strftime('%d %b'), "Max Temp.": round(hi), "Min Temp.": round(lo)} for d, hi, lo in zip(dates, t_max.tolist(), t_min.tolist())]
+    return hourly_data, daily_rows
 
-def render_dashboard(full_name, user_mode, t, h, p, w, fl, condition_id, hourly_data, daily_data):
+def render_dashboard(full_name, user_mode, t, h, p, w, fl, condition_id, hourly_data, daily_rows):
     prediction, ai_temp = get_ai_prediction(t, h, p, w, full_name, user_mode)
     advice = generate_advice(t, h, w, prediction, user_mode, condition_id)
     
@@ -145,12 +106,8 @@ def render_dashboard(full_name, user_mode, t, h, p, w, fl, condition_id, hourly_
 
     with cols[1]:
         st.subheader("14-Day Forecast")
-        if "daily" in daily_data:
-            fourteen_day = [{"Date": datetime.strptime(daily_data['daily']['time'][i], '%Y-%m-%d').strftime('%d %b'), 
-                             "Max Temp.": round(daily_data['daily']['temperature_2m_max'][i]), 
-                             "Min Temp.": round(daily_data['daily']['temperature_2m_min'][i])} 
-                            for i in range(14)]
-            df_daily = pd.DataFrame(fourteen_day)
+        if daily_rows:
+            df_daily = pd.DataFrame(daily_rows)
             
             # Melt the dataframe so Altair can plot multiple lines easily
             df_melted = df_daily.melt('Date', var_name='Temp Type', value_name='Temperature')
@@ -194,30 +151,39 @@ with st.sidebar:
     
     st.divider()
     st.subheader("Process from Dataset")
-    uploaded_file = st.file_uploader("Upload Dataset (CSV/JSON)", type=["csv", "json"])
+    uploaded_file = st.file_uploader("Upload Dataset (CSV/JSON)", type=["csv", "json", "jsonl"])
     
     dataset_city_search = ""
     process_dataset = False
+    score_all = False
     
     if uploaded_file is not None:
         dataset_city_search = st.text_input("Enter City Name from Dataset")
-        process_dataset = st.button("Search Dataset")
+        if st.button("Search Dataset"):
+            st.session_state['dataset_query'] = dataset_city_search
+        # Kept across reruns so picking another match does not reset the search
+        process_dataset = bool(st.session_state.get('dataset_query'))
+        dataset_city_search = st.session_state.get('dataset_query', "")
+
+        from services.bulk_scoring import parquet_available
+        score_format = st.selectbox("Scored Output", options=["csv", "parquet"] if parquet_available() else ["csv"])
+        score_all = st.button("Score Entire Dataset")
 
 if fetch_btn and city_input:
+    st.session_state['dataset_query'] = ""
     st.session_state['last_city'] = city_input
     st.session_state['last_mode'] = user_mode
     
     with st.spinner(f"Fetching data for {city_input}..."):
         try:
-            # 1. Fetch Geo Location
-            geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city_input}&limit=1&appid={API_KEY}"
-            geo_data = requests.get(geo_url).json()
+            # 1. Fetch Geo Location (shared cache with the Flask app)
+            geo = geocode_city(city_input, API_KEY)
 
-            if geo_data:
-                lat, lon, full_name = geo_data[0]['lat'], geo_data[0]['lon'], geo_data[0]['name']
+            if geo:
+                lat, lon, full_name = geo['lat'], geo['lon'], geo['name']
                 
                 # 2. Fetch Data Concurrently
-                w_data, g_data, daily_data = asyncio.run(fetch_weather_data(lat, lon))
+                w_data, forecast = asyncio.run(fetch_weather_data(lat, lon))
                 
                 # 3. Parse Responses
                 t = round(w_data["main"]["temp"])
@@ -228,36 +194,34 @@ if fetch_btn and city_input:
                 fl = round(w_data["main"].get("feels_like", t))
                 condition_id = w_data["weather"][0]["id"]
 
-                from datetime import timezone, timedelta
-                hourly_data = []
-                
-                utc_dt = datetime.fromtimestamp(w_data["dt"], timezone.utc)
-                city_time = utc_dt + timedelta(seconds=w_data.get("timezone", 0))
-                curr_hour_str = city_time.strftime("%Y-%m-%dT%H:00")
-                
-                start_idx = 0
-                if "hourly" in g_data and "time" in g_data["hourly"]:
-                    for idx, time_str in enumerate(g_data["hourly"]["time"]):
-                        if time_str >= curr_hour_str:
-                            start_idx = idx
-                            break
-
-                    for i in range(start_idx, start_idx + 8):
-                        if i < len(g_data["hourly"]["time"]):
-                            hourly_data.append({
-                                "Time": g_data["hourly"]["time"][i].split("T")[1],
-                                "Temperature": round(g_data["hourly"]["temperature_2m"][i], 1)
-                            })
-
+                hourly_data, daily_rows = forecast_rows(forecast)
 
                 # 4. Perform AI logic and render
-                render_dashboard(full_name, user_mode, t, h, p, w, fl, condition_id, hourly_data, daily_data)
+                render_dashboard(full_name, user_mode, t, h, p, w, fl, condition_id, hourly_data, daily_rows)
 
             else:
                 st.error(f"City '{city_input}' not found. Please try a different location.")
         except Exception as e:
             st.error(f"Error fetching weather data: {e}")
 
+elif score_all and uploaded_file is not None:
+    st.session_state['last_mode'] = user_mode
+    from services.bulk_scoring import ChunkScorer, score_dataset
+    
+    st.subheader(f"Scoring {uploaded_file.name}")
+    bar = st.progress(0.0, text="Starting...")
+    try:
+        scorer = ChunkScorer(load_models(), user_mode)
+        path, rows = score_dataset(uploaded_file, uploaded_file.name, scorer, fmt=score_format,
+                                   progress=lambda done, frac: bar.progress(frac, text=f"{done:,} rows scored"))
+        bar.progress(1.0, text=f"{rows:,} rows scored")
+        # Kept on disk; only the path is remembered so the download survives reruns
+        old = st.session_state.get('scored_file')
+        if old and os.path.exists(old[0]): os.remove(old[0])
+        st.session_state['scored_file'] = (path, f"{os.path.splitext(uploaded_file.name)[0]}_scored.{score_format}")
+    except Exception as e:
+        st.error(f"Error scoring dataset: {e}")
+
 elif process_dataset and uploaded_file is not None and dataset_city_search:
     st.session_state['last_mode'] = user_mode
     import numpy as np
@@ -265,43 +229,21 @@ elif process_dataset and uploaded_file is not None and dataset_city_search:
     
     with st.spinner(f"Searching for {dataset_city_search} in dataset..."):
         try:
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_json(uploaded_file)
-                
-            def find_col(dataframe, possible_names):
-                for col in dataframe.columns:
-                    if col.lower() in possible_names: return col
-                return None
-                
-            city_col = find_col(df, ['city', 'location', 'name', 'place', 'district', 'subdivision', 'state_ut_name', 'state'])
-            temp_col = find_col(df, ['temp', 'temperature', 't', 'avgtemp'])
-            hum_col = find_col(df, ['humidity', 'hum', 'h'])
-            press_col = find_col(df, ['pressure', 'press', 'p'])
-            wind_col = find_col(df, ['wind', 'windspeed', 'wind_speed', 'w'])
+            index = uploaded_dataset_index(uploaded_file)
+            matches = index.search(dataset_city_search)
             
-            if city_col is None: df['city'] = [f"Location {i+1}" for i in range(len(df))]
-            else: df['city'] = df[city_col]
-            
-            # Filter dataset
-            search_mask = pd.Series(False, index=df.index)
-            for col in df.select_dtypes(include=['object', 'string']).columns:
-                search_mask = search_mask | df[col].astype(str).str.contains(dataset_city_search, case=False, na=False)
-            
-            df_filtered = df[search_mask]
-            
-            if df_filtered.empty:
+            if matches.empty:
                 st.warning(f"Could not find '{dataset_city_search}' in the uploaded dataset.")
             else:
-                # Take just the first match
-                row = df_filtered.iloc[0]
+                # Ranked matches: exact value, whole word, word prefix, substring
+                st.caption(f"{matches.attrs['total']} matching row(s) for '{dataset_city_search}', top {len(matches)} shown")
+                st.dataframe(matches, use_container_width=True, height=min(35 * (len(matches) + 1), 250))
+                positions = matches.attrs["positions"]
+                label = lambda i: f"#{i + 1}: {index.row_inputs(matches.iloc[i], positions[i])[0]} ({matches.iloc[i]['match']})"
+                pick = st.selectbox("Use match", options=list(range(len(matches))), format_func=label) if len(matches) > 1 else 0
+                row = matches.iloc[pick]
                 
-                c_name = str(row['city'])
-                t = float(row[temp_col]) if temp_col and pd.notnull(row[temp_col]) else 25.0
-                h = float(row[hum_col]) if hum_col and pd.notnull(row[hum_col]) else 60.0
-                p = float(row[press_col]) if press_col and pd.notnull(row[press_col]) else 1013.0
-                w = float(row[wind_col]) if wind_col and pd.notnull(row[wind_col]) else 10.0
+                c_name, t, h, p, w = index.row_inputs(row, positions[pick])
                 
                 fl = round(t + np.random.uniform(-1, 1))
                 condition_id = 500 if h > 80 else 800
@@ -315,17 +257,21 @@ elif process_dataset and uploaded_file is not None and dataset_city_search:
                     variation = np.sin((now.hour + i)/24.0 * np.pi) * 3 + np.random.uniform(-1,1)
                     hourly_data.append({"Time": hr_time, "Temperature": round(base_t + variation, 1)})
                     
-                daily_data = {"daily": {"time": [], "temperature_2m_max": [], "temperature_2m_min": []}}
+                daily_rows = []
                 for i in range(14):
-                    day_str = (now + timedelta(days=i)).strftime("%Y-%m-%d")
-                    daily_data["daily"]["time"].append(day_str)
+                    day_str = (now + timedelta(days=i)).strftime("%d %b")
                     base_max = base_t + np.random.uniform(2, 5)
                     base_min = base_t - np.random.uniform(2, 5)
                     trend = np.sin(i/14.0 * np.pi * 2) * 2
-                    daily_data["daily"]["temperature_2m_max"].append(round(base_max + trend))
-                    daily_data["daily"]["temperature_2m_min"].append(round(base_min + trend))
+                    daily_rows.append({"Date": day_str, "Max Temp.": round(base_max + trend), "Min Temp.": round(base_min + trend)})
 
-                render_dashboard(c_name, user_mode, t, h, p, w, fl, condition_id, hourly_data, daily_data)
+                render_dashboard(c_name, user_mode, t, h, p, w, fl, condition_id, hourly_data, daily_rows)
                     
         except Exception as e:
             st.error(f"Error processing document: {e}")
+
+scored = st.session_state.get('scored_file')
+if scored and os.path.exists(scored[0]):
+    with open(scored[0], "rb") as f:
+        st.download_button("Download Scored Dataset", data=f, file_name=scored[1],
+                           mime="application/octet-stream" if scored[1].endswith(".parquet") else "text/csv")
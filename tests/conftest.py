@@ -0,0 +1,6 @@
+import os, sys
+
+# Artifacts and data are addressed relative to the project root, as in app.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
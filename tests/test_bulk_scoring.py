@@ -0,0 +1,41 @@
+import io, os
+import joblib
+import numpy as np
+import pandas as pd
+from services.bulk_scoring import ChunkScorer, score_dataset
+from services.compiled_models import compile_estimator
+from services.inference import model_registry, score_local_batch
+from services.model_registry import ModelBundle
+
+
+def _upload():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"City": rng.choice(["Mumbai", "Pune", "Delhi", "Nowhere"], 500),
+                       "Temp": rng.uniform(10, 40, 500).round(1), "Humidity": rng.uniform(20, 100, 500).round(0),
+                       "Pressure": rng.uniform(990, 1025, 500).round(0), "Wind": rng.uniform(0, 30, 500).round(1)})
+    return df, io.BytesIO(df.to_csv(index=False).encode())
+
+
+def test_bulk_scores_match_the_batch_inference_path():
+    df, source = _upload()
+    path, rows = score_dataset(source, "upload.csv", ChunkScorer(model_registry.get(), "farmer"), chunksize=128)
+    scored = pd.read_csv(path)
+    os.remove(path)
+    expected = score_local_batch(zip(df.Temp, df.Humidity, df.Pressure, df.Wind, df.City, ["farmer"] * len(df)))
+    assert rows == len(df)
+    assert scored["ai_prediction"].tolist() == [r[0] for r in expected]
+    np.testing.assert_allclose(scored["ai_temp"], [r[1] for r in expected])
+    np.testing.assert_allclose(scored["ai_rain_prob"], [r[2] for r in expected], atol=1e-4)
+    assert not scored["ai_rain_prob"].isna().any()
+
+
+def test_sklearn_fallback_reports_probabilities():
+    # The classifier engine used when neither rain network is available
+    bundle = ModelBundle(compile_estimator(joblib.load("model/temp_regressor.pkl")), compile_estimator(joblib.load("model/rain_classifier.pkl")),
+                         joblib.load("model/city_encoder.pkl"), joblib.load("model/mode_encoder.pkl"), engine="sklearn")
+    df, source = _upload()
+    path, _ = score_dataset(source, "upload.csv", ChunkScorer(bundle, "standard"))
+    scored = pd.read_csv(path)
+    os.remove(path)
+    assert scored["ai_rain_prob"].between(0, 1).all()
+    assert ((scored["ai_rain_prob"] > 0.5) == (scored["ai_prediction"] == "Rain Expected")).all()
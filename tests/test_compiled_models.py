@@ -0,0 +1,59 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import AdaBoostClassifier, BaggingClassifier, BaggingRegressor, RandomForestRegressor, ExtraTreesClassifier
+from sklearn.tree import DecisionTreeRegressor
+from services.compiled_models import compile_estimator, _history_features, MODEL_REG_PATH, MODEL_CLF_PATH
+
+
+@pytest.fixture(scope="module")
+def history():
+    le_city = joblib.load("model/city_encoder.pkl")
+    le_mode = joblib.load("model/mode_encoder.pkl")
+    rain_X, temp_X = _history_features(le_city, le_mode)
+    return {MODEL_REG_PATH: temp_X, MODEL_CLF_PATH: rain_X}
+
+
+@pytest.mark.parametrize("path", [MODEL_REG_PATH, MODEL_CLF_PATH])
+def test_shipped_models_match_sklearn_exactly(history, path):
+    est = joblib.load(path)
+    compiled = compile_estimator(est)
+    X = history[path]
+    np.testing.assert_array_equal(compiled.predict(X), est.predict(X))
+    # Row by row too: BLAS may sum a 1-row product in a different order than a batch
+    for i in range(0, len(X), max(1, len(X) // 200)):
+        np.testing.assert_array_equal(compiled.predict(X[i:i + 1]), est.predict(X[i:i + 1]))
+
+
+def _data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, 5))
+    return X, X[:, 0] + 0.5 * X[:, 1] ** 2 + rng.normal(scale=0.1, size=300)
+
+
+@pytest.mark.parametrize("est", [
+    RandomForestRegressor(n_estimators=20, max_depth=6, random_state=0),
+    DecisionTreeRegressor(max_depth=8, random_state=0),
+])
+def test_supported_regressors(est):
+    X, y = _data()
+    est.fit(X, y)
+    np.testing.assert_array_equal(compile_estimator(est).predict(X), est.predict(X))
+
+
+def test_supported_classifier():
+    X, y = _data()
+    est = ExtraTreesClassifier(n_estimators=15, random_state=0).fit(X, np.digitize(y, [-0.5, 0.5, 1.5]))
+    np.testing.assert_array_equal(compile_estimator(est).predict(X), est.predict(X))
+
+
+@pytest.mark.parametrize("est", [
+    AdaBoostClassifier(n_estimators=10, random_state=0),
+    BaggingClassifier(n_estimators=5, max_features=0.6, random_state=0),
+    BaggingRegressor(n_estimators=5, random_state=0),
+])
+def test_weighted_and_feature_bagged_ensembles_rejected(est):
+    X, y = _data()
+    est.fit(X, y > 0 if hasattr(est, "predict_proba") else y)
+    with pytest.raises(TypeError):
+        compile_estimator(est)
@@ -0,0 +1,24 @@
+from services.district_index import DistrictIndex, resolve_district
+
+# Hinjawadi, a Pune suburb whose name is not a district
+HINJAWADI = (18.5912, 73.7389)
+
+
+def test_coordinates_alone_resolve_to_the_nearest_district():
+    match = resolve_district(None, lat=HINJAWADI[0], lon=HINJAWADI[1])
+    assert (match["district"], match["method"]) == ("PUNE", "nearest")
+    assert 0 < match["distance"] < 20
+
+
+def test_unmatched_name_falls_back_to_coordinates():
+    match = resolve_district("Hinjawadi", "Maharashtra", *HINJAWADI, country="IN")
+    assert (match["state"], match["district"], match["method"]) == ("MAHARASHTRA", "PUNE", "nearest")
+
+
+def test_coordinates_far_from_every_anchor_do_not_match():
+    assert resolve_district(None, lat=8.0883, lon=77.5385) is None  # Kanyakumari
+
+
+def test_history_anchors_are_used_without_the_centroids_file(tmp_path):
+    index = DistrictIndex(centroids_path=str(tmp_path / "missing.json"))
+    assert index.nearest(*HINJAWADI).district == "PUNE"
@@ -0,0 +1,64 @@
+import asyncio
+from functools import partial
+import pytest
+from services import fanout, http_client, upstream_scheduler, weather_data
+from services.geocache import GeocodeCache, geocode_city_async, cached_geocode
+from services.response_cache import ResponseCache
+from services.upstream_scheduler import Provider
+
+CALLS = []
+
+
+async def fake_get_json(session, url, params):
+    CALLS.append(url)
+    await asyncio.sleep(0.005)
+    if "geo/1.0" in url:
+        i = int(params["q"].split()[-1])  # distinct coordinates, so no two cities share a weather fetch
+        return [{"lat": 10 + i * 0.1, "lon": 72.87, "name": params["q"], "state": "Maharashtra", "country": "IN"}]
+    if "air_pollution" in url:
+        return {"list": [{"main": {"aqi": 2}}]}
+    return {"main": {"temp": 29.4, "humidity": 70, "pressure": 1008}, "wind": {"speed": 3.2}, "weather": [{"id": 801}]}
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    # Real scheduler and caches; only the HTTP hop is faked
+    CALLS.clear()
+    cache = GeocodeCache(db_path=str(tmp_path / "geocode.db"))
+    responses = ResponseCache()
+    monkeypatch.setattr(http_client, "_get_json", fake_get_json)
+    monkeypatch.setattr(weather_data, "upstream_cache", responses)
+    monkeypatch.setattr(fanout, "upstream_cache", responses)
+    monkeypatch.setattr(fanout, "geocode_city_async", partial(geocode_city_async, cache=cache))
+    monkeypatch.setattr(fanout, "cached_geocode", partial(cached_geocode, cache=cache))
+    def set_limits(rate, burst):
+        monkeypatch.setitem(upstream_scheduler._providers, "openweather", Provider("openweather", rate, burst))
+    return set_limits
+
+
+def _run(cities, deadline):
+    predict = lambda rows: [("No Rain", r[0]) for r in rows]
+    return asyncio.run(fanout.fetch_conditions(cities, "standard", "key", predict, deadline=deadline))
+
+
+def test_oversized_request_is_rejected_before_any_call(upstream):
+    upstream(*upstream_scheduler.PROVIDER_LIMITS["openweather"])
+    cities = [f"City {i}" for i in range(300)]
+    with pytest.raises(fanout.FanoutOverBudget) as e:
+        _run(cities, fanout.FANOUT_DEADLINE)
+    assert e.value.needed == 900 and e.value.available < 900
+    assert CALLS == []
+
+
+def test_admitted_list_completes_within_the_bucket(upstream):
+    upstream(100.0, 10.0)
+    cities = [f"City {i}" for i in range(60)]
+    results, _ = _run(cities, 3.0)
+    assert [r for r in results if "error" in r] == []
+    assert len(CALLS) == 180
+
+    # Now cached: the same list needs no calls and fits an empty bucket
+    upstream(0.001, 0.0)
+    results, _ = _run(cities, 3.0)
+    assert all(r["prediction"] == "No Rain" for r in results)
+    assert len(CALLS) == 180
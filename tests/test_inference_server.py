@@ -0,0 +1,36 @@
+import asyncio
+from functools import partial
+import pytest
+from services.inference import score_local_batch
+from services.inference_server import MicroBatcher, check_rows
+
+GOOD = (30.0, 80.0, 1000.0, 3.0, "Mumbai", "standard")
+BAD = (30.0, 80.0, 1000.0)
+
+
+async def _submit_together(*requests):
+    # A long wait window so every request lands in the same batch
+    batcher = MicroBatcher(partial(score_local_batch, strict=True), max_batch=64, max_wait_us=200_000)
+    runner = asyncio.ensure_future(batcher.run())
+    try:
+        return await asyncio.gather(*[batcher.submit(rows) for rows in requests], return_exceptions=True)
+    finally:
+        runner.cancel()
+
+
+def test_bad_row_does_not_fail_the_batch():
+    good, bad = asyncio.run(_submit_together([GOOD], [BAD]))
+    assert isinstance(bad, Exception)
+    assert good[0][0] in ("Rain Expected", "No Rain")
+    assert good == score_local_batch([GOOD])
+
+
+def test_non_strict_scoring_still_marks_rows():
+    assert [r[0] for r in score_local_batch([GOOD, BAD])] == ["Prediction Error"] * 2
+
+
+def test_check_rows_rejects_malformed_requests():
+    assert check_rows([GOOD]) == [GOOD]
+    for rows in ([BAD], [(30.0, 80.0, "x", 3.0, "Mumbai", "standard")], [(True, 80.0, 1000.0, 3.0, "Mumbai", "standard")]):
+        with pytest.raises(ValueError):
+            check_rows(rows)
@@ -0,0 +1,42 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from services.numpy_engine import load_numpy_engine, is_current, DL_MODEL_PATH, DL_SCALER_PATH, NUMPY_MODEL_PATH
+
+
+def test_shipped_export_matches_keras():
+    keras = pytest.importorskip("tensorflow.keras.models")
+    model = keras.load_model(DL_MODEL_PATH)
+    scaler = joblib.load(DL_SCALER_PATH)
+    np_model, np_scaler = load_numpy_engine(NUMPY_MODEL_PATH)
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(scaler.mean_, scaler.scale_, size=(256, len(scaler.mean_)))
+    np.testing.assert_allclose(np_scaler.transform(X), scaler.transform(X), rtol=1e-12)
+    keras_out = model.predict(scaler.transform(X), verbose=0).reshape(-1)
+    numpy_out = np_model.predict(np_scaler.transform(X)).reshape(-1)
+    np.testing.assert_allclose(numpy_out, keras_out, atol=1e-5)
+
+
+def test_shipped_export_is_current():
+    # load_bundle prefers the .npz whenever it is current, so it must come from this .keras
+    assert is_current(NUMPY_MODEL_PATH, DL_MODEL_PATH)
+
+
+def test_stale_export_detected(tmp_path):
+    model_path = tmp_path / "rain.keras"
+    model_path.write_bytes(open(DL_MODEL_PATH, "rb").read())
+    npz_path = tmp_path / "rain.npz"
+    with np.load(NUMPY_MODEL_PATH, allow_pickle=False) as art:
+        np.savez(npz_path, **{k: art[k] for k in art.files})
+    assert is_current(str(npz_path), str(model_path))
+
+    model_path.write_bytes(model_path.read_bytes() + b"retrained")
+    assert not is_current(str(npz_path), str(model_path))
+
+    # Exports without a digest are compared by modification time
+    with np.load(npz_path, allow_pickle=False) as art:
+        np.savez(npz_path, **{k: art[k] for k in art.files if k != "source_digest"})
+    os.utime(model_path, (os.path.getmtime(npz_path) + 10,) * 2)
+    assert not is_current(str(npz_path), str(model_path))
@@ -0,0 +1,171 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from flask import Flask
+from models import db, P2PReport
+from services import votes as votes_module
+from services.votes import apply_votes, VoteBuffer, YES_QUORUM, NO_QUORUM
+
+
+@pytest.fixture
+def app(tmp_path):
+    # A file database, so every voting thread gets its own connection as in production
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'votes.db'}"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _report(app):
+    with app.app_context():
+        report = P2PReport(city="Pune", report_type="Rain", status="pending", votes_yes=0, votes_no=0)
+        db.session.add(report)
+        db.session.commit()
+        return report.id
+
+
+def _state(app, report_id):
+    with app.app_context():
+        r = db.session.get(P2PReport, report_id)
+        return r.votes_yes, r.votes_no, r.status
+
+
+def _in_parallel(votes, cast):
+    # Release every voter at once to maximise contention
+    barrier = threading.Barrier(len(votes))
+    results = [None] * len(votes)
+
+    def run(i, vote):
+        barrier.wait()
+        results[i] = cast(*vote)
+    threads = [threading.Thread(target=run, args=(i, v)) for i, v in enumerate(votes)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return results
+
+
+def _direct(app, report_id):
+    def cast(yes, no):
+        with app.app_context():
+            return apply_votes(report_id, yes, no)
+    return cast
+
+
+def test_parallel_votes_below_quorum_are_all_counted(app):
+    report_id = _report(app)
+    votes = [(1, 0)] * (YES_QUORUM - 1) + [(0, 1)] * (NO_QUORUM - 1)
+    results = _in_parallel(votes, _direct(app, report_id))
+    assert all(r is not None for r in results)
+    assert _state(app, report_id) == (YES_QUORUM - 1, NO_QUORUM - 1, "pending")
+
+
+def test_parallel_yes_votes_verify_exactly_once(app):
+    report_id = _report(app)
+    results = _in_parallel([(1, 0)] * 40, _direct(app, report_id))
+    # Votes after the transition find the report closed and are not applied
+    applied = [r for r in results if r is not None]
+    assert len(applied) == YES_QUORUM
+    assert sum(1 for r in applied if r.status == "verified") == 1
+    assert _state(app, report_id) == (YES_QUORUM, 0, "verified")
+
+
+def test_parallel_no_votes_reject_exactly_once(app):
+    report_id = _report(app)
+    results = _in_parallel([(0, 1)] * 40, _direct(app, report_id))
+    applied = [r for r in results if r is not None]
+    assert len(applied) == NO_QUORUM
+    assert _state(app, report_id) == (0, NO_QUORUM, "rejected")
+
+
+def test_parallel_mixed_votes_reach_one_consistent_outcome(app):
+    report_id = _report(app)
+    votes = [(1, 0), (0, 1)] * 30
+    results = _in_parallel(votes, _direct(app, report_id))
+    yes = sum(v[0] for v, r in zip(votes, results) if r is not None)
+    no = sum(v[1] for v, r in zip(votes, results) if r is not None)
+    state = _state(app, report_id)
+    assert state[:2] == (yes, no)
+    assert state in ((YES_QUORUM, no, "verified"), (yes, NO_QUORUM, "rejected"))
+
+
+def test_buffered_votes_are_coalesced_with_exact_counts(app):
+    buffer = VoteBuffer(flush_interval=3600, max_pending=10000)
+    pending_id, verified_id, rejected_id = _report(app), _report(app), _report(app)
+    votes = ([(pending_id, 1, 0)] * (YES_QUORUM - 1) + [(pending_id, 0, 1)] * (NO_QUORUM - 1)
+             + [(verified_id, 1, 0)] * 30 + [(verified_id, 0, 1)] * 2 + [(rejected_id, 0, 1)] * 25)
+    _in_parallel(votes, lambda report_id, yes, no: buffer.add(app, report_id, yes, no))
+    assert buffer.flush() == 3
+    assert buffer.stats["buffered"] == len(votes)
+    # One UPDATE per report carries every buffered vote; counts stop at the deciding quorum
+    assert _state(app, pending_id) == (YES_QUORUM - 1, NO_QUORUM - 1, "pending")
+    assert _state(app, verified_id) == (YES_QUORUM, 2, "verified")
+    assert _state(app, rejected_id) == (0, NO_QUORUM, "rejected")
+
+    # Votes buffered after the transition are not applied to the closed report
+    buffer.add(app, verified_id, 0, 5)
+    buffer.flush()
+    assert _state(app, verified_id) == (YES_QUORUM, 2, "verified")
+
+
+def test_buffered_tie_is_decided_by_yes_and_clamped(app):
+    buffer = VoteBuffer(flush_interval=3600, max_pending=10000)
+    report_id = _report(app)
+    for _ in range(10): buffer.add(app, report_id, 1, 1)
+    buffer.flush()
+    assert _state(app, report_id) == (YES_QUORUM, NO_QUORUM - 1, "verified")
+
+
+# --- Load: thousands of votes through a thread pool ---------------------------------
+
+VOTES = 2000
+THREADS = 64
+
+
+@pytest.fixture
+def raised_quorums(monkeypatch):
+    # Quorums in the thousands so every vote of the run lands on one open report
+    monkeypatch.setattr(votes_module, "YES_QUORUM", 1500)
+    monkeypatch.setattr(votes_module, "NO_QUORUM", 1500)
+
+
+def _casters(app, mode):
+    # cast(report_id, yes, no) and a final drain for each ingestion mode
+    if mode == "direct":
+        def cast(report_id, yes, no):
+            with app.app_context():
+                return apply_votes(report_id, yes, no)
+        return cast, lambda: None
+    buffer = VoteBuffer(flush_interval=3600, max_pending=50)  # adding threads flush every 50 votes
+    return (lambda report_id, yes, no: buffer.add(app, report_id, yes, no)), buffer.flush
+
+
+def _pool(votes, cast):
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return list(pool.map(lambda v: cast(*v), votes))
+
+
+@pytest.mark.parametrize("mode", ["direct", "buffered"])
+def test_thousands_of_parallel_votes_are_counted_exactly(app, raised_quorums, mode):
+    report_id = _report(app)
+    cast, drain = _casters(app, mode)
+    votes = [(report_id, 1, 0) if i % 3 else (report_id, 0, 1) for i in range(VOTES)]
+    _pool(votes, cast)
+    drain()
+    yes = sum(v[1] for v in votes)
+    assert _state(app, report_id) == (yes, VOTES - yes, "pending")
+
+
+@pytest.mark.parametrize("mode", ["direct", "buffered"])
+def test_thousands_of_parallel_votes_stop_at_the_quorum(app, raised_quorums, mode):
+    report_id = _report(app)
+    cast, drain = _casters(app, mode)
+    results = _pool([(report_id, 1, 0)] * VOTES, cast)
+    drain()
+    if mode == "direct":
+        applied = [r for r in results if r is not None]
+        assert len(applied) == 1500
+        assert sum(1 for r in applied if r.status == "verified") == 1
+    assert _state(app, report_id) == (1500, 0, "verified")
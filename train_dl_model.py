@@ -1,87 +1,133 @@
-import pandas as pd
-import numpy as np
 import joblib
 import os
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout
+import argparse
+import itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler
+from services.training_data import load_clean_history, build_features
 
-# Set random seeds for reproducibility
-np.random.seed(42)
-tf.random.set_seed(42)
+SEED = 42
 
-def build_and_train_dl_model():
-    print("1. Loading Data...")
-    df = pd.read_csv('data/prediction_history.csv')
+# Candidate networks for the search; the first entry is the original fixed architecture
+SEARCH_SPACE = {
+    "layers": [(32, 16, 8), (64, 32, 16), (16, 8), (64, 32)],
+    "dropout": [0.2, 0.1],
+    "learning_rate": [1e-3, 3e-3],
+    "batch_size": [16, 64],
+}
+
+
+def search_configs(space=SEARCH_SPACE):
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def build_model(n_features, layers=(32, 16, 8), dropout=0.2, learning_rate=1e-3, **_):
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Dropout, Input
+
+    stack = [Input(shape=(n_features,))]
+    for i, units in enumerate(layers):
+        stack.append(Dense(units, activation='relu'))
+        # Same pattern as the original net: dropout after every hidden layer but the last
+        if dropout and i < len(layers) - 1: stack.append(Dropout(dropout))
+    stack.append(Dense(1, activation='sigmoid')) # Sigmoid strictly outputs 0 to 1 probability
+    model = Sequential(stack)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='binary_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def train_candidate(args):
+    # Runs in a worker process: one config, early stopping on validation loss.
+    # Returns the score and the best weights so the parent can rebuild the winner.
+    config, X_train, y_train, X_val, y_val, max_epochs, patience = args
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    tf.keras.utils.set_random_seed(SEED)
+
+    model = build_model(X_train.shape[1], **config)
+    stop = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+    history = model.fit(X_train, y_train, epochs=max_epochs, batch_size=config["batch_size"],
+                        validation_data=(X_val, y_val), callbacks=[stop], verbose=0)
+    loss, accuracy = model.evaluate(X_val, y_val, verbose=0)
+    return {"config": config, "val_loss": float(loss), "val_accuracy": float(accuracy),
+            "epochs": len(history.history['loss']), "weights": model.get_weights()}
 
-    # Data Cleaning (matching original logic)
-    df['Time'] = pd.to_datetime(df['Time'], format='mixed', errors='coerce')
-    df['Hour'] = df['Time'].dt.hour
-    df = df.drop_duplicates(subset=['Time', 'City'])
-    df['Report'] = df['Report'].fillna('Normal')
-    df['Mode'] = df['Mode'].fillna('standard')
-    df['Status'] = df['Status'].replace('Pending', 'No Report')
-    df = df.dropna(subset=['Temp', 'Hum', 'Press', 'Wind'])
 
-    # City Encoding
-    le_city = LabelEncoder()
-    df['City_Code'] = le_city.fit_transform(df['City'])
+def run_search(X_train, y_train, X_val, y_val, configs, workers, max_epochs, patience):
+    jobs = [(c, X_train, y_train, X_val, y_val, max_epochs, patience) for c in configs]
+    if workers <= 1:
+        return [train_candidate(j) for j in jobs]
+    # spawn: TensorFlow is not fork-safe once initialised
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        return list(pool.map(train_candidate, jobs))
+
+
+def build_and_train_dl_model(search=True, workers=None, max_epochs=100, patience=10):
+    print("1. Loading Data...")
+    # Cleaned once and cached by source hash; only appended rows are re-processed
+    df = load_clean_history()
 
     # Feature & Target Selection
     # Features: [Temp, Hum, Press, Wind, City_Code]
-    X = df[['Temp', 'Hum', 'Press', 'Wind', 'City_Code']]
-    y = df['Report'].apply(lambda x: 1 if 'Rain' in str(x) else 0)
+    X, y, le_city = build_features(df)
 
-    # Train/Test Split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Train/Validation/Test Split: early stopping and the search pick on validation, the
+    # held-out test set is scored once at the end so the reported accuracy is unbiased
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=SEED)
+    X_train, X_val, y_train, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=SEED)
 
     # Deep Learning scaling requires standardized inputs for fast/stable convergence
     print("2. Normalizing Feedforward Features...")
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
+    X_val_scaled = scaler.transform(X_val)
     X_test_scaled = scaler.transform(X_test)
+    y_train, y_val, y_test = y_train.to_numpy(), y_val.to_numpy(), y_test.to_numpy()
+
+    configs = search_configs() if search else search_configs()[:1]
+    workers = workers or min(len(configs), os.cpu_count() or 1)
+    print(f"3. Training {len(configs)} candidate network(s) on {workers} worker(s)...")
+    results = run_search(X_train_scaled, y_train, X_val_scaled, y_val, configs, workers, max_epochs, patience)
+    results.sort(key=lambda r: (r["val_loss"], -r["val_accuracy"]))
+    for r in results:
+        print(f"   val_loss={r['val_loss']:.4f} acc={r['val_accuracy']*100:.2f}% epochs={r['epochs']} {r['config']}")
 
-    # Build the Neural Network
-    print("3. Building the Neural Network...")
-    model = Sequential([
-        Dense(32, activation='relu', input_shape=(X_train_scaled.shape[1],)),
-        Dropout(0.2), # Prevent overfitting
-        Dense(16, activation='relu'),
-        Dropout(0.2),
-        Dense(8, activation='relu'),
-        Dense(1, activation='sigmoid') # Sigmoid strictly outputs 0 to 1 probability
-    ])
-
-    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
-
-    # Train the Neural Network
-    print("4. Training Deep Learning Engine...")
-    history = model.fit(
-        X_train_scaled, y_train, 
-        epochs=100, 
-        batch_size=16, 
-        validation_data=(X_test_scaled, y_test),
-        verbose=1
-    )
+    best = results[0]
+    model = build_model(X_train_scaled.shape[1], **best["config"])
+    model.set_weights(best["weights"])
 
     # Evaluate Model
     loss, accuracy = model.evaluate(X_test_scaled, y_test, verbose=0)
-    print(f"\nTraining Complete. Validation Accuracy: {accuracy*100:.2f}%")
+    print(f"\nTraining Complete. Best: {best['config']} Validation Accuracy: {best['val_accuracy']*100:.2f}% Test Accuracy: {accuracy*100:.2f}%")
 
     # Save Deep Learning Artifacts
-    print("5. Saving Artifacts to 'model/' directory...")
+    print("4. Saving Artifacts to 'model/' directory...")
     os.makedirs('model', exist_ok=True)
-    
+
     model.save('model/rain_dl_model.keras')
     joblib.dump(scaler, 'model/dl_scaler.pkl')
-    
+
     # Only creating a new city encoder if requested/needed, but better to keep the old one consistent
     # if it's identical. Still, saving it safely just in case.
     joblib.dump(le_city, 'model/dl_city_encoder.pkl')
 
+    # Export the weights for the TensorFlow-free NumPy engine used by the web workers
+    from services.numpy_engine import export_dl_model
+    export_dl_model()
+
     print("Success! App is ready to convert to DL inference.")
 
+
 if __name__ == "__main__":
-    build_and_train_dl_model()
+    parser = argparse.ArgumentParser(description="Train the rain network, optionally searching architectures in parallel.")
+    parser.add_argument("--no-search", action="store_true", help="Train only the original 32-16-8 network.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for the search (default: CPU count).")
+    parser.add_argument("--max-epochs", type=int, default=100)
+    parser.add_argument("--patience", type=int, default=10, help="Epochs without val_loss improvement before stopping.")
+    args = parser.parse_args()
+    build_and_train_dl_model(search=not args.no_search, workers=args.workers, max_epochs=args.max_epochs, patience=args.patience)